@@ -1,4 +1,9 @@
 import google.generativeai as genai
 import os 
 genai.configure(api_key=os.environ.get('GEMINI_API_KEY'))
-genAIModel = genai.GenerativeModel("gemini-1.5-flash")
+MODEL_NAME = "gemini-1.5-flash"
+genAIModel = genai.GenerativeModel(MODEL_NAME)
+
+def instructed_model(system_instruction: str):
+    """Model with fixed instructions sent as a system instruction instead of in every prompt"""
+    return genai.GenerativeModel(MODEL_NAME, system_instruction=system_instruction)
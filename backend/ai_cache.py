@@ -0,0 +1,85 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from cachetools import TTLCache
+
+
+class AIResponseCache:
+    """
+    Content-addressed cache for model responses.
+
+    Entries live in an in-memory LRU with a TTL and, when a path is given,
+    in a SQLite file that survives restarts. Values are JSON strings so every
+    hit hands the caller a fresh copy to mutate.
+    """
+
+    def __init__(self, maxsize=256, ttl=3600, path=None):
+        self.ttl = ttl
+        self.memory = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.lock = threading.Lock()
+        self.stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0}
+        self.disk = None
+        if path:
+            self.disk = sqlite3.connect(path, check_same_thread=False)
+            self.disk.execute(
+                'CREATE TABLE IF NOT EXISTS ai_cache '
+                '(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+            )
+            self.disk.commit()
+
+    @staticmethod
+    def make_key(endpoint, model_name, prompt_version, normalized_input):
+        raw = json.dumps([endpoint, model_name, prompt_version, normalized_input],
+                         sort_keys=True, separators=(',', ':'))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            value = self.memory.get(key)
+            if value is not None:
+                self.stats['hits'] += 1
+                return json.loads(value)
+            if self.disk is not None:
+                row = self.disk.execute(
+                    'SELECT value FROM ai_cache WHERE key = ? AND expires_at > ?',
+                    (key, time.time())
+                ).fetchone()
+                if row:
+                    self.stats['disk_hits'] += 1
+                    self.memory[key] = row[0]
+                    return json.loads(row[0])
+            self.stats['misses'] += 1
+            return None
+
+    def set(self, key, value):
+        encoded = json.dumps(value)
+        with self.lock:
+            self.memory[key] = encoded
+            self.stats['stores'] += 1
+            if self.disk is not None:
+                self.disk.execute(
+                    'INSERT OR REPLACE INTO ai_cache (key, value, expires_at) VALUES (?, ?, ?)',
+                    (key, encoded, time.time() + self.ttl)
+                )
+                self.disk.execute('DELETE FROM ai_cache WHERE expires_at <= ?', (time.time(),))
+                self.disk.commit()
+
+    def snapshot(self):
+        with self.lock:
+            lookups = self.stats['hits'] + self.stats['disk_hits'] + self.stats['misses']
+            hits = self.stats['hits'] + self.stats['disk_hits']
+            return {
+                **self.stats,
+                'entries': len(self.memory),
+                'hit_ratio': hits / lookups if lookups else 0.0
+            }
+
+
+ai_cache = AIResponseCache(
+    maxsize=int(os.environ.get('AI_CACHE_SIZE', 256)),
+    ttl=int(os.environ.get('AI_CACHE_TTL', 3600)),
+    path=os.environ.get('AI_CACHE_PATH')
+)
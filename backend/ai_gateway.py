@@ -0,0 +1,275 @@
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from ai import genAIModel
+
+
+class GatewayRejected(Exception):
+    """Raised when a model call cannot be admitted; carries the HTTP status to answer with"""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class _Flight:
+    """An in-flight model call whose output is shared with identical requests"""
+
+    def __init__(self):
+        self.chunks = []
+        self.done = False
+        self.error = None
+        self.cond = threading.Condition()
+
+    def add(self, chunk):
+        with self.cond:
+            self.chunks.append(chunk)
+            self.cond.notify_all()
+
+    def finish(self, error=None):
+        with self.cond:
+            self.done = True
+            self.error = error
+            self.cond.notify_all()
+
+    def follow(self):
+        index = 0
+        while True:
+            with self.cond:
+                while index >= len(self.chunks) and not self.done:
+                    self.cond.wait()
+                if index >= len(self.chunks):
+                    if self.error is not None:
+                        raise self.error
+                    return
+                chunk = self.chunks[index]
+            index += 1
+            yield chunk
+
+
+class AIGateway:
+    """
+    Single entry point for Gemini calls.
+
+    At most `max_concurrency` calls run at once. Callers beyond that wait in a
+    bounded queue that is served round-robin across users, so one user's burst
+    cannot starve everyone else. A full queue answers 503 immediately and a
+    user over `max_per_user` answers 429. Identical prompts already in flight
+    are coalesced: followers read the leader's output instead of calling the
+    model again.
+
+    `max_per_user` counts a user's requests, not model calls. A request that
+    fans out into several calls reserve()s its place once and makes each
+    call with reserved=True, so how many calls it runs in parallel is its own
+    business.
+    """
+
+    def __init__(self, model, max_concurrency=4, max_queue=16, max_per_user=3, queue_timeout=30):
+        self.model = model
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_per_user = max_per_user
+        self.queue_timeout = queue_timeout
+
+        self.cond = threading.Condition()
+        self.active = 0
+        self.queued = 0
+        self.waiting = OrderedDict()  # user -> deque of tickets, in round-robin order
+        self.granted = set()
+        self.per_user = Counter()
+        self.inflight = {}
+
+        self.stats = Counter()
+        self.max_queued = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def reserve(self, user):
+        """Count one request against the user's limit until unreserve(); raises 429 when over it"""
+        with self.cond:
+            self._reserve(user)
+
+    def unreserve(self, user):
+        with self.cond:
+            self._unreserve(user)
+
+    def _reserve(self, user):
+        if self.per_user[user] >= self.max_per_user:
+            self.stats['rejected_user'] += 1
+            raise GatewayRejected(429, 'Too many AI requests in progress, try again shortly')
+        self.per_user[user] += 1
+
+    def _unreserve(self, user):
+        self.per_user[user] -= 1
+        if not self.per_user[user]:
+            del self.per_user[user]
+
+    def _admit(self, user, reserved=False):
+        with self.cond:
+            if not reserved:
+                self._reserve(user)
+            if self.active < self.max_concurrency and not self.queued:
+                self.active += 1
+                self.stats['admitted'] += 1
+                return
+            if self.queued >= self.max_queue:
+                if not reserved:
+                    self._unreserve(user)
+                self.stats['rejected_busy'] += 1
+                raise GatewayRejected(503, 'AI service is busy, try again shortly')
+
+            ticket = object()
+            self.waiting.setdefault(user, deque()).append(ticket)
+            self.queued += 1
+            self.max_queued = max(self.max_queued, self.queued)
+            start = time.monotonic()
+            deadline = start + self.queue_timeout
+
+            while ticket not in self.granted:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    tickets = self.waiting[user]
+                    tickets.remove(ticket)
+                    if not tickets:
+                        del self.waiting[user]
+                    self.queued -= 1
+                    if not reserved:
+                        self._unreserve(user)
+                    self.stats['timeouts'] += 1
+                    raise GatewayRejected(503, 'Timed out waiting for the AI service')
+                self.cond.wait(remaining)
+
+            self.granted.discard(ticket)
+            waited = time.monotonic() - start
+            self.total_wait += waited
+            self.max_wait = max(self.max_wait, waited)
+            self.stats['admitted'] += 1
+            self.stats['waited'] += 1
+
+    def _release(self, user, reserved=False):
+        with self.cond:
+            self.active -= 1
+            if not reserved:
+                self._unreserve(user)
+            # Hand free slots out one user at a time, rotating the user to the back
+            while self.active < self.max_concurrency and self.waiting:
+                waiting_user, tickets = self.waiting.popitem(last=False)
+                self.granted.add(tickets.popleft())
+                if tickets:
+                    self.waiting[waiting_user] = tickets
+                self.active += 1
+                self.queued -= 1
+            self.cond.notify_all()
+
+    def _run(self, user, key, call, reserved=False):
+        with self.cond:
+            flight = self.inflight.get(key)
+            if flight is not None:
+                self.stats['coalesced'] += 1
+                return flight.follow()
+            flight = self.inflight[key] = _Flight()
+
+        try:
+            self._admit(user, reserved)
+        except GatewayRejected as e:
+            with self.cond:
+                self.inflight.pop(key, None)
+            flight.finish(e)
+            raise
+
+        def lead():
+            try:
+                # Primed below so the slot is released even if the caller never iterates
+                yield
+                for chunk in call():
+                    flight.add(chunk)
+                    yield chunk
+                flight.finish()
+            except GeneratorExit:
+                flight.finish(GatewayRejected(503, 'AI request was cancelled'))
+                raise
+            except Exception as e:
+                flight.finish(e)
+                raise
+            finally:
+                with self.cond:
+                    self.inflight.pop(key, None)
+                self._release(user, reserved)
+
+        stream = lead()
+        next(stream)
+        return stream
+
+    @staticmethod
+    def _key(prompt, **kwargs):
+        raw = repr((prompt, sorted(kwargs.items())))
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def stream(self, user, prompt, model=None, reserved=False, **kwargs):
+        """Streaming generate_content; returns an iterator of response chunks"""
+        model = model or self.model
+        key = self._key(prompt, model=id(model), stream=True, **kwargs)
+        return self._run(user, key, lambda: model.generate_content(prompt, stream=True, **kwargs), reserved)
+
+    def generate(self, user, prompt, model=None, reserved=False, **kwargs):
+        """Blocking generate_content; returns the response"""
+        model = model or self.model
+        key = self._key(prompt, model=id(model), stream=False, **kwargs)
+        responses = list(self._run(user, key, lambda: [model.generate_content(prompt, **kwargs)], reserved))
+        return responses[0]
+
+    async def stream_async(self, user, prompt, model=None, reserved=False, **kwargs):
+        """
+        Async streaming generate_content for the ASGI entry point.
+
+        Admission goes through the same slots, queue and per-user limits as
+        the threaded path, waiting off the event loop, and happens before this
+        returns so a rejection can still become a plain 429/503. Identical
+        prompts are not coalesced here.
+        """
+        model = model or self.model
+        admission = asyncio.ensure_future(asyncio.to_thread(self._admit, user, reserved))
+        try:
+            await asyncio.shield(admission)
+        except asyncio.CancelledError:
+            # The waiting thread may still be granted a slot; hand it straight back
+            admission.add_done_callback(lambda done: done.exception() is None and self._release(user, reserved))
+            raise
+
+        async def lead():
+            try:
+                # Primed below so the slot is released even if the caller never iterates
+                yield
+                response = await model.generate_content_async(prompt, stream=True, **kwargs)
+                async for chunk in response:
+                    yield chunk
+            finally:
+                self._release(user, reserved)
+
+        stream = lead()
+        await stream.__anext__()
+        return stream
+
+    def snapshot(self):
+        with self.cond:
+            waited = self.stats['waited']
+            return {
+                **self.stats,
+                'active': self.active,
+                'queue_depth': self.queued,
+                'max_queue_depth': self.max_queued,
+                'avg_wait_ms': round(self.total_wait / waited * 1000, 2) if waited else 0.0,
+                'max_wait_ms': round(self.max_wait * 1000, 2)
+            }
+
+
+ai_gateway = AIGateway(
+    genAIModel,
+    max_concurrency=int(os.environ.get('AI_MAX_CONCURRENCY', 4)),
+    max_queue=int(os.environ.get('AI_MAX_QUEUE', 16)),
+    max_per_user=int(os.environ.get('AI_MAX_PER_USER', 3)),
+    queue_timeout=float(os.environ.get('AI_QUEUE_TIMEOUT', 30))
+)
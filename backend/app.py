@@ -5,6 +5,11 @@ from blueprints.notes.notes import notes_blueprint
 from blueprints.users.users import auth_blueprint
 from blueprints.tasks.tasks import tasks_blueprint
 from blueprints.habits.habits import habits_blueprint
+from blueprints.notes.uploads import MAX_UPLOAD_BYTES
+from mutations import RowNotFound
+from db import warm_up, pool_stats
+from read_cache import read_cache
+from response_stats import response_stats
 from models import Transaction
 from extensions import db
 from flask_supabase import Supabase
@@ -16,6 +21,10 @@ import os
 
 client = genai.Client(api_key=os.environ.get('GEMINI_API_KEY'))
 
+CORS_ORIGINS = ["http://localhost:5173", "https://personal-dashboard-black.vercel.app/"]
+CORS_METHODS = ["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"]
+CORS_HEADERS = ["Content-Type", "Authorization", "Access-Control-Allow-Origin"]
+
 supabase_extension = Supabase(app)
 app.register_blueprint(notes_blueprint, url_prefix='/notes')
 app.register_blueprint(auth_blueprint, url_prefix='/auth')
@@ -23,23 +32,44 @@ app.register_blueprint(tasks_blueprint, url_prefix='/tasks')
 app.register_blueprint(habits_blueprint, url_prefix='/habits')
 app.config["JWT_SECRET_KEY"] = 'asdasddasdasd'
 app.config['JWT_TOKEN_LOCATION'] = ['headers']
+# Werkzeug answers 413 for larger bodies before the view reads them
+app.config['MAX_CONTENT_LENGTH'] = MAX_UPLOAD_BYTES
 CORS(app, resources={
     r"/*": {
-        "origins": ["http://localhost:5173", "https://personal-dashboard-black.vercel.app/"],
-        "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization", "Access-Control-Allow-Origin"],
+        "origins": CORS_ORIGINS,
+        "methods": CORS_METHODS,
+        "allow_headers": CORS_HEADERS,
 
-        "expose_headers":["Content-Type", "Authorization", "Access-Control-Allow-Origin"]
+        "expose_headers": CORS_HEADERS
     }, 
 },
-origins=["http://localhost:5173", "https://personal-dashboard-black.vercel.app/"],
-methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-allow_headers=["Content-Type", "Authorization", "Access-Control-Allow-Origin"],
-expose_headers=["Content-Type", "Authorization", "Access-Control-Allow-Origin"]
+origins=CORS_ORIGINS,
+methods=CORS_METHODS,
+allow_headers=CORS_HEADERS,
+expose_headers=CORS_HEADERS
 )
 
 jwt = JWTManager(app)
 
+# Open Supabase connections in the background so the first requests skip the handshake
+warm_up(int(os.environ.get('SUPABASE_WARM_CONNECTIONS', 2)))
+
+@app.route('/stats/supabase', methods=['GET'])
+def supabase_stats():
+    return jsonify(pool_stats())
+
+@app.route('/stats/cache', methods=['GET'])
+def cache_stats():
+    return jsonify(read_cache.snapshot())
+
+@app.route('/stats/responses', methods=['GET'])
+def response_size_stats():
+    return jsonify(response_stats.snapshot())
+
+@app.errorhandler(RowNotFound)
+def row_not_found(e):
+    return jsonify({'error': str(e)}), 404
+
 if __name__ == '__main__':
     db.init_app(app)
     with app.app_context():
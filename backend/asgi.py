@@ -0,0 +1,461 @@
+"""
+ASGI entry point: uvicorn asgi:app --workers 2
+
+The I/O-bound endpoints below run natively on asyncio with the async
+Supabase client and Gemini's async API, so a slow Supabase query or a long
+model stream parks a coroutine instead of a thread and a few workers can
+multiplex many of them. Every other route falls through to the Flask app,
+which runs on a small thread pool exactly as it does under the WSGI server.
+
+Handlers mirror their Flask counterparts in blueprints/ and share their
+helpers; response shapes are identical.
+"""
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from functools import wraps
+from datetime import datetime
+from a2wsgi import WSGIMiddleware
+from flask_jwt_extended import decode_token
+from werkzeug.http import parse_etags, parse_accept_header
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import JSONResponse as StarletteJSONResponse, Response, StreamingResponse
+from starlette.routing import Match, Route
+from app import app as flask_app, CORS_ORIGINS, CORS_METHODS, CORS_HEADERS
+from ai_cache import ai_cache
+from ai_gateway import ai_gateway, GatewayRejected
+from db import get_async_db, get_async_transport
+from conditional import version_query, versions_from_rows, make_etag, CACHE_CONTROL
+from compression import negotiate, StreamCompressor, weaken_etag, COMPRESSIBLE_TYPES, COMPRESS_MIN_BYTES
+from json_provider import dumps_bytes
+from response_stats import response_stats
+from blueprints.notes.blocks import text_columns
+from blueprints.notes.summaries import summary_query, summary_page, missing_excerpt_query
+from blueprints.notes.uploads import (
+    UploadError, check_content_length, check_upload_owner, append_resumable_async, RESUMABLE_CHUNK_BYTES
+)
+from blueprints.notes.notes import (
+    formatModel, FORMAT_PARALLELISM, _ChunkFormatter, _FormatProgress, _plan_format, _format_chunk_prompt,
+    _usage_dict, _invalidate_folders
+)
+
+# Threads serving the Flask routes that are not handled natively
+WSGI_THREADS = int(os.environ.get('ASGI_WSGI_THREADS', 8))
+
+
+class ClosingStreamingResponse(StreamingResponse):
+    """StreamingResponse that calls `on_close` once it is done, however the stream ends"""
+
+    def __init__(self, content, on_close, **kwargs):
+        super().__init__(content, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+
+class JSONResponse(StarletteJSONResponse):
+    """Encoded like the Flask app's responses: orjson, sorted keys"""
+
+    def render(self, content):
+        return dumps_bytes(content)
+
+
+def _identity(request):
+    """JWT identity from the Authorization header, validated with the Flask app's settings"""
+    header = request.headers.get('Authorization', '')
+    if not header.startswith('Bearer '):
+        return None
+    try:
+        with flask_app.app_context():
+            return decode_token(header[len('Bearer '):])['sub']
+    except Exception:
+        return None
+
+
+def jwt_required(endpoint):
+    @wraps(endpoint)
+    async def wrapper(request):
+        user_id = _identity(request)
+        if user_id is None:
+            return JSONResponse({'msg': 'Missing or invalid Authorization Header'}, 401)
+        request.state.user_id = user_id
+        return await endpoint(request)
+    return wrapper
+
+
+def conditional(*resources):
+    """The native routes' counterpart of conditional.conditional; both produce the same ETags"""
+    def decorator(endpoint):
+        @wraps(endpoint)
+        async def wrapper(request):
+            user_id = request.path_params.get('user_id') or request.state.user_id
+            try:
+                rows = (await version_query(get_async_db(), user_id, resources).execute()).data
+            except Exception as e:
+                print(f"Error reading resource versions: {str(e)}")
+                return await endpoint(request)
+
+            etag = make_etag(user_id, versions_from_rows(resources, rows), request.url.query)
+            headers = {'ETag': f'"{etag}"', 'Cache-Control': CACHE_CONTROL}
+            if parse_etags(request.headers.get('If-None-Match')).contains_weak(etag):
+                return Response(status_code=304, headers=headers)
+            response = await endpoint(request)
+            if response.status_code == 200:
+                response.headers.update(headers)
+            return response
+        return wrapper
+    return decorator
+
+
+# Notes
+
+@jwt_required
+@conditional('notes')
+async def get_notes(request):
+    db = get_async_db()
+    user_id = request.state.user_id
+    if request.query_params.get('view') != 'summary':
+        notes = await db.from_('notes').select('*').eq('user_id', user_id).execute()
+        return JSONResponse(notes.data)
+
+    try:
+        query, limit = summary_query(db, user_id, request.query_params)
+    except ValueError as e:
+        return JSONResponse({'error': str(e)}, 400)
+    notes, next_cursor = summary_page((await query.execute()).data, limit)
+
+    # Notes saved before the derived text columns existed get an excerpt computed
+    # here; storing it is left to scripts/backfill_note_text.py
+    missing = missing_excerpt_query(db, notes)
+    if missing is not None:
+        bodies = await missing.execute()
+        excerpts = {row['id']: text_columns(row['note'])['excerpt'] for row in bodies.data}
+        for note in notes:
+            if note['id'] in excerpts:
+                note['excerpt'] = excerpts[note['id']]
+
+    return JSONResponse({'notes': notes, 'next_cursor': next_cursor})
+
+
+@jwt_required
+async def get_note(request):
+    note = await get_async_db().from_('notes').select()\
+        .eq('id', request.path_params['id'])\
+        .eq('user_id', request.state.user_id)\
+        .execute()
+    return JSONResponse(note.data)
+
+
+@jwt_required
+async def add_note(request):
+    user_id = request.state.user_id
+    data = await request.json()
+    new_note = {
+        'title': data['title'],
+        'note': data['content'],
+        'created_at': datetime.now().isoformat(),
+        'updated_at': datetime.now().isoformat(),
+        'user_id': user_id,
+        **text_columns(data['content'])
+    }
+    if data.get('folder_id'):
+        new_note['folder_id'] = data['folder_id']
+
+    await get_async_db().from_('notes').insert(new_note).execute()
+    _invalidate_folders(user_id, tree_only=True)
+    return JSONResponse(new_note)
+
+
+async def update_note(request):
+    data = await request.json()
+    updated_note = {
+        'title': data['title'],
+        'note': data['content'],
+        'updated_at': datetime.now().isoformat(),
+        **text_columns(data['content'])
+    }
+    query = get_async_db().from_('notes').update(updated_note).eq('id', request.path_params['id'])
+    if 'version' in data:
+        query = query.eq('version', data['version'])
+    result = await query.execute()
+    if 'version' in data and not result.data:
+        return JSONResponse({'error': 'Note has changed since it was loaded'}, 409)
+    if result.data:
+        updated_note['version'] = result.data[0].get('version')
+    return JSONResponse(updated_note)
+
+
+@jwt_required
+async def format_with_ai(request):
+    data = await request.json()
+    blocks = data.get('blocks', [])
+    if not blocks:
+        return JSONResponse({'error': 'No blocks provided'}, 400)
+
+    caller = request.state.user_id
+    # Cache lookups may read the SQLite tier, so they stay off the event loop
+    chunks, keys, cached, pending = await asyncio.to_thread(_plan_format, blocks)
+
+    # The request counts once against the caller's AI limit however many chunks it
+    # runs; the first model call is admitted before the stream starts so a
+    # saturated gateway can still answer with a plain 429/503
+    first_stream = None
+    if pending:
+        try:
+            ai_gateway.reserve(caller)
+        except GatewayRejected as e:
+            return JSONResponse({'error': str(e)}, e.status_code)
+        try:
+            first_stream = await ai_gateway.stream_async(caller, _format_chunk_prompt(chunks[pending[0]]),
+                                                         model=formatModel, reserved=True)
+        except GatewayRejected as e:
+            ai_gateway.unreserve(caller)
+            return JSONResponse({'error': str(e)}, e.status_code)
+        except BaseException:
+            # Cancelled while waiting for a slot
+            ai_gateway.unreserve(caller)
+            raise
+
+    async def run(index, stream, events, slots):
+        async with slots:
+            try:
+                if stream is None:
+                    stream = await ai_gateway.stream_async(caller, _format_chunk_prompt(chunks[index]),
+                                                           model=formatModel, reserved=True)
+            except GatewayRejected as e:
+                events.put_nowait(('error', index, str(e)))
+                return
+            try:
+                formatter = _ChunkFormatter(chunks[index])
+                async for piece in stream:
+                    for block in formatter.feed(piece):
+                        events.put_nowait(('block', index, block))
+                error = formatter.error()
+                if error:
+                    events.put_nowait(('error', index, error))
+                    return
+                # The cache is SQLite; keep the write off the event loop
+                await asyncio.to_thread(ai_cache.set, keys[index], formatter.blocks)
+                events.put_nowait(('done', index, _usage_dict(formatter.usage)))
+            except Exception as e:
+                print(f"Error formatting chunk {index}: {str(e)}")
+                events.put_nowait(('error', index, str(e)))
+
+    async def generate():
+        events = asyncio.Queue()
+        progress = _FormatProgress(chunks, cached, pending)
+        for frame in progress.replay_cached():
+            yield frame
+
+        slots = asyncio.Semaphore(FORMAT_PARALLELISM)
+        tasks = [asyncio.create_task(run(index, first_stream if index == pending[0] else None, events, slots))
+                 for index in pending]
+        try:
+            # Blocks stream out as each chunk produces them; chunks finish in any order
+            while progress.remaining:
+                frame = progress.handle(*await events.get())
+                if frame:
+                    yield frame
+            yield progress.finish()
+        finally:
+            # A client that disconnects mid-stream stops the model calls too
+            for task in tasks:
+                task.cancel()
+
+    if not pending:
+        return StreamingResponse(generate(), media_type='text/event-stream')
+    return ClosingStreamingResponse(generate(), on_close=lambda: ai_gateway.unreserve(caller),
+                                    media_type='text/event-stream')
+
+
+@jwt_required
+async def append_upload(request):
+    """Append one raw chunk, streamed from the client to storage without buffering"""
+    offset = request.headers.get('Upload-Offset')
+    if offset is None or not offset.isdigit():
+        return JSONResponse({'error': 'Upload-Offset header is required'}, 400)
+    content_length = request.headers.get('Content-Length')
+    try:
+        check_upload_owner(request.path_params['upload_id'], request.state.user_id)
+        check_content_length(int(content_length) if content_length else None, RESUMABLE_CHUNK_BYTES)
+        new_offset = await append_resumable_async(request.path_params['upload_id'], int(offset), request.stream())
+    except UploadError as e:
+        return JSONResponse({'error': str(e)}, e.status_code)
+    return JSONResponse({'offset': new_offset})
+
+
+# Habits
+
+@conditional('habits')
+async def get_habits(request):
+    db = get_async_db()
+    try:
+        habits = await db.from_('habits')\
+            .select('id, name, description, color, icon, frequency, archived, created_at')\
+            .eq('user_id', request.path_params['user_id'])\
+            .eq('archived', False)\
+            .order('created_at')\
+            .execute()
+
+        habit_ids = [habit['id'] for habit in habits.data]
+        if habit_ids:
+            streaks = await db.from_('habit_streaks')\
+                .select('habit_id, current_streak, longest_streak')\
+                .in_('habit_id', habit_ids)\
+                .execute()
+            streak_map = {streak['habit_id']: streak for streak in streaks.data}
+            for habit in habits.data:
+                streak_info = streak_map.get(habit['id'], {})
+                habit['streak'] = streak_info.get('current_streak', 0)
+                habit['longest_streak'] = streak_info.get('longest_streak', 0)
+
+        return JSONResponse(habits.data, 200)
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)}, 500)
+
+
+@conditional('habits', 'completions')
+async def get_completions(request):
+    db = get_async_db()
+    try:
+        habits = await db.from_('habits')\
+            .select('id')\
+            .eq('user_id', request.path_params['user_id'])\
+            .eq('archived', False)\
+            .execute()
+        habit_ids = [habit['id'] for habit in habits.data]
+        if not habit_ids:
+            return JSONResponse([], 200)
+
+        query = db.from_('habit_completions')\
+            .select('habit_id, completed_at')\
+            .in_('habit_id', habit_ids)
+        if request.query_params.get('start_date'):
+            query = query.gte('completed_at', request.query_params['start_date'])
+        if request.query_params.get('end_date'):
+            query = query.lte('completed_at', request.query_params['end_date'])
+
+        completions = await query.execute()
+        return JSONResponse(completions.data, 200)
+    except Exception as e:
+        return JSONResponse({"status": "error", "message": str(e)}, 500)
+
+
+routes = [
+    Route('/notes/get_notes/', get_notes, methods=['GET']),
+    Route('/notes/get_note/{id:uuid}', get_note, methods=['GET']),
+    Route('/notes/add_note/', add_note, methods=['POST']),
+    Route('/notes/update_note/{id:uuid}', update_note, methods=['PUT', 'POST']),
+    Route('/notes/format_with_ai/', format_with_ai, methods=['POST']),
+    Route('/notes/uploads/{upload_id}', append_upload, methods=['PATCH']),
+    Route('/habits/get_habits/{user_id}', get_habits, methods=['GET']),
+    Route('/habits/get_completions/{user_id}', get_completions, methods=['GET']),
+]
+
+
+@asynccontextmanager
+async def lifespan(_):
+    # Open the async pool's connection before the first request needs it
+    try:
+        await get_async_db().postgrest.session.head('/')
+    except Exception as e:
+        print(f"Supabase warm-up failed: {str(e)}")
+    yield
+    await get_async_transport().shutdown()
+
+
+class CompressionMiddleware:
+    """gzip/brotli for the native routes, negotiated and streamed the same way as compression.py"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate(parse_accept_header(Headers(scope=scope).get('accept-encoding')))
+        start = None
+        compressor = None
+        sizes = [0, 0]
+
+        async def compressing_send(message):
+            nonlocal start, compressor
+            if message['type'] == 'http.response.start':
+                start = message
+                return
+            if message['type'] != 'http.response.body':
+                await send(message)
+                return
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+            if start is not None:
+                headers = MutableHeaders(scope=start)
+                if headers.get('content-type', '').split(';')[0] in COMPRESSIBLE_TYPES:
+                    headers.add_vary_header('Accept-Encoding')
+                    if encoding and 'content-encoding' not in headers and start['status'] not in (204, 304) \
+                            and (more_body or len(body) >= COMPRESS_MIN_BYTES):
+                        compressor = StreamCompressor(encoding)
+                        headers['Content-Encoding'] = encoding
+                        del headers['Content-Length']
+                        weaken_etag(headers)
+                await send(start)
+                start = None
+            if compressor is not None:
+                sizes[0] += len(body)
+                body = compressor.chunk(body) if more_body else compressor.last(body)
+            sizes[1] += len(body)
+            await send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+            if not more_body:
+                endpoint = scope.get('endpoint')
+                response_stats.record_body(getattr(endpoint, '__name__', None), sizes[0] if compressor else sizes[1],
+                                           sizes[1], encoding if compressor else None)
+
+        await self.app(scope, receive, compressing_send)
+
+
+native_app = Starlette(
+    routes=routes,
+    lifespan=lifespan,
+    middleware=[Middleware(
+        CORSMiddleware,
+        allow_origins=CORS_ORIGINS,
+        allow_methods=CORS_METHODS,
+        allow_headers=CORS_HEADERS,
+        expose_headers=CORS_HEADERS
+    ), Middleware(CompressionMiddleware)]
+)
+wsgi_app = WSGIMiddleware(flask_app, workers=WSGI_THREADS)
+
+
+class Dispatcher:
+    """Sends requests for the native routes to Starlette and everything else to Flask"""
+
+    def __init__(self, native, fallback, routes):
+        self.native = native
+        self.fallback = fallback
+        self.routes = routes
+
+    def _is_native(self, scope):
+        for route in self.routes:
+            match, _ = route.matches(scope)
+            # PARTIAL is a path match with another method; CORS preflights for it are ours
+            if match == Match.FULL or (match == Match.PARTIAL and scope['method'] == 'OPTIONS'):
+                return True
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan' or (scope['type'] == 'http' and self._is_native(scope)):
+            await self.native(scope, receive, send)
+        else:
+            await self.fallback(scope, receive, send)
+
+
+app = Dispatcher(native_app, wsgi_app, routes)
@@ -0,0 +1,179 @@
+"""
+Side-by-side benchmark of the threaded Flask server and the ASGI entry point.
+
+Both servers run as subprocesses against a fake Supabase that answers every
+request after a fixed delay, so the numbers measure how each server waits on
+I/O rather than how fast Supabase is. The same concurrent GET
+/notes/get_note/<id> load is driven at each and throughput and latency
+percentiles are reported.
+
+Usage (from backend/):
+    python -m benchmarks.asgi_benchmark [--requests N] [--concurrency C] [--latency MS]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import uuid
+import multiprocessing
+import httpx
+from aiohttp import web
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+NOTE_ID = str(uuid.uuid4())
+
+SERVERS = {
+    # What app.py runs today: Werkzeug, one thread per request
+    'flask-threaded': [sys.executable, '-c',
+                       'import sys; from werkzeug.serving import run_simple; from app import app; '
+                       'run_simple("127.0.0.1", int(sys.argv[1]), app, threaded=True)'],
+    'asgi': [sys.executable, '-m', 'uvicorn', 'asgi:app', '--host', '127.0.0.1', '--port', '{port}',
+             '--log-level', 'warning'],
+}
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def run_upstream(port, latency, note_id):
+    """Fake Supabase REST API: every call returns one note after `latency` seconds"""
+    async def handle(request):
+        await asyncio.sleep(latency)
+        return web.json_response([{'id': note_id, 'title': 'Benchmark', 'note': '[]', 'version': 1}])
+
+    app = web.Application()
+    app.router.add_route('*', '/{tail:.*}', handle)
+    web.run_app(app, host='127.0.0.1', port=port, print=None)
+
+
+def server_env(upstream):
+    return {
+        **os.environ,
+        'SUPABASE_URL': upstream,
+        'SUPABASE_KEY': os.environ.get('SUPABASE_KEY', 'eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.benchmark'),
+        'GEMINI_API_KEY': os.environ.get('GEMINI_API_KEY', 'benchmark'),
+        # Plain HTTP/1.1 upstream, so both servers need real connections
+        'SUPABASE_HTTP2': 'false',
+    }
+
+
+def start_server(name, port, upstream):
+    command = [part.format(port=port) for part in SERVERS[name]]
+    if name == 'flask-threaded':
+        command.append(str(port))
+    env = server_env(upstream)
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def wait_until_up(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(f'{base_url}/notes/main/')
+                return
+            except httpx.TransportError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f'{base_url} did not start within {timeout}s')
+
+
+def cpu_seconds(pid):
+    """User plus system CPU time a process has used so far (Linux only)"""
+    try:
+        with open(f'/proc/{pid}/stat') as stat:
+            fields = stat.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+    except OSError:
+        return float('nan')
+
+
+def auth_header(upstream):
+    """A token signed with the app's own JWT settings"""
+    os.environ.update(server_env(upstream))
+    sys.path.insert(0, BACKEND_DIR)
+    from flask_jwt_extended import create_access_token
+    from app import app
+    with app.app_context():
+        return {'Authorization': 'Bearer ' + create_access_token(identity='benchmark')}
+
+
+async def drive(base_url, headers, total, concurrency):
+    latencies = []
+    errors = 0
+    queue = asyncio.Queue()
+    for _ in range(total):
+        queue.put_nowait(None)
+
+    async def worker(client):
+        nonlocal errors
+        while not queue.empty():
+            queue.get_nowait()
+            started = time.perf_counter()
+            try:
+                response = await client.get(f'{base_url}/notes/get_note/{NOTE_ID}', headers=headers)
+                if response.status_code != 200:
+                    errors += 1
+            except httpx.HTTPError:
+                errors += 1
+            latencies.append(time.perf_counter() - started)
+
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        'rps': total / elapsed,
+        'p50': statistics.median(latencies) * 1000,
+        'p95': latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        'errors': errors,
+    }
+
+
+async def main(args):
+    upstream_port = free_port()
+    # Its own process, so the fake upstream does not share an event loop with the load generator
+    upstream = multiprocessing.Process(target=run_upstream, args=(upstream_port, args.latency / 1000, NOTE_ID),
+                                       daemon=True)
+    upstream.start()
+    headers = auth_header(f'http://127.0.0.1:{upstream_port}')
+
+    print(f'{args.requests} requests, concurrency {args.concurrency}, upstream latency {args.latency}ms')
+    print(f'{"server":<16}{"req/s":>10}{"p50 ms":>10}{"p95 ms":>10}{"cpu ms/req":>12}{"errors":>8}')
+    try:
+        for name in SERVERS:
+            port = free_port()
+            process = start_server(name, port, f'http://127.0.0.1:{upstream_port}')
+            base_url = f'http://127.0.0.1:{port}'
+            try:
+                await wait_until_up(base_url)
+                # Warm the pools before measuring
+                await drive(base_url, headers, args.concurrency, args.concurrency)
+                cpu = cpu_seconds(process.pid)
+                result = await drive(base_url, headers, args.requests, args.concurrency)
+                result['cpu_ms'] = (cpu_seconds(process.pid) - cpu) * 1000 / args.requests
+            finally:
+                process.terminate()
+                process.wait()
+            print(f'{name:<16}{result["rps"]:>10.1f}{result["p50"]:>10.1f}{result["p95"]:>10.1f}'
+                  f'{result["cpu_ms"]:>12.2f}{result["errors"]:>8}')
+    finally:
+        upstream.terminate()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--latency', type=float, default=50, help='fake Supabase latency in milliseconds')
+    asyncio.run(main(parser.parse_args()))
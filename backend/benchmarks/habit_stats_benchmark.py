@@ -0,0 +1,71 @@
+"""
+Benchmark for the /habits/stats computation.
+
+Generates a user with many habits of mixed frequencies and years of
+completions, then times habit_stats() over the whole range: building the
+habits x days grid, the rollups, streak segments and weekday figures.
+Loading from Supabase and JSON encoding are not included.
+
+At 50 habits x 5 years (~47k completions) the median is about 20-25 ms.
+About half of that is reading the completion dicts into grid coordinates,
+two dict lookups per row. Schedule masks cost well under a millisecond,
+since habits with the same frequency share one compiled schedule.
+
+Usage (from backend/):
+    python -m benchmarks.habit_stats_benchmark [--habits N] [--years N] [--repeat N]
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from blueprints.habits.analytics import habit_stats
+from blueprints.habits.schedule import schedule_for
+
+FREQUENCIES = [
+    {'type': 'daily', 'days': [0, 1, 2, 3, 4, 5, 6]},
+    {'type': 'weekly', 'days': [1, 3, 5]},
+    {'type': 'custom', 'interval': 2, 'startDate': '2020-01-01'},
+    {'type': 'custom', 'timesPerWeek': 3},
+]
+
+
+def generate(habit_count, years, rng):
+    end = date.today()
+    start = end - timedelta(days=365 * years - 1)
+    habits, completions = [], []
+    for number in range(habit_count):
+        frequency = FREQUENCIES[number % len(FREQUENCIES)]
+        habit = {'id': f'habit-{number}', 'name': f'Habit {number}', 'frequency': frequency,
+                 'created_at': start.isoformat() + 'T08:00:00+00:00'}
+        habits.append(habit)
+        schedule = schedule_for(frequency)
+        rate = rng.uniform(0.5, 0.95)
+        day = start
+        while day <= end:
+            if schedule.scheduled(day) and rng.random() < rate:
+                completions.append({'habit_id': habit['id'], 'completed_at': day.isoformat()})
+            day += timedelta(days=1)
+    return habits, completions, start, end
+
+
+def main(args):
+    habits, completions, start, end = generate(args.habits, args.years, random.Random(1))
+    habit_stats(habits, completions, start, end)
+    timings = []
+    for _ in range(args.repeat):
+        started = time.perf_counter()
+        stats = habit_stats(habits, completions, start, end)
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    print(f'{args.habits} habits, {args.years} years, {len(completions)} completions')
+    print(f'habit_stats: median {timings[len(timings) // 2]:.2f} ms, best {timings[0]:.2f} ms')
+    print(f'overall completion rate {stats["overall"]["completion_rate"]}, '
+          f'{sum(len(habit["streaks"]["lengths"]) for habit in stats["habits"])} streak segments')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--habits', type=int, default=50)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--repeat', type=int, default=20)
+    main(parser.parse_args())
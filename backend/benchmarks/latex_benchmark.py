@@ -0,0 +1,195 @@
+"""
+Benchmark for the LaTeX formatter used by /notes/format_latex/.
+
+Compares the single-pass tokenizer engine against a frozen copy of the
+previous replace-based implementation on a corpus of real expressions:
+throughput for both, how often the outputs differ, and whether formatting
+already-formatted output is stable.
+
+The engine pays a fixed Python cost per token, while the old function's
+passes are C-level str.replace calls whose cost barely grows with length.
+So the engine is faster on single expressions, what the endpoint formats,
+but still slower on the synthetic 10-expression "long" inputs; that row is
+reported so the gap stays visible, not as a like-for-like comparison.
+
+Usage (from backend/):
+    python -m benchmarks.latex_benchmark [--repeat N] [--show-diffs]
+"""
+import argparse
+import os
+import time
+from blueprints.notes.latex import format_latex_content
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), 'latex_corpus.txt')
+
+
+# Previous implementation, kept verbatim as the baseline
+def legacy_format_latex_content(content: str) -> str:
+    """
+    Format LaTeX content for proper rendering.
+    
+    Rules:
+    1. Ensure proper equation environment
+    2. Fix common syntax issues
+    3. Add proper spacing
+    4. Handle multi-line equations
+    """
+    # Remove extra whitespace and normalize line endings
+    content = content.strip()
+    
+    # Handle common LaTeX formatting issues
+    replacements = {
+        # Fix spacing around operators
+        '+': ' + ',
+        '-': ' - ',
+        '=': ' = ',
+        
+        # Fix fraction formatting
+        'frac': '\\frac',
+        
+        # Fix sum/integral formatting
+        'sum': '\\sum',
+        'int': '\\int',
+        
+        # Fix subscript/superscript spacing
+        '_': '_{',
+        '^': '^{',
+        
+        # Fix common function names
+        'sin': '\\sin',
+        'cos': '\\cos',
+        'tan': '\\tan',
+        'log': '\\log',
+        'ln': '\\ln',
+        'lim': '\\lim',
+        
+        # Fix matrix environments
+        'matrix': '\\matrix',
+        'pmatrix': '\\pmatrix',
+        'bmatrix': '\\bmatrix',
+        
+        # Fix Greek letters
+        'alpha': '\\alpha',
+        'beta': '\\beta',
+        'gamma': '\\gamma',
+        'delta': '\\delta',
+        'theta': '\\theta',
+        'pi': '\\pi',
+        'sigma': '\\sigma',
+        'omega': '\\omega',
+        
+        # Fix arrows and symbols
+        '->': '\\rightarrow',
+        '<-': '\\leftarrow',
+        '<=': '\\leq',
+        '>=': '\\geq',
+        '!=': '\\neq',
+        'inf': '\\infty',
+    }
+    
+    # Apply replacements while preserving existing correct formatting
+    formatted = content
+    for old, new in replacements.items():
+        if old not in ['_', '^']:  # Skip subscript/superscript for now
+            # Only replace if not already in LaTeX format
+            if not formatted.find(new) >= 0:
+                formatted = formatted.replace(old, new)
+    
+    # Handle equation environments
+    if not formatted.startswith('\\begin{equation}') and not formatted.startswith('$$'):
+        # Check if it's a single-line equation
+        if '\n' not in formatted:
+            formatted = f'$${formatted}$$'
+        else:
+            # Multi-line equation
+            formatted = '\\begin{align*}\n' + formatted + '\n\\end{align*}'
+    
+    # Handle subscripts and superscripts
+    lines = formatted.split('\n')
+    for i, line in enumerate(lines):
+        # Find subscripts/superscripts without braces and add them
+        for char in ['_', '^']:
+            parts = line.split(char)
+            for j in range(1, len(parts)):
+                if parts[j] and parts[j][0] != '{':
+                    # Add braces around single character or number
+                    first_char = parts[j][0]
+                    parts[j] = '{' + first_char + '}' + parts[j][1:]
+            lines[i] = char.join(parts)
+    
+    formatted = '\n'.join(lines)
+    
+    # Ensure proper spacing around delimiters
+    delimiters = ['\\left', '\\right', '\\big', '\\Big']
+    for delimiter in delimiters:
+        formatted = formatted.replace(delimiter, f' {delimiter} ')
+    
+    # Clean up multiple spaces
+    formatted = ' '.join(formatted.split())
+    
+    # Handle special cases for matrices
+    if '\\begin{matrix}' in formatted:
+        formatted = formatted.replace('&', ' & ')
+        formatted = formatted.replace('\\\\', '\\\\\n')
+    
+    # Restore proper line breaks for multi-line equations
+    formatted = formatted.replace('\\\\', '\\\\\n')
+    
+    # Fix common mistakes with parentheses
+    formatted = formatted.replace('( ', '(').replace(' )', ')')
+    
+    return formatted
+
+
+def load_corpus(path=CORPUS_PATH):
+    with open(path) as f:
+        return [line.rstrip('\n') for line in f if line.strip()]
+
+
+def throughput(formatter, corpus, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for expression in corpus:
+            formatter(expression)
+    elapsed = time.perf_counter() - start
+    return len(corpus) * repeat / elapsed, elapsed
+
+
+def idempotent_ratio(formatter, corpus):
+    stable = 0
+    for expression in corpus:
+        once = formatter(expression)
+        stable += formatter(once) == once
+    return stable / len(corpus)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=200)
+    parser.add_argument('--show-diffs', action='store_true')
+    args = parser.parse_args()
+
+    corpus = load_corpus()
+    # Long inputs are where repeated whole-string passes hurt most
+    long_corpus = [' + '.join(corpus[i:i + 10]) for i in range(0, len(corpus), 10)]
+
+    for name, exprs, repeat in [('corpus', corpus, args.repeat), ('long', long_corpus, args.repeat * 2)]:
+        legacy_rate, legacy_time = throughput(legacy_format_latex_content, exprs, repeat)
+        engine_rate, engine_time = throughput(format_latex_content, exprs, repeat)
+        print(f"[{name}] {len(exprs)} expressions x {repeat}")
+        print(f"  legacy: {legacy_rate:>10.0f} expr/s  ({legacy_time:.3f}s)")
+        print(f"  engine: {engine_rate:>10.0f} expr/s  ({engine_time:.3f}s)  {engine_rate / legacy_rate:.2f}x")
+
+    differing = [(e, legacy_format_latex_content(e), format_latex_content(e)) for e in corpus]
+    differing = [d for d in differing if d[1] != d[2]]
+    print(f"outputs differ on {len(differing)}/{len(corpus)} expressions")
+    print(f"idempotent: legacy {idempotent_ratio(legacy_format_latex_content, corpus):.0%}, "
+          f"engine {idempotent_ratio(format_latex_content, corpus):.0%}")
+
+    if args.show_diffs:
+        for expression, legacy, engine in differing:
+            print(f"\n  input:  {expression}\n  legacy: {legacy}\n  engine: {engine}")
+
+
+if __name__ == '__main__':
+    main()
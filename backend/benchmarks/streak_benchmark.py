@@ -0,0 +1,149 @@
+"""
+Benchmark for habit streak maintenance after a completion toggle.
+
+Builds habits with years of completion history and times three ways of
+getting the streak after a toggle: the previous walk-back loop over the
+completion list, a full recompute() over the history, and apply_toggle()
+from the stored state. A replay of random toggles checks that the
+incremental state always matches a recompute, and that both agree with the
+old loop on the current streak. It also times the compiled schedules'
+count() and mask() against the old per-day scheduling check.
+
+Usage (from backend/):
+    python -m benchmarks.streak_benchmark [--years N] [--toggles N] [--seed N]
+"""
+import argparse
+import random
+import time
+from datetime import date, timedelta
+from blueprints.habits.schedule import schedule_for
+from benchmarks.streak_reference import apply_toggle, recompute
+
+TODAY = date.today()
+
+HABITS = {
+    'daily, all kept': ({'type': 'daily', 'days': [1, 2, 3, 4, 5, 6, 0]}, 1.0),
+    'weekdays, 90%': ({'type': 'daily', 'days': [1, 2, 3, 4, 5]}, 0.9),
+    'every 3 days, 95%': ({'type': 'custom', 'interval': 3, 'startDate': '2018-01-01'}, 0.95),
+    'no days scheduled': ({'type': 'daily', 'days': []}, 0.5),
+    '3 times a week': ({'type': 'custom', 'timesPerWeek': 3}, 0.5),
+}
+
+
+# Previous implementation's scheduling check and streak loop, kept verbatim as the baseline
+def legacy_is_scheduled(check_date, frequency):
+    freq_type = frequency.get('type', 'daily')
+    if freq_type == 'daily':
+        day_of_week = check_date.weekday()
+        if day_of_week == 6:
+            day_of_week = 0
+        else:
+            day_of_week += 1
+        return day_of_week in frequency.get('days', [1, 2, 3, 4, 5, 6, 0])
+    elif freq_type == 'custom':
+        interval = frequency.get('interval', 1)
+        start_date = date.fromisoformat(frequency.get('startDate', '2023-01-01'))
+        days_since_start = (check_date - start_date).days
+        return days_since_start % interval == 0
+    return True
+
+
+def legacy_current_streak(completions, frequency, today):
+    completion_dates = sorted(completions, reverse=True)
+    current_streak = 0
+    check_date = today
+    while True:
+        if not legacy_is_scheduled(check_date, frequency):
+            check_date -= timedelta(days=1)
+            continue
+        if check_date in completion_dates:
+            current_streak += 1
+            check_date -= timedelta(days=1)
+        else:
+            break
+    return current_streak
+
+
+def history(frequency, rate, years, rng):
+    start = TODAY - timedelta(days=365 * years)
+    days = (start + timedelta(days=offset) for offset in range((TODAY - start).days + 1))
+    schedule = schedule_for(frequency)
+    return {day for day in days if schedule.scheduled(day) and rng.random() < rate}
+
+
+def timed(function, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        result = function()
+    return result, (time.perf_counter() - started) * 1000 / repeat
+
+
+def replay(frequency, completions, toggles, rng):
+    """Random toggles, mostly near today like real use; returns (checked, incremental hits, ms per toggle)"""
+    completions = set(completions)
+    state = recompute(completions, frequency, TODAY)
+    hits = 0
+    elapsed = 0.0
+    for _ in range(toggles):
+        day = TODAY - timedelta(days=int(rng.expovariate(1 / 3)))
+        completed = day not in completions
+        if completed:
+            completions.add(day)
+        else:
+            completions.discard(day)
+        started = time.perf_counter()
+        updated = apply_toggle(state, frequency, day, completed, TODAY)
+        if updated is None:
+            updated = recompute(completions, frequency, TODAY)
+        else:
+            hits += 1
+        elapsed += time.perf_counter() - started
+        expected = recompute(completions, frequency, TODAY)
+        assert updated == expected, (day, completed, updated, expected)
+        state = updated
+    return hits, elapsed * 1000 / toggles
+
+
+def main(args):
+    rng = random.Random(args.seed)
+    print(f'{args.years} years of history, today {TODAY}')
+    print(f'{"habit":<20}{"completions":>12}{"old loop ms":>13}{"recompute ms":>14}'
+          f'{"toggle ms":>11}{"incremental":>13}')
+    for name, (frequency, rate) in HABITS.items():
+        completions = history(frequency, rate, args.years, rng)
+        state, recompute_ms = timed(lambda: recompute(completions, frequency, TODAY), 20)
+        if frequency.get('timesPerWeek'):
+            # The old loop had no notion of a weekly target
+            legacy = 'n/a'
+        elif schedule_for(frequency).count(TODAY - timedelta(days=6), TODAY):
+            current, legacy_ms = timed(lambda: legacy_current_streak(completions, frequency, TODAY), 1)
+            assert current == state['current_streak'], (name, current, state)
+            legacy = f'{legacy_ms:.2f}'
+        else:
+            # The old loop never terminates here
+            legacy = 'hangs'
+        hits, toggle_ms = replay(frequency, completions, args.toggles, rng)
+        print(f'{name:<20}{len(completions):>12}{legacy:>13}{recompute_ms:>14.3f}'
+              f'{toggle_ms:>11.4f}{hits / args.toggles:>12.0%}')
+
+    start = TODAY - timedelta(days=365 * args.years)
+    days = [start + timedelta(days=offset) for offset in range((TODAY - start).days + 1)]
+    print(f'\nscheduled days over {len(days)} days')
+    print(f'{"habit":<20}{"old per-day ms":>16}{"count() ms":>12}{"mask() ms":>11}')
+    for name, (frequency, _) in HABITS.items():
+        if frequency.get('timesPerWeek'):
+            continue
+        schedule = schedule_for(frequency)
+        expected, legacy_ms = timed(lambda: [legacy_is_scheduled(day, frequency) for day in days], 5)
+        count, count_ms = timed(lambda: schedule.count(start, TODAY), 1000)
+        mask, mask_ms = timed(lambda: schedule.mask(start, TODAY), 1000)
+        assert mask.tolist() == expected and count == sum(expected), name
+        print(f'{name:<20}{legacy_ms:>16.3f}{count_ms:>12.4f}{mask_ms:>11.4f}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--years', type=int, default=5)
+    parser.add_argument('--toggles', type=int, default=2000)
+    parser.add_argument('--seed', type=int, default=1)
+    main(parser.parse_args())
@@ -0,0 +1,132 @@
+"""
+Reference streak implementation in Python.
+
+Streaks are maintained in Postgres by refresh_habit_streak (see
+migrations/habit_streaks_function_migration.sql); nothing in the app
+imports this. streak_benchmark uses it to time and cross-check the
+incremental and full computations.
+"""
+from datetime import date
+from typing import Dict, Iterable, Optional
+import numpy as np
+from blueprints.habits.schedule import Schedule, schedule_for
+
+
+def anchor_day(today: date, schedule: Schedule) -> Optional[date]:
+    """The scheduled day a current streak has to reach: today, or the last scheduled day before it"""
+    return today if schedule.scheduled(today) else schedule.previous(today)
+
+
+def _state(last_completed_at: Optional[date], run_length: int, longest: int, schedule: Schedule, today: date) -> Dict:
+    current = run_length if last_completed_at is not None and last_completed_at == anchor_day(today, schedule) else 0
+    return {
+        'current_streak': current,
+        'longest_streak': max(longest, run_length),
+        'last_completed_at': last_completed_at,
+        'last_run_length': run_length
+    }
+
+
+def runs(keys: np.ndarray):
+    """Start index and length of each run of consecutive integers in a sorted array"""
+    if not len(keys):
+        return keys, keys
+    starts = np.flatnonzero(np.diff(keys, prepend=keys[0] - 2) != 1)
+    return starts, np.diff(starts, append=len(keys))
+
+
+def _run_position(values: np.ndarray, starts: np.ndarray, value) -> int:
+    # 1-based position of `value` within its run, or 0 when it isn't in `values`
+    index = np.searchsorted(values, value)
+    if index == len(values) or values[index] != value:
+        return 0
+    return int(index - starts[np.searchsorted(starts, index, side='right') - 1] + 1)
+
+
+def _weekly_state(ordinals: np.ndarray, schedule: Schedule, today: date) -> Dict:
+    # Streaks of a weekly target count weeks; the week in progress extends the streak once it is met
+    weeks, completions = np.unique((ordinals - 1) // 7, return_counts=True)
+    met = weeks[completions >= schedule.weekly_target]
+    state = {'current_streak': 0, 'longest_streak': 0, 'last_run_length': 0,
+             'last_completed_at': date.fromordinal(int(ordinals[-1])) if len(ordinals) else None}
+    if not len(met):
+        return state
+    starts, lengths = runs(met)
+    this_week = (today.toordinal() - 1) // 7
+    state['longest_streak'] = int(lengths.max())
+    state['last_run_length'] = int(lengths[-1])
+    state['current_streak'] = _run_position(met, starts, this_week) or _run_position(met, starts, this_week - 1)
+    return state
+
+
+def recompute(completed_days: Iterable[date], frequency: Dict, today: date) -> Dict:
+    """
+    Streak state from a habit's full completion history, in array passes.
+
+    Completions on unscheduled days don't count. Runs are consecutive
+    scheduled days that were all completed, found where the schedule rank
+    of neighbouring completions steps by one; the current streak is the
+    part of the run that ends on anchor_day(today). Habits with a weekly
+    target count consecutive weeks that met it instead.
+    """
+    schedule = schedule_for(frequency)
+    ordinals = np.unique(np.fromiter((day.toordinal() for day in completed_days), dtype=np.int64))
+    if schedule.weekly_target:
+        return _weekly_state(ordinals, schedule, today)
+    ordinals = ordinals[schedule.scheduled_at(ordinals)]
+    if not len(ordinals):
+        return _state(None, 0, 0, schedule, today)
+
+    ranks = schedule.rank(ordinals)
+    starts, lengths = runs(ranks)
+    state = _state(date.fromordinal(int(ordinals[-1])), int(lengths[-1]), int(lengths.max()), schedule, today)
+    # A completion logged ahead of today leaves the run ending at the anchor in `current`
+    anchor = anchor_day(today, schedule)
+    state['current_streak'] = _run_position(ordinals, starts, anchor.toordinal()) if anchor else 0
+    return state
+
+
+def apply_toggle(state: Dict, frequency: Dict, day: date, completed: bool, today: date) -> Optional[Dict]:
+    """
+    Streak state after completing or un-completing one day, from the stored
+    state alone, or None when the change needs a recompute().
+
+    `state` is a habit_streaks row: last_completed_at is the latest completed
+    scheduled day and last_run_length the length of the run ending there.
+    Changes anywhere in that run are O(1); changes further back, or that
+    could lower the longest streak, are left to recompute().
+    """
+    schedule = schedule_for(frequency)
+    last = state.get('last_completed_at')
+    if isinstance(last, str):
+        last = date.fromisoformat(last)
+    run = state.get('last_run_length')
+    longest = state.get('longest_streak') or 0
+    if run is None or day > today or schedule.weekly_target:
+        # Rows from before last_run_length existed, future-dated completions, and week-based streaks
+        return None
+    if not schedule.scheduled(day):
+        return _state(last, run, longest, schedule, today)
+
+    if completed:
+        if last is None:
+            return _state(day, 1, longest, schedule, today)
+        if day == last:
+            return _state(last, run, longest, schedule, today)
+        if day > last:
+            run = run + 1 if schedule.previous(day) == last else 1
+            return _state(day, run, longest, schedule, today)
+        # Filling a gap can join two runs
+        return None
+
+    if last is None or day > last:
+        return _state(last, run, longest, schedule, today)
+    if run < longest:
+        # Splitting a run that isn't the longest keeps the part after `day`
+        position = schedule.count(day, last)
+        if position == 1 and run > 1:
+            return _state(schedule.previous(day), run - 1, longest, schedule, today)
+        if 1 < position <= run:
+            return _state(last, position - 1, longest, schedule, today)
+    # Breaking the run could shorten the longest streak, or reveal an earlier last completion
+    return None
@@ -7,6 +7,9 @@ from datetime import datetime
 import json
 from flask_cors import cross_origin
 from db import db
+from mutations import update_row, delete_row
+from read_cache import read_cache
+from conditional import conditional
 
 finance_blueprint = Blueprint('finance_blueprint', __name__, url_prefix='/finance')
 
@@ -22,6 +25,7 @@ def finance():
 @finance_blueprint.route('/transactions', methods=['GET'])
 @cross_origin()
 @jwt_required()
+@conditional('transactions')
 def get_transactions():
     user_id = get_jwt_identity()
     
@@ -92,12 +96,9 @@ def add_transaction():
 def delete_transaction(transaction_id):
     user_id = get_jwt_identity()
     
-    # Delete transaction from Supabase
-    result = db.table('transactions').delete().eq('id', transaction_id).eq('user_id', user_id).execute()
-    
-    if result.row_count:
-        return jsonify({'message': 'Transaction deleted successfully'}), 200
-    return jsonify({'error': 'Transaction not found'}), 404
+    # Delete transaction from Supabase; zero matched rows answers 404
+    delete_row('transactions', not_found='Transaction not found', id=transaction_id, user_id=user_id)
+    return jsonify({'message': 'Transaction deleted successfully'}), 200
 
 @finance_blueprint.route('/transactions/<transaction_id>', methods=['PUT'])
 @cross_origin()
@@ -109,11 +110,13 @@ def update_transaction(transaction_id):
     # Filter out None values and create update document
     update_data = {k: v for k, v in data.items() if v is not None}
     
-    result = db.table('transactions').update(update_data).eq('id', transaction_id).eq('user_id', user_id).execute()
-    
-    if result.data:
-        return jsonify(result.data[0]), 200
-    return jsonify({'error': 'Transaction not found'}), 404
+    # Ownership can't be changed through the body
+    update_data.pop('id', None)
+    update_data.pop('user_id', None)
+
+    transaction = update_row('transactions', update_data, not_found='Transaction not found',
+                             id=transaction_id, user_id=user_id)
+    return jsonify(transaction), 200
 
 # Categories endpoints
 @finance_blueprint.route('/categories', methods=['GET'])
@@ -122,9 +125,10 @@ def update_transaction(transaction_id):
 def get_categories():
     user_id = get_jwt_identity()
     
-    # Fetch categories from Supabase
-    categories = db.table('categories').select('*').eq('user_id', user_id).execute()
-    return jsonify(categories.data)
+    # Fetch categories from Supabase, or the cached copy until one is added
+    categories = read_cache.get(user_id, 'categories',
+                                lambda: db.table('categories').select('*').eq('user_id', user_id).execute().data)
+    return jsonify(categories)
 
 @finance_blueprint.route('/categories', methods=['POST'])
 @cross_origin()
@@ -149,6 +153,7 @@ def add_category():
     }
     
     result = db.table('categories').insert(category).execute()
+    read_cache.invalidate(user_id, 'categories')
     
     if result.data:
         return jsonify(result.data[0]), 201
@@ -162,9 +167,10 @@ def add_category():
 def get_budgets():
     user_id = get_jwt_identity()
     
-    # Fetch budgets from Supabase
-    budgets = db.table('budgets').select('*').eq('user_id', user_id).execute()
-    return jsonify(budgets.data)
+    # Fetch budgets from Supabase, or the cached copy until one is added
+    budgets = read_cache.get(user_id, 'budgets',
+                             lambda: db.table('budgets').select('*').eq('user_id', user_id).execute().data)
+    return jsonify(budgets)
 
 @finance_blueprint.route('/budgets', methods=['POST'])
 @cross_origin()
@@ -188,6 +194,7 @@ def add_budget():
     
     # Insert budget into Supabase
     result = db.table('budgets').insert(budget).execute()
+    read_cache.invalidate(user_id, 'budgets')
     
     if result.data:
         return jsonify(result.data[0]), 201
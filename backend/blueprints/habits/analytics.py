@@ -0,0 +1,174 @@
+from datetime import date
+from itertools import repeat
+from operator import itemgetter
+from typing import Dict, List
+import numpy as np
+from blueprints.habits.schedule import schedule_for
+
+EPOCH = np.datetime64('0001-01-01')
+
+
+def _rate_array(credit: np.ndarray, due: np.ndarray) -> np.ndarray:
+    # NaN for periods with nothing due, so an unscheduled week doesn't read as a missed one
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(due > 0, np.round(np.minimum(credit / due, 1.0), 4), np.nan)
+
+
+def _rates(credit: np.ndarray, due: np.ndarray) -> List:
+    return [None if rate != rate else rate for rate in _rate_array(credit, due).tolist()]
+
+
+def _rate_rows(credit: np.ndarray, due: np.ndarray) -> List[List]:
+    """_rates for every row of a habits x periods grid, in one NumPy pass"""
+    return [[None if rate != rate else rate for rate in row] for row in _rate_array(credit, due).tolist()]
+
+
+def _weekdays(rates: List) -> Dict:
+    ranked = [day for day in range(7) if rates[day] is not None]
+    return {
+        'weekday_rates': rates,
+        'best_weekday': max(ranked, key=lambda day: rates[day]) if ranked else None,
+        'worst_weekday': min(ranked, key=lambda day: rates[day]) if ranked else None
+    }
+
+
+def _segments(hits: np.ndarray, keys: np.ndarray, firsts: np.ndarray, lasts: np.ndarray) -> List[Dict]:
+    """
+    Streak segments of every row of `hits` at once: runs of hit cells whose
+    `keys` step by one. `firsts` and `lasts` hold the ISO first and last day
+    of each column. Column-wise per row, since years of history can hold
+    thousands of segments.
+    """
+    rows, columns = np.nonzero(hits)
+    steps = keys[rows, columns]
+    new_run = np.ones(len(rows), dtype=bool)
+    new_run[1:] = (rows[1:] != rows[:-1]) | (np.diff(steps) != 1)
+    starts = np.flatnonzero(new_run)
+    ends = np.append(starts[1:], len(rows))[:len(starts)] - 1
+    start_days = firsts[columns[starts]].tolist()
+    end_days = lasts[columns[ends]].tolist()
+    lengths = (ends - starts + 1).tolist()
+    bounds = np.searchsorted(rows[starts], np.arange(len(hits) + 1)).tolist()
+    return [{'starts': start_days[low:high], 'ends': end_days[low:high], 'lengths': lengths[low:high]}
+            for low, high in zip(bounds, bounds[1:])]
+
+
+def habit_stats(habits: List[Dict], completions: List[Dict], start: date, end: date) -> Dict:
+    """
+    Completion rates, rollups, streak segments and weekday strengths for a
+    user's habits over [start, end], from one load of their completions.
+
+    The range becomes a habits x days grid of what was due and what was
+    done, built from each habit's compiled schedule mask; every figure is a
+    sum over that grid. A habit only owes days from its creation or first
+    completion, whichever is earlier. Habits with a weekly target owe
+    target/7 per day and get credit for at most `target` completions a
+    week, and their streak segments are in weeks. Weekdays are numbered as
+    in `frequency.days`, 0 = Sunday.
+    """
+    ordinals = np.arange(start.toordinal(), end.toordinal() + 1)
+    days = EPOCH + (ordinals - 1)
+    shape = (len(habits), len(ordinals))
+
+    # Grid coordinates through dict lookups; completed_at is a DATE column, so plain ISO dates
+    habit_rows = {habit['id']: row for row, habit in enumerate(habits)}
+    day_names = np.datetime_as_string(days)
+    day_columns = dict(zip(day_names.tolist(), range(len(ordinals))))
+    rows = np.fromiter(map(habit_rows.get, map(itemgetter('habit_id'), completions), repeat(-1)),
+                       dtype=np.int64, count=len(completions))
+    columns = np.fromiter(map(day_columns.get, map(itemgetter('completed_at'), completions), repeat(-1)),
+                          dtype=np.int64, count=len(completions))
+    inside = (rows >= 0) & (columns >= 0)
+    done = np.zeros(shape, dtype=bool)
+    done[rows[inside], columns[inside]] = True
+
+    week_numbers = (ordinals - 1) // 7
+    week_starts = np.flatnonzero(np.diff(week_numbers, prepend=week_numbers[0] - 1))
+    week_ends = np.append(week_starts[1:], len(ordinals)) - 1
+    week_index = week_numbers - week_numbers[0]
+    months = days.astype('datetime64[M]')
+    month_starts = np.flatnonzero(np.diff(months.astype(np.int64), prepend=-1))
+    # Ordinal 1 is a Monday, so ordinal % 7 is the frontend's Sunday-based weekday
+    weekday_onehot = np.eye(7)[ordinals % 7]
+
+    # Habits with the same frequency share a compiled schedule, so each mask is evaluated once
+    due = np.zeros(shape)
+    ranks = np.zeros(shape, dtype=np.int64)
+    targets = np.zeros(len(habits))
+    evaluated = {}
+    for row, habit in enumerate(habits):
+        schedule = schedule_for(habit.get('frequency'))
+        if schedule.weekly_target:
+            targets[row] = schedule.weekly_target
+            continue
+        if id(schedule) not in evaluated:
+            evaluated[id(schedule)] = (schedule.scheduled_at(ordinals), schedule.rank(ordinals))
+        due[row], ranks[row] = evaluated[id(schedule)]
+    weekly = targets > 0
+    credit = (done & (due > 0)).astype(float)
+
+    # Weekly targets get credit for at most `target` completions in each week
+    per_week = np.add.reduceat(done[weekly], week_starts, axis=1)
+    weekly_targets = targets[weekly][:, None]
+    due[weekly] = weekly_targets / 7
+    credit[weekly] = done[weekly] * np.minimum(1.0, weekly_targets / np.maximum(per_week, 1))[:, week_index]
+
+    created = np.array([(habit.get('created_at') or start.isoformat())[:10] for habit in habits],
+                       dtype='datetime64[D]')
+    first_done = np.where(done.any(axis=1), done.argmax(axis=1), len(ordinals))
+    active_from = np.minimum(np.maximum((created - days[0]).astype(np.int64), 0), first_done)
+    owed = np.arange(len(ordinals)) >= active_from[:, None]
+    due *= owed
+    credit *= owed
+
+    day_segments = iter(_segments(credit[~weekly] > 0, ranks[~weekly], day_names, day_names))
+    week_keys = np.broadcast_to(np.arange(len(week_starts)), per_week.shape)
+    week_segments = iter(_segments(per_week >= weekly_targets, week_keys, day_names[week_starts],
+                                   day_names[week_ends]))
+
+    weekly_due = np.add.reduceat(due, week_starts, axis=1)
+    weekly_credit = np.add.reduceat(credit, week_starts, axis=1)
+    monthly_due = np.add.reduceat(due, month_starts, axis=1)
+    monthly_credit = np.add.reduceat(credit, month_starts, axis=1)
+    weekday_due = due @ weekday_onehot
+    weekday_credit = credit @ weekday_onehot
+    totals_due = due.sum(axis=1)
+    totals_credit = credit.sum(axis=1)
+    due_sum, credit_sum = totals_due.sum(), totals_credit.sum()
+    completion_rates = _rates(totals_credit, totals_due)
+    weekly_rates = _rate_rows(weekly_credit, weekly_due)
+    monthly_rates = _rate_rows(monthly_credit, monthly_due)
+    weekday_rates = _rate_rows(weekday_credit, weekday_due)
+    totals_due = totals_due.round(2).tolist()
+    totals_credit = totals_credit.round(2).tolist()
+
+    per_habit = []
+    for row, habit in enumerate(habits):
+        per_habit.append({
+            'habit_id': habit['id'],
+            'name': habit.get('name'),
+            'due': totals_due[row],
+            'completed': totals_credit[row],
+            'completion_rate': completion_rates[row],
+            'weekly_rates': weekly_rates[row],
+            'monthly_rates': monthly_rates[row],
+            'streak_unit': 'week' if weekly[row] else 'day',
+            'streaks': next(week_segments if weekly[row] else day_segments),
+            **_weekdays(weekday_rates[row])
+        })
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'weeks': day_names[week_starts].tolist(),
+        'months': np.datetime_as_string(months[month_starts]).tolist(),
+        'habits': per_habit,
+        'overall': {
+            'due': round(float(due_sum), 2),
+            'completed': round(float(credit_sum), 2),
+            'completion_rate': _rates(np.array([credit_sum]), np.array([due_sum]))[0],
+            'weekly_rates': _rates(weekly_credit.sum(axis=0), weekly_due.sum(axis=0)),
+            'monthly_rates': _rates(monthly_credit.sum(axis=0), monthly_due.sum(axis=0)),
+            **_weekdays(_rates(weekday_credit.sum(axis=0), weekday_due.sum(axis=0)))
+        }
+    }
@@ -1,5 +1,9 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from db import db
+from mutations import update_row, returning, RowNotFound
+from read_cache import read_cache
+from conditional import conditional
+from blueprints.habits.analytics import habit_stats
 import datetime
 from datetime import date, timedelta
 import uuid
@@ -7,43 +11,55 @@ from typing import List, Dict, Optional
 
 habits_blueprint = Blueprint('habits_blueprint', __name__, url_prefix='/habits')
 
+STATS_DEFAULT_DAYS = 365
+STATS_MAX_DAYS = 366 * 10
+COMPLETIONS_PAGE_SIZE = 1000
+BULK_MAX_OPERATIONS = 500
+
 @habits_blueprint.route('/main/', methods=['POST', 'GET'])
 def habits_test():
     response = jsonify({"message": "Habits Blueprint"})
     return response
 
 @habits_blueprint.route('/get_habits/<user_id>', methods=['GET'])
+@conditional('habits')
 def get_habits(user_id):
     try:
-        habits = db.from_('habits')\
-            .select('id, name, description, color, icon, frequency, archived, created_at')\
-            .eq('user_id', user_id)\
-            .eq('archived', False)\
-            .order('created_at')\
+        # Keyed by the database version too, so workers never serve a copy older than the ETag
+        habits = read_cache.get(user_id, 'habits', lambda: _load_habits(user_id), g.get('resource_versions'))
+        return jsonify(habits), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+def _load_habits(user_id: str) -> List[Dict]:
+    habits = db.from_('habits')\
+        .select('id, name, description, color, icon, frequency, archived, created_at')\
+        .eq('user_id', user_id)\
+        .eq('archived', False)\
+        .order('created_at')\
+        .execute()
+    
+    # Get streaks for each habit
+    habit_ids = [habit['id'] for habit in habits.data]
+    if habit_ids:
+        streaks = db.from_('habit_streaks')\
+            .select('habit_id, current_streak, longest_streak')\
+            .in_('habit_id', habit_ids)\
             .execute()
         
-        # Get streaks for each habit
-        habit_ids = [habit['id'] for habit in habits.data]
-        if habit_ids:
-            streaks = db.from_('habit_streaks')\
-                .select('habit_id, current_streak, longest_streak')\
-                .in_('habit_id', habit_ids)\
-                .execute()
-            
-            # Create a mapping of habit_id to streak info
-            streak_map = {streak['habit_id']: streak for streak in streaks.data}
-            
-            # Add streak info to each habit
-            for habit in habits.data:
-                streak_info = streak_map.get(habit['id'], {})
-                habit['streak'] = streak_info.get('current_streak', 0)
-                habit['longest_streak'] = streak_info.get('longest_streak', 0)
+        # Create a mapping of habit_id to streak info
+        streak_map = {streak['habit_id']: streak for streak in streaks.data}
         
-        return jsonify(habits.data), 200
-    except Exception as e:
-        return jsonify({"status": "error", "message": str(e)}), 500
+        # Add streak info to each habit
+        for habit in habits.data:
+            streak_info = streak_map.get(habit['id'], {})
+            habit['streak'] = streak_info.get('current_streak', 0)
+            habit['longest_streak'] = streak_info.get('longest_streak', 0)
+    
+    return habits.data
 
 @habits_blueprint.route('/get_completions/<user_id>', methods=['GET'])
+@conditional('habits', 'completions')
 def get_completions(user_id):
     try:
         # Get date range parameters
@@ -78,6 +94,60 @@ def get_completions(user_id):
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
+@habits_blueprint.route('/stats/<user_id>', methods=['GET'])
+def get_stats(user_id):
+    try:
+        end_date = date.fromisoformat(request.args['end_date']) if request.args.get('end_date') else date.today()
+        start_date = date.fromisoformat(request.args['start_date']) if request.args.get('start_date') \
+            else end_date - timedelta(days=STATS_DEFAULT_DAYS - 1)
+    except ValueError:
+        return jsonify({"status": "error", "message": "Invalid date"}), 400
+    if start_date > end_date or (end_date - start_date).days >= STATS_MAX_DAYS:
+        return jsonify({"status": "error", "message": f"Date range must span 1 to {STATS_MAX_DAYS} days"}), 400
+
+    try:
+        # Dropped by every toggle, so the grid is only rebuilt after the user's history changes
+        stats = read_cache.get(user_id, 'habit_stats', lambda: _load_stats(user_id, start_date, end_date), {
+            'start': start_date.isoformat(),
+            'end': end_date.isoformat()
+        })
+        return jsonify(stats), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+def _load_stats(user_id: str, start_date: date, end_date: date) -> Dict:
+    habits = db.from_('habits')\
+        .select('id, name, frequency, created_at')\
+        .eq('user_id', user_id)\
+        .eq('archived', False)\
+        .order('created_at')\
+        .execute()
+
+    completions = _load_completions([habit['id'] for habit in habits.data], start_date, end_date)
+    return habit_stats(habits.data, completions, start_date, end_date)
+
+def _load_completions(habit_ids: List[str], start_date: Optional[date] = None,
+                      end_date: Optional[date] = None) -> List[Dict]:
+    """Completions of `habit_ids`, optionally within a date range"""
+    completions = []
+    while habit_ids:
+        query = db.from_('habit_completions')\
+            .select('habit_id, completed_at')\
+            .in_('habit_id', habit_ids)
+        if start_date:
+            query = query.gte('completed_at', start_date.isoformat())
+        if end_date:
+            query = query.lte('completed_at', end_date.isoformat())
+        # PostgREST caps each response, so years of history come back in pages
+        page = query.order('completed_at')\
+            .order('habit_id')\
+            .range(len(completions), len(completions) + COMPLETIONS_PAGE_SIZE - 1)\
+            .execute()
+        completions.extend(page.data)
+        if len(page.data) < COMPLETIONS_PAGE_SIZE:
+            break
+    return completions
+
 @habits_blueprint.route('/add_habit', methods=['POST'])
 def add_habit():
     try:
@@ -109,6 +179,7 @@ def add_habit():
         }
         
         db.from_('habit_streaks').insert([streak_info]).execute()
+        read_cache.invalidate(data['user_id'], 'habits', 'habit_stats')
         
         return jsonify(new_habit), 201
     except Exception as e:
@@ -119,37 +190,100 @@ def toggle_completion():
     try:
         data = request.json
         habit_id = data['habit_id']
-        date_str = data['date']  # Format: YYYY-MM-DD
-        
-        # Check if completion exists
-        completion = db.from_('habit_completions')\
-            .select('id')\
-            .eq('habit_id', habit_id)\
-            .eq('completed_at', date_str)\
+        day = date.fromisoformat(data['date'])  # Format: YYYY-MM-DD
+    except (TypeError, KeyError, ValueError):
+        return jsonify({"status": "error", "message": "habit_id and date (YYYY-MM-DD) are required"}), 400
+    try:
+        habit_id = str(uuid.UUID(str(habit_id)))
+        user_id = str(uuid.UUID(str(data['user_id']))) if data.get('user_id') else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "habit_id and user_id must be UUIDs"}), 400
+
+    try:
+        # Flips the completion and returns the streak the habit_completions trigger refreshed
+        result = db.rpc('toggle_habit_completion', {
+            'p_habit_id': habit_id,
+            'p_day': day.isoformat(),
+            'p_user_id': user_id
+        }).execute().data
+        if not result:
+            return jsonify({"status": "error", "message": "Habit not found"}), 404
+        toggled = result[0]
+        read_cache.invalidate(toggled['user_id'], 'habits', 'habit_stats')
+
+        return jsonify({
+            "status": "success",
+            "completed": toggled['completed'],
+            "streak": toggled['current_streak'],
+            "longest_streak": toggled['longest_streak']
+        }), 200
+    except Exception as e:
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+@habits_blueprint.route('/bulk_toggle', methods=['POST'])
+def bulk_toggle():
+    """
+    Set many completions at once: {"operations": [{"habit_id", "date", "completed"}, ...]},
+    optionally with the owner's "user_id". The last operation for a habit and date wins.
+    """
+    data = request.json or {}
+    operations = data.get('operations')
+    if not isinstance(operations, list) or not 0 < len(operations) <= BULK_MAX_OPERATIONS:
+        return jsonify({"status": "error",
+                        "message": f"operations must be a list of 1 to {BULK_MAX_OPERATIONS} items"}), 400
+    changes = {}
+    try:
+        for operation in operations:
+            if not isinstance(operation['habit_id'], str) or not isinstance(operation['completed'], bool):
+                raise ValueError(operation)
+            habit_id = str(uuid.UUID(operation['habit_id']))
+            changes[(habit_id, date.fromisoformat(operation['date']))] = operation['completed']
+    except (TypeError, KeyError, ValueError):
+        return jsonify({"status": "error",
+                        "message": "Each operation needs habit_id (UUID), date (YYYY-MM-DD) and completed (true/false)"}), 400
+    try:
+        user_id = str(uuid.UUID(str(data['user_id']))) if data.get('user_id') else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "user_id must be a UUID"}), 400
+
+    try:
+        habit_ids = sorted({habit_id for habit_id, _ in changes})
+        query = db.from_('habits').select('id, user_id, frequency').in_('id', habit_ids)
+        if user_id:
+            query = query.eq('user_id', user_id)
+        habits = {habit['id']: habit for habit in query.execute().data}
+        missing = [habit_id for habit_id in habit_ids if habit_id not in habits]
+        if missing:
+            return jsonify({"status": "error", "message": "Habit not found", "habit_ids": missing}), 404
+
+        created_at = datetime.datetime.now().isoformat()
+        added = [{'habit_id': habit_id, 'completed_at': day.isoformat(), 'created_at': created_at}
+                 for (habit_id, day), completed in changes.items() if completed]
+        removed = [f'and(habit_id.eq.{habit_id},completed_at.eq.{day.isoformat()})'
+                   for (habit_id, day), completed in changes.items() if not completed]
+        if added:
+            # Days that are already complete keep their row as it is
+            returning(db.from_('habit_completions').upsert(added, on_conflict='habit_id,completed_at',
+                                                           ignore_duplicates=True), 'id').execute()
+        if removed:
+            returning(db.from_('habit_completions').delete().or_(','.join(removed)), 'id').execute()
+
+        # The habit_completions triggers have refreshed these by now
+        streaks = db.from_('habit_streaks')\
+            .select('habit_id, current_streak, longest_streak')\
+            .in_('habit_id', habit_ids)\
             .execute()
-        
-        if completion.data:
-            # If exists, delete it (toggle off)
-            db.from_('habit_completions')\
-                .delete()\
-                .eq('habit_id', habit_id)\
-                .eq('completed_at', date_str)\
-                .execute()
-            completed = False
-        else:
-            # If doesn't exist, add it (toggle on)
-            new_completion = {
-                'habit_id': habit_id,
-                'completed_at': date_str,
-                'created_at': datetime.datetime.now().isoformat()
-            }
-            db.from_('habit_completions').insert([new_completion]).execute()
-            completed = True
-        
-        # Update streak
-        _update_streak(habit_id)
-        
-        return jsonify({"status": "success", "completed": completed}), 200
+        for user_id in {habit['user_id'] for habit in habits.values()}:
+            read_cache.invalidate(user_id, 'habits', 'habit_stats')
+
+        return jsonify({
+            "status": "success",
+            "results": [{'habit_id': habit_id, 'date': day.isoformat(), 'completed': completed}
+                        for (habit_id, day), completed in changes.items()],
+            "streaks": {streak['habit_id']: {'current_streak': streak['current_streak'],
+                                             'longest_streak': streak['longest_streak']}
+                        for streak in streaks.data}
+        }), 200
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
@@ -157,7 +291,6 @@ def toggle_completion():
 def update_habit():
     try:
         data = request.json
-        habit_id = data['id']
         
         updated_data = {
             'name': data['name'],
@@ -168,15 +301,13 @@ def update_habit():
             'updated_at': datetime.datetime.now().isoformat()
         }
         
-        db.from_('habits')\
-            .update(updated_data)\
-            .eq('id', habit_id)\
-            .execute()
-            
-        # After updating frequency, recalculate streak
-        _update_streak(habit_id)
+        # A changed frequency has the habits trigger recompute the streak
+        habit = update_row('habits', updated_data, not_found='Habit not found', **_habit_filters(data))
+        read_cache.invalidate(habit['user_id'], 'habits', 'habit_stats')
         
-        return jsonify({"status": "success"}), 200
+        return jsonify({"status": "success", "habit": habit}), 200
+    except RowNotFound as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
@@ -184,116 +315,21 @@ def update_habit():
 def archive_habit():
     try:
         data = request.json
-        habit_id = data['id']
         archive = data.get('archive', True)
         
-        db.from_('habits')\
-            .update({'archived': archive, 'updated_at': datetime.datetime.now().isoformat()})\
-            .eq('id', habit_id)\
-            .execute()
+        habit = update_row('habits', {'archived': archive, 'updated_at': datetime.datetime.now().isoformat()},
+                           'id, user_id', not_found='Habit not found', **_habit_filters(data))
+        read_cache.invalidate(habit['user_id'], 'habits', 'habit_stats')
             
         return jsonify({"status": "success", "archived": archive}), 200
+    except RowNotFound as e:
+        return jsonify({"status": "error", "message": str(e)}), 404
     except Exception as e:
         return jsonify({"status": "error", "message": str(e)}), 500
 
-def _update_streak(habit_id: str):
-    """Update the streak information for a habit"""
-    try:
-        # Get habit frequency info
-        habit = db.from_('habits')\
-            .select('frequency')\
-            .eq('id', habit_id)\
-            .execute()
-            
-        if not habit.data:
-            return
-            
-        frequency = habit.data[0]['frequency']
-        today = date.today()
-        
-        # Get all completions for this habit
-        completions = db.from_('habit_completions')\
-            .select('completed_at')\
-            .eq('habit_id', habit_id)\
-            .order('completed_at', desc=True)\
-            .execute()
-            
-        # Convert to date objects and sort
-        completion_dates = [date.fromisoformat(c['completed_at']) for c in completions.data]
-        completion_dates.sort(reverse=True)
-        
-        # Calculate current streak
-        current_streak = 0
-        check_date = today
-        
-        while True:
-            # Skip days when habit is not scheduled
-            if not _is_habit_scheduled_for_date(check_date, frequency):
-                check_date -= timedelta(days=1)
-                continue
-                
-            if check_date in completion_dates:
-                current_streak += 1
-                check_date -= timedelta(days=1)
-            else:
-                break
-        
-        # Get existing streak data
-        streak_data = db.from_('habit_streaks')\
-            .select('*')\
-            .eq('habit_id', habit_id)\
-            .execute()
-            
-        if streak_data.data:
-            longest_streak = streak_data.data[0]['longest_streak']
-            # Update longest streak if current is greater
-            if current_streak > longest_streak:
-                longest_streak = current_streak
-                
-            # Update streak in database
-            db.from_('habit_streaks')\
-                .update({
-                    'current_streak': current_streak,
-                    'longest_streak': longest_streak,
-                    'last_completed_at': today.isoformat() if completion_dates else None,
-                    'updated_at': datetime.datetime.now().isoformat()
-                })\
-                .eq('habit_id', habit_id)\
-                .execute()
-        else:
-            # Insert new streak record
-            db.from_('habit_streaks')\
-                .insert([{
-                    'habit_id': habit_id,
-                    'current_streak': current_streak,
-                    'longest_streak': current_streak,
-                    'last_completed_at': today.isoformat() if completion_dates else None,
-                    'updated_at': datetime.datetime.now().isoformat()
-                }])\
-                .execute()
-                
-    except Exception as e:
-        print(f"Error updating streak: {str(e)}")
-
-def _is_habit_scheduled_for_date(check_date: date, frequency: Dict) -> bool:
-    """Check if habit is scheduled for the given date based on frequency settings"""
-    freq_type = frequency.get('type', 'daily')
-    
-    if freq_type == 'daily':
-        # Check if this day of week is included
-        day_of_week = check_date.weekday()  # 0-6 (Monday-Sunday)
-        if day_of_week == 6:  # Convert Sunday from 6 to 0 to match frontend format
-            day_of_week = 0
-        else:
-            day_of_week += 1  # Convert to 1-6 (Monday-Saturday)
-            
-        return day_of_week in frequency.get('days', [1,2,3,4,5,6,0])
-        
-    elif freq_type == 'custom':
-        # For custom interval (every X days)
-        interval = frequency.get('interval', 1)
-        start_date = date.fromisoformat(frequency.get('startDate', '2023-01-01'))
-        days_since_start = (check_date - start_date).days
-        return days_since_start % interval == 0
-        
-    return True  # Default to scheduled if no matching frequency type
\ No newline at end of file
+def _habit_filters(data: Dict) -> Dict:
+    """Row filters for a habit mutation; the owner is checked too when the client sends it"""
+    filters = {'id': data['id']}
+    if data.get('user_id'):
+        filters['user_id'] = data['user_id']
+    return filters
@@ -0,0 +1,153 @@
+import json
+import threading
+from abc import ABC, abstractmethod
+from datetime import date, timedelta
+from typing import Dict, Optional
+import numpy as np
+from cachetools import LRUCache
+
+ALL_DAYS = [0, 1, 2, 3, 4, 5, 6]
+
+
+class Schedule(ABC):
+    """
+    Which days a habit is due, compiled once from its `frequency` JSON.
+
+    Every query works on date ordinals through rank(): the number of
+    scheduled days up to and including a day. Counting a range is then two
+    lookups, and the array forms evaluate a whole range in one NumPy pass.
+    """
+    # Completions wanted per Monday-to-Sunday week, for habits that are due on no particular days
+    weekly_target = None
+
+    @abstractmethod
+    def rank(self, ordinals):
+        """Scheduled days up to and including each ordinal"""
+
+    def scheduled_at(self, ordinals):
+        """Elementwise: is each ordinal a scheduled day"""
+        ordinals = np.asarray(ordinals)
+        return self.rank(ordinals) != self.rank(ordinals - 1)
+
+    @abstractmethod
+    def scheduled(self, day: date) -> bool:
+        """Whether the habit is due on day"""
+
+    def count(self, start: date, end: date) -> int:
+        """Scheduled days from start to end, both included"""
+        if end < start:
+            return 0
+        return int(self.rank(end.toordinal()) - self.rank(start.toordinal() - 1))
+
+    def mask(self, start: date, end: date) -> np.ndarray:
+        """One boolean per day from start to end, True on scheduled days"""
+        return self.scheduled_at(np.arange(start.toordinal(), end.toordinal() + 1))
+
+    @abstractmethod
+    def previous(self, day: date) -> Optional[date]:
+        """Last scheduled day before day, or None if there is none"""
+
+    @abstractmethod
+    def next(self, day: date) -> Optional[date]:
+        """First scheduled day after day, or None if there is none"""
+
+
+class WeekdaySchedule(Schedule):
+    """Due on a fixed set of weekdays"""
+
+    def __init__(self, weekdays):
+        # Python weekdays, Monday = 0; ordinal 1 is a Monday
+        self.week = np.array([day in weekdays for day in range(7)])
+        self.prefix = np.concatenate(([0], np.cumsum(self.week)))
+        self.per_week = int(self.week.sum())
+        self.back = [self._offset(weekday, -1) for weekday in range(7)]
+        self.ahead = [self._offset(weekday, 1) for weekday in range(7)]
+
+    def _offset(self, weekday, step):
+        for distance in range(1, 8):
+            if self.week[(weekday + step * distance) % 7]:
+                return distance
+        return None
+
+    def rank(self, ordinals):
+        days = np.asarray(ordinals) - 1
+        return days // 7 * self.per_week + self.prefix[days % 7 + 1]
+
+    def scheduled_at(self, ordinals):
+        return self.week[(np.asarray(ordinals) - 1) % 7]
+
+    def scheduled(self, day: date) -> bool:
+        return bool(self.week[day.weekday()])
+
+    def previous(self, day: date) -> Optional[date]:
+        distance = self.back[day.weekday()]
+        return day - timedelta(days=distance) if distance else None
+
+    def next(self, day: date) -> Optional[date]:
+        distance = self.ahead[day.weekday()]
+        return day + timedelta(days=distance) if distance else None
+
+
+class IntervalSchedule(Schedule):
+    """Due every `interval` days counting from `start`"""
+
+    def __init__(self, start: date, interval: int):
+        self.origin = start.toordinal()
+        self.interval = interval
+
+    def rank(self, ordinals):
+        return (np.asarray(ordinals) - self.origin) // self.interval
+
+    def scheduled(self, day: date) -> bool:
+        return (day.toordinal() - self.origin) % self.interval == 0
+
+    def previous(self, day: date) -> Optional[date]:
+        offset = (day.toordinal() - self.origin) % self.interval
+        return day - timedelta(days=offset or self.interval)
+
+    def next(self, day: date) -> Optional[date]:
+        offset = (day.toordinal() - self.origin) % self.interval
+        return day + timedelta(days=self.interval - offset)
+
+
+class WeeklyTargetSchedule(WeekdaySchedule):
+    """Any day counts, and the habit is kept by completing it `times` times a week"""
+
+    def __init__(self, times: int):
+        super().__init__(range(7))
+        self.weekly_target = times
+
+
+def compile_schedule(frequency: Optional[Dict]) -> Schedule:
+    """
+    Build the schedule for a frequency as the habit form saves it: `daily` and
+    `weekly` with frontend weekday numbers (0 = Sunday), `custom` with either
+    timesPerWeek or an interval from startDate. Unknown types are due every day.
+    """
+    frequency = frequency or {}
+    freq_type = frequency.get('type', 'daily')
+    if freq_type in ('daily', 'weekly'):
+        days = frequency.get('days')
+        if days is None:
+            days = ALL_DAYS
+        return WeekdaySchedule({(int(day) - 1) % 7 for day in days})
+    if freq_type == 'custom':
+        if frequency.get('timesPerWeek'):
+            return WeeklyTargetSchedule(min(max(int(frequency['timesPerWeek']), 1), 7))
+        start_date = date.fromisoformat(frequency.get('startDate') or '2023-01-01')
+        return IntervalSchedule(start_date, max(int(frequency.get('interval') or 1), 1))
+    return WeekdaySchedule(range(7))
+
+
+_schedules = LRUCache(maxsize=1024)
+_schedules_lock = threading.Lock()
+
+
+def schedule_for(frequency: Optional[Dict]) -> Schedule:
+    """The compiled schedule for a habit's frequency, shared by every habit with the same one"""
+    key = json.dumps(frequency, sort_keys=True)
+    with _schedules_lock:
+        schedule = _schedules.get(key)
+        if schedule is None:
+            schedule = _schedules[key] = compile_schedule(frequency)
+        return schedule
@@ -0,0 +1,163 @@
+import json
+from typing import Dict, List, Union
+
+EXCERPT_LENGTH = 160
+
+
+def parse_blocks(note: Union[str, List, None]) -> List[Dict]:
+    """Return the BlockNote block array stored in a note's `note` column"""
+    if not note:
+        return []
+    if isinstance(note, str):
+        try:
+            note = json.loads(note)
+        except json.JSONDecodeError:
+            return []
+    return note if isinstance(note, list) else []
+
+
+def _inline_text(content) -> List[str]:
+    # Inline content is a string (code blocks), a list of text/link items,
+    # or a table content object with rows of cells.
+    if isinstance(content, str):
+        return [content]
+    parts = []
+    if isinstance(content, dict):
+        for row in content.get('rows', []):
+            for cell in row.get('cells', []):
+                parts.extend(_inline_text(cell))
+        return parts
+    for item in content or []:
+        if isinstance(item, str):
+            parts.append(item)
+        elif isinstance(item, dict):
+            if 'text' in item:
+                parts.append(item['text'])
+            elif 'content' in item:
+                parts.extend(_inline_text(item['content']))
+    return parts
+
+
+def extract_plaintext(note: Union[str, List, None]) -> str:
+    """Flatten a BlockNote document into plain text, one line per block"""
+    lines = []
+    stack = list(reversed(parse_blocks(note)))
+    while stack:
+        block = stack.pop()
+        if not isinstance(block, dict):
+            continue
+        text = ''.join(_inline_text(block.get('content'))).strip()
+        if text:
+            lines.append(text)
+        stack.extend(reversed(block.get('children') or []))
+    return '\n'.join(lines)
+
+
+def _excerpt_from_text(text: str, length: int) -> str:
+    text = ' '.join(text.split())
+    if len(text) <= length:
+        return text
+    return text[:length].rsplit(' ', 1)[0] + '...'
+
+
+def make_excerpt(note: Union[str, List, None], length: int = EXCERPT_LENGTH) -> str:
+    """Short single-line preview of a note for list views"""
+    return _excerpt_from_text(extract_plaintext(note), length)
+
+
+def text_columns(note: Union[str, List, None]) -> Dict[str, str]:
+    """Derived plaintext columns stored next to the note body on every save"""
+    text = extract_plaintext(note)
+    return {
+        'excerpt': _excerpt_from_text(text, EXCERPT_LENGTH),
+        'search_text': text
+    }
+
+
+class BlockPatchError(ValueError):
+    """Raised when a block operation cannot be applied to a document"""
+
+
+def _find_block(blocks: List[Dict], block_id: str):
+    """Locate a block anywhere in the tree, returning (containing list, index)"""
+    stack = [blocks]
+    while stack:
+        siblings = stack.pop()
+        for index, block in enumerate(siblings):
+            if block.get('id') == block_id:
+                return siblings, index
+            if block.get('children'):
+                stack.append(block['children'])
+    raise BlockPatchError(f"Block {block_id} not found")
+
+
+def _insert_block(blocks: List[Dict], block: Dict, op: Dict):
+    # Position is either right after a sibling (`after`) or at the start of
+    # a parent's children (`parent`), falling back to the top of the document.
+    if op.get('after'):
+        siblings, index = _find_block(blocks, op['after'])
+        siblings.insert(index + 1, block)
+    elif op.get('parent'):
+        siblings, index = _find_block(blocks, op['parent'])
+        siblings[index].setdefault('children', []).insert(0, block)
+    else:
+        blocks.insert(0, block)
+
+
+def apply_block_ops(blocks: List[Dict], ops: List[Dict]) -> List[Dict]:
+    """
+    Apply block-level changes to a BlockNote document in place.
+
+    Supported operations, keyed by block id:
+    - insert: {"op": "insert", "block": {...}, "after": id?, "parent": id?}
+    - update: {"op": "update", "id": id, "block": {...}}
+    - delete: {"op": "delete", "id": id}
+    - move:   {"op": "move", "id": id, "after": id?, "parent": id?}
+    """
+    for op in ops:
+        if not isinstance(op, dict):
+            raise BlockPatchError("Each block operation must be an object")
+        kind = op.get('op')
+        if kind == 'insert':
+            block = op.get('block')
+            if not isinstance(block, dict) or not block.get('id'):
+                raise BlockPatchError("Insert requires a block with an id")
+            _insert_block(blocks, block, op)
+        elif kind == 'update':
+            if not isinstance(op.get('block'), dict):
+                raise BlockPatchError("Update requires a block object")
+            siblings, index = _find_block(blocks, op.get('id'))
+            changes = {k: v for k, v in op['block'].items() if k != 'id'}
+            siblings[index].update(changes)
+        elif kind == 'delete':
+            siblings, index = _find_block(blocks, op.get('id'))
+            del siblings[index]
+        elif kind == 'move':
+            siblings, index = _find_block(blocks, op.get('id'))
+            block = siblings.pop(index)
+            try:
+                _insert_block(blocks, block, op)
+            except BlockPatchError:
+                siblings.insert(index, block)
+                raise
+        else:
+            raise BlockPatchError(f"Unknown block operation: {kind}")
+    return blocks
+
+
+def chunk_blocks(blocks: List[Dict], max_chars: int) -> List[List[Dict]]:
+    """
+    Split top-level blocks into consecutive chunks whose serialized size stays
+    under max_chars. A single block larger than the limit gets its own chunk.
+    """
+    chunks, current, size = [], [], 0
+    for block in blocks:
+        block_size = len(json.dumps(block))
+        if current and size + block_size > max_chars:
+            chunks.append(current)
+            current, size = [], 0
+        current.append(block)
+        size += block_size
+    if current:
+        chunks.append(current)
+    return chunks
@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from io import BytesIO
+import PIL.Image
+from db import db
+from blueprints.notes.uploads import storage_http, STORAGE_URL, public_url
+
+COVER_BUCKET = "cover_images"
+# Widths of the resized copies generated for every cover image
+VARIANT_WIDTHS = {'card': 400, 'header': 1200, 'full': 2048}
+WEBP_QUALITY = 80
+
+# Resizing and encoding are CPU-bound and run in worker processes; the
+# download/upload around them is I/O and runs on a small thread pool.
+_process_pool = None
+_io_pool = ThreadPoolExecutor(max_workers=2)
+
+
+def _get_process_pool():
+    global _process_pool
+    if _process_pool is None:
+        # Created from a request thread, so workers are spawned, not forked
+        # from a process whose other threads may hold locks
+        _process_pool = ProcessPoolExecutor(
+            max_workers=int(os.environ.get('IMAGE_WORKERS', 2)),
+            mp_context=multiprocessing.get_context('spawn')
+        )
+    return _process_pool
+
+
+def variant_path(path, name):
+    # The full object path, extension included, so cover.png and cover.jpg
+    # in one folder get separate variants
+    return f"variants/{path}/{name}.webp"
+
+
+def render_variants(data: bytes) -> dict:
+    """Resize an image to every variant width and encode each as WebP"""
+    image = PIL.Image.open(BytesIO(data))
+    image.load()
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'A' in image.getbands() else 'RGB')
+
+    variants = {}
+    for name, width in VARIANT_WIDTHS.items():
+        # Never upscale; the largest variant is capped at the original width
+        target = min(width, image.width)
+        if target < width and name != 'full':
+            continue
+        height = max(1, round(image.height * target / image.width))
+        resized = image if target == image.width else image.resize((target, height), PIL.Image.LANCZOS)
+        out = BytesIO()
+        resized.save(out, 'WEBP', quality=WEBP_QUALITY, method=4)
+        variants[name] = (target, out.getvalue())
+    return variants
+
+
+def _process_cover(path, note_id, user_id):
+    try:
+        response = storage_http.get(f"{STORAGE_URL}/object/{COVER_BUCKET}/{path}")
+        response.raise_for_status()
+        variants = _get_process_pool().submit(render_variants, response.content).result()
+
+        urls = {}
+        for name, (width, data) in variants.items():
+            target = variant_path(path, name)
+            upload = storage_http.post(
+                f"{STORAGE_URL}/object/{COVER_BUCKET}/{target}",
+                content=data,
+                headers={
+                    'content-type': 'image/webp',
+                    'cache-control': 'max-age=31536000',
+                    'x-upsert': 'true'
+                }
+            )
+            upload.raise_for_status()
+            urls[name] = {'url': public_url(COVER_BUCKET, target), 'width': width}
+
+        if note_id and user_id:
+            db.from_('notes').update({'cover_variants': urls})\
+                .eq('id', note_id)\
+                .eq('user_id', user_id)\
+                .execute()
+    except Exception as e:
+        print(f"Error generating cover variants for {path}: {str(e)}")
+
+
+def schedule_cover_variants(path, note_id=None, user_id=None):
+    """Generate resized WebP copies of an uploaded cover in the background"""
+    _io_pool.submit(_process_cover, path, note_id, user_id)
+
+
+def pick_variant(path, width, variants):
+    """
+    Path of the smallest variant of `path` at least `width` wide, else the widest,
+    or the original while none are recorded.
+
+    `variants` is the note's cover_variants, written once the variants are
+    uploaded; variant paths are deterministic, so Storage is never listed.
+    """
+    recorded = sorted(
+        (entry['width'], name) for name, entry in (variants or {}).items()
+        if name in VARIANT_WIDTHS and isinstance(entry, dict)
+        and str(entry.get('url', '')).endswith(variant_path(path, name))
+    )
+    if not recorded:
+        return path
+    for size, name in recorded:
+        if size >= width:
+            return variant_path(path, name)
+    return variant_path(path, recorded[-1][1])
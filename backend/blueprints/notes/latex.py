@@ -0,0 +1,290 @@
+import re
+
+# Bare words rewritten to their LaTeX command when they appear as a whole word
+WORD_COMMANDS = {
+    'frac', 'sum', 'int', 'prod', 'lim',
+    'sin', 'cos', 'tan', 'log', 'ln', 'exp',
+    'alpha', 'beta', 'gamma', 'delta', 'epsilon', 'theta', 'lambda', 'mu',
+    'pi', 'sigma', 'phi', 'omega',
+}
+WORD_REPLACEMENTS = {'inf': '\\infty'}
+
+SYMBOL_COMMANDS = {
+    '->': '\\rightarrow',
+    '<-': '\\leftarrow',
+    '<=': '\\leq',
+    '>=': '\\geq',
+    '!=': '\\neq',
+}
+
+# Every bare word or symbol that is rewritten, mapped to its replacement
+REWRITES = {word: '\\' + word for word in WORD_COMMANDS}
+REWRITES.update(WORD_REPLACEMENTS)
+REWRITES.update(SYMBOL_COMMANDS)
+
+# Commands whose brace argument is copied through untouched
+VERBATIM_COMMANDS = {'\\text', '\\textrm', '\\textbf', '\\mathrm', '\\operatorname', '\\begin', '\\end'}
+
+# How each token is spaced; anything not listed is written as-is
+_RELATION, _BINARY, _SPACED_BEFORE, _LINE_BREAK = 1, 2, 3, 4
+SPACING = {value: _RELATION for value in SYMBOL_COMMANDS.values()}
+SPACING.update({'=': _RELATION, '&': _RELATION, '+': _BINARY, '-': _BINARY, '\\\\': _LINE_BREAK})
+SPACING.update(dict.fromkeys(('\\left', '\\right', '\\big', '\\Big'), _SPACED_BEFORE))
+
+# After these a + or - is a sign, not a binary operator
+OPENERS = {'(', '[', '{', '_', '^', '$', '&', '+', '-', '=', ','} | set(SYMBOL_COMMANDS.values())
+# Spaces never go just inside brackets, math delimiters or around sub/superscripts
+NO_SPACE_AFTER = {'(', '[', '{', '_', '^', '$'}
+NO_SPACE_BEFORE = {')', ']', '}', '_', '^', '$'}
+# A script followed by one of these (or by nothing) has no argument
+EMPTY_SCRIPT = {'}', ')', ']', '_', '^', '$'}
+
+# Tokens that are rewritten, spaced or take an argument; the rest are copied as-is
+_SPECIAL = frozenset(VERBATIM_COMMANDS) | {'_', '^'} | set(REWRITES) | set(SPACING)
+
+# Environments that are display math on their own; any other \begin{...}
+# (pmatrix, cases, ...) only renders inside math delimiters
+DISPLAY_ENVIRONMENTS = {
+    'equation', 'equation*', 'align', 'align*', 'gather', 'gather*',
+    'multline', 'multline*', 'eqnarray', 'eqnarray*', 'displaymath',
+}
+_BEGIN_RE = re.compile(r'\\begin\{([^}]*)\}')
+
+# Each match is (leading whitespace, token); a token is a command, a word,
+# a number, a two-character symbol or any other single character
+_TOKEN_RE = re.compile(r'(\s*)(\\(?:[A-Za-z]+|.)|[A-Za-z]+|\d+(?:\.\d+)?|->|<-|<=|>=|!=|.)', re.DOTALL)
+
+
+def _tokenize(content):
+    return _TOKEN_RE.findall(content)
+
+
+def _is_atom(value):
+    """A word, number or command: something a sign in a script can attach to"""
+    return value[0].isalnum() or (value[0] == '\\' and value[1:].isalpha())
+
+
+def _matching_parens(tokens):
+    """Index of the closing parenthesis for every opening one that has one"""
+    pairs, stack = {}, []
+    for index, (_, value) in enumerate(tokens):
+        if value == '(':
+            stack.append(index)
+        elif value == ')' and stack:
+            pairs[stack.pop()] = index
+    return pairs
+
+
+def _format_body(tokens):
+    out = []
+    append = out.append
+    pending = ''  # whitespace owed before the next token: '', ' ' or '\n'
+    last = None
+    parens = None
+    i, count = 0, len(tokens)
+
+    while i < count:
+        space, value = tokens[i]
+        i += 1
+
+        if space and out and pending != '\n':
+            pending = '\n' if '\n' in space else ' '
+
+        if value not in _SPECIAL:
+            # Most tokens are written as-is; only the spacing before them is decided
+            if pending:
+                if pending == '\n' or not (last in NO_SPACE_AFTER or value in NO_SPACE_BEFORE):
+                    append(pending)
+                pending = ''
+            append(value)
+            last = value
+            continue
+
+        if value in VERBATIM_COMMANDS:
+            if pending and (pending == '\n' or last not in NO_SPACE_AFTER):
+                append(pending)
+            pending = ''
+            append(value)
+            last = value
+            if i < count and tokens[i][1] == '{':
+                # Copy the whole brace group as-is
+                start, depth = i, 0
+                while i < count:
+                    brace = tokens[i][1]
+                    if brace == '{':
+                        depth += 1
+                    elif brace == '}':
+                        depth -= 1
+                    i += 1
+                    if not depth:
+                        break
+                append(tokens[start][1] + ''.join([ws + v for ws, v in tokens[start + 1:i]]))
+                last = '}'
+            continue
+
+        if value == '_' or value == '^':
+            if pending == '\n':
+                append(pending)
+            pending = ''
+            append(value)
+            last = value
+            if i >= count or tokens[i][1] in EMPTY_SCRIPT:
+                # A dangling script is left for find_latex_error to report
+                continue
+            arg = tokens[i][1]
+            if arg == '(':
+                # sum_(i=1) style limits: the parentheses become the braces
+                if parens is None:
+                    parens = _matching_parens(tokens)
+                close = parens.get(i)
+                if close is not None:
+                    tokens[i], tokens[close] = ('', '{'), (tokens[close][0], '}')
+                    arg = '{'
+            if arg == '{':
+                continue
+            # A sign belongs to what follows it: x^-1 -> x^{-1}, not x^{-}1
+            sign = ''
+            if (arg == '-' or arg == '+') and i + 1 < count and _is_atom(tokens[i + 1][1]):
+                sign = arg
+                i += 1
+                arg = tokens[i][1]
+            # Brace a bare script: a whole command, number or rewritten word,
+            # otherwise just the first letter
+            if arg in REWRITES:
+                append('{' + sign + REWRITES[arg] + '}')
+                i += 1
+            elif len(arg) == 1 or not arg[0].isalpha():
+                append('{' + sign + arg + '}')
+                i += 1
+            else:
+                append('{' + sign + arg[0] + '}')
+                tokens[i] = ('', arg[1:])
+            last = '}'
+            continue
+
+        value = REWRITES.get(value, value)
+        mode = SPACING.get(value)
+        if mode == _RELATION or (mode == _BINARY and last is not None and last not in OPENERS):
+            if out and (pending == '\n' or last not in NO_SPACE_AFTER):
+                append(pending or ' ')
+            append(value)
+            pending = ' '
+        else:
+            if mode == _SPACED_BEFORE and out and pending != '\n':
+                pending = ' '
+            if pending and (pending == '\n' or not (last in NO_SPACE_AFTER or value in NO_SPACE_BEFORE)):
+                append(pending)
+            append(value)
+            pending = '\n' if mode == _LINE_BREAK else ''
+        last = value
+
+    return ''.join(out)
+
+
+def format_latex_content(content: str) -> str:
+    """
+    Format LaTeX content for proper rendering.
+
+    The input is tokenized once and every rewrite happens in a single pass
+    over the tokens, so existing commands such as \\sin or \\leq are never
+    touched and formatting already-formatted output returns it unchanged.
+
+    Rules:
+    1. Ensure proper equation environment
+    2. Rewrite bare function names, Greek letters and arrows to commands
+    3. Brace single-token subscripts and superscripts, with any leading sign
+    4. Normalize spacing around operators and relations
+    5. Handle multi-line equations
+    """
+    content = content.strip()
+    if not content:
+        return content
+    body = _format_body(_tokenize(content))
+    if content.startswith(('$$', '\\[')):
+        return body
+    environment = _BEGIN_RE.match(content)
+    if environment and environment.group(1) in DISPLAY_ENVIRONMENTS:
+        return body
+    if '\n' in body:
+        return '\\begin{align*}\n' + body + '\n\\end{align*}'
+    return f'$${body}$$'
+
+
+# Commands that need this many brace arguments to render
+ARGUMENT_COUNTS = {'\\frac': 2, '\\dfrac': 2, '\\tfrac': 2, '\\binom': 2, '\\sqrt': 1}
+_CLOSING = {')': '(', ']': '[', '}': '{'}
+_MISSING_ARGUMENT = {')', ']', '}', '_', '^', '$', '&', '=', '\\\\'}
+
+
+def find_latex_error(content: str):
+    """
+    First structural problem in a LaTeX expression, or None if it looks renderable.
+
+    This is a cheap local check run before falling back to the model: it
+    catches unbalanced brackets, mismatched environments and \\left/\\right
+    pairs, missing command arguments and dangling scripts. It does not know
+    every command, so a None is "probably fine", not a guarantee.
+    """
+    tokens = [value for _, value in _tokenize(content.strip())]
+    stack = []
+    environments = []
+    count = len(tokens)
+    for i, value in enumerate(tokens):
+        if value in ('\\left', '\\right'):
+            if i + 1 >= count:
+                return f'{value} without a delimiter'
+            delimiter = tokens[i + 1]
+            # The delimiter belongs to \left/\right, not to the bracket stack
+            tokens[i + 1] = ''
+            if value == '\\left':
+                stack.append('\\left')
+            elif not stack or stack.pop() != '\\left':
+                return f'\\right{delimiter} without a matching \\left'
+        elif value in ('(', '[', '{'):
+            stack.append(value)
+        elif value in _CLOSING:
+            if not stack or stack[-1] != _CLOSING[value]:
+                return f"Unmatched '{value}'"
+            stack.pop()
+        elif value in ('\\begin', '\\end'):
+            # The name is one word, tokenized apart from a trailing star (align*)
+            end = i + 4 if i + 3 < count and tokens[i + 3] == '*' else i + 3
+            if end >= count or tokens[i + 1] != '{' or tokens[end] != '}':
+                return f'{value} without an environment name'
+            name = ''.join(tokens[i + 2:end])
+            if value == '\\begin':
+                environments.append(name)
+            elif not environments or environments.pop() != name:
+                return f'\\end{{{name}}} without a matching \\begin'
+        elif value in ('_', '^'):
+            if i + 1 >= count or tokens[i + 1] in EMPTY_SCRIPT:
+                return f"Empty '{value}' script"
+        elif value in ARGUMENT_COUNTS:
+            position = i + 1
+            if value == '\\sqrt' and position < count and tokens[position] == '[':
+                # Optional root index, e.g. \sqrt[3]{x}
+                while position < count and tokens[position] != ']':
+                    position += 1
+                position += 1
+            for _ in range(ARGUMENT_COUNTS[value]):
+                if position >= count or tokens[position] in _MISSING_ARGUMENT:
+                    return f'{value} is missing an argument'
+                if tokens[position] != '{':
+                    # A single token is a valid argument, e.g. \frac a b
+                    position += 1
+                    continue
+                depth = 0
+                while position < count:
+                    if tokens[position] == '{':
+                        depth += 1
+                    elif tokens[position] == '}':
+                        depth -= 1
+                    position += 1
+                    if not depth:
+                        break
+    if stack:
+        opened = stack[-1]
+        return '\\left without a matching \\right' if opened == '\\left' else f"Unclosed '{opened}'"
+    if environments:
+        return f'\\begin{{{environments[-1]}}} without a matching \\end'
+    return None
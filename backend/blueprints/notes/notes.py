@@ -1,17 +1,50 @@
-from flask import Blueprint, request, jsonify, Response, stream_with_context
+from flask import Blueprint, request, jsonify, Response, stream_with_context, redirect
 from db import db
-from ai import genAIModel
+from ai import genAIModel, MODEL_NAME, instructed_model
+from ai_cache import ai_cache
+from read_cache import read_cache
+from conditional import conditional
+from ai_gateway import ai_gateway, GatewayRejected
 import datetime
 from datetime import datetime
 import os
 from werkzeug.utils import secure_filename
-from io import BytesIO
-import PIL.Image
 import uuid
 import json
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
 from flask_cors import cross_origin
-import tempfile
+import queue
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from blueprints.notes.stream_parser import BlockStreamParser
+from blueprints.notes.latex import format_latex_content, find_latex_error
+from blueprints.notes.images import schedule_cover_variants, pick_variant
+from blueprints.notes.uploads import (
+    UploadError, MultipartUpload, check_content_length, stream_to_storage, hash_stream, blob_path,
+    IMMUTABLE_CACHE_CONTROL, create_resumable, check_upload_owner, resumable_offset, append_resumable,
+    RESUMABLE_CHUNK_BYTES
+)
+from mutations import insert_row, update_row, delete_row, fetch_row, returning
+from blueprints.notes.summaries import summary_query, summary_page, missing_excerpt_query, SUMMARY_MAX_PAGE_SIZE
+from blueprints.notes.blocks import text_columns, parse_blocks, apply_block_ops, chunk_blocks, BlockPatchError
+
+SEARCH_PAGE_SIZE = 20
+# Upper bound on note ids accepted by one bulk request
+BULK_MAX_NOTES = 500
+BULK_RESULT_COLUMNS = 'id, title, folder_id, updated_at'
+
+# Bump when a prompt changes so cached responses from the old prompt are ignored
+FORMAT_PROMPT_VERSION = 2
+LATEX_PROMPT_VERSION = 1
+LATEX_BATCH_PROMPT_VERSION = 1
+
+# Upper bound on equations accepted by one /format_latex_batch/ request
+LATEX_BATCH_MAX = 200
+
+# Large notes are formatted as several size-bounded model calls run side by side
+FORMAT_CHUNK_CHARS = int(os.environ.get('AI_FORMAT_CHUNK_CHARS', 6000))
+FORMAT_PARALLELISM = int(os.environ.get('AI_FORMAT_PARALLELISM', 3))
 
 notes_blueprint = Blueprint('notes_blueprint', __name__, url_prefix='/notes')
 
@@ -33,7 +66,8 @@ def add_note():
         'note': data['content'],
         'created_at': datetime.now().isoformat(),
         'updated_at': datetime.now().isoformat(),
-        'user_id': user_id
+        'user_id': user_id,
+        **text_columns(data['content'])
     }
     
     # Add folder_id if provided
@@ -41,18 +75,64 @@ def add_note():
         new_note['folder_id'] = data['folder_id']
         
     db.from_('notes').insert(new_note).execute()
+    _invalidate_folders(user_id, tree_only=True)
     return jsonify(new_note)
 
 @notes_blueprint.route('/get_notes/', methods=['GET'])
 @cross_origin()
 @jwt_required()
+@conditional('notes')
 def get_notes():
     id = get_jwt_identity()
-    print(id)
+    if request.args.get('view') == 'summary':
+        return _get_note_summaries(id)
     notes = db.from_('notes').select('*').eq('user_id', id).execute()
-    print(notes.data)
     return jsonify(notes.data)
 
+def _get_note_summaries(user_id):
+    """Keyset-paginated note listing without note bodies, newest first"""
+    try:
+        query, limit = summary_query(db, user_id, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    notes, next_cursor = summary_page(query.execute().data, limit)
+
+    # Notes saved before the derived text columns existed get an excerpt computed
+    # here; storing it is left to scripts/backfill_note_text.py
+    missing = missing_excerpt_query(db, notes)
+    if missing is not None:
+        bodies = missing.execute()
+        excerpts = {row['id']: text_columns(row['note'])['excerpt'] for row in bodies.data}
+        for note in notes:
+            if note['id'] in excerpts:
+                note['excerpt'] = excerpts[note['id']]
+
+    return jsonify({'notes': notes, 'next_cursor': next_cursor})
+
+@notes_blueprint.route('/search/', methods=['GET'])
+@cross_origin()
+@jwt_required()
+def search_notes():
+    user_id = get_jwt_identity()
+    query = request.args.get('q', '').strip()
+    if not query:
+        return jsonify([])
+    try:
+        limit = min(int(request.args.get('limit', SEARCH_PAGE_SIZE)), SUMMARY_MAX_PAGE_SIZE)
+    except ValueError:
+        return jsonify({'error': 'Invalid limit'}), 400
+    if limit < 1:
+        return jsonify({'error': 'Invalid limit'}), 400
+
+    # Ranking and highlighting run in Postgres against the GIN-indexed search_vector
+    results = db.rpc('search_notes', {
+        'p_user_id': user_id,
+        'p_query': query,
+        'p_limit': limit
+    }).execute()
+    return jsonify(results.data)
+
 @notes_blueprint.route('/get_note/<uuid:id>', methods=['GET'])
 @cross_origin()
 @jwt_required()
@@ -71,12 +151,69 @@ def update_note(id):
     updated_note = {
         'title': data['title'],
         'note': data['content'],
-        'updated_at': datetime.now().isoformat()
+        'updated_at': datetime.now().isoformat(),
+        **text_columns(data['content'])
     }
-    db.from_('notes').update(updated_note).eq('id', id).execute()
+    query = db.from_('notes').update(updated_note).eq('id', id)
+    # Clients that track versions get the same stale-write protection as patch_note
+    if 'version' in data:
+        query = query.eq('version', data['version'])
+    result = query.execute()
+    if 'version' in data and not result.data:
+        return jsonify({'error': 'Note has changed since it was loaded'}), 409
+    if result.data:
+        updated_note['version'] = result.data[0].get('version')
 
     return jsonify(updated_note)
 
+@notes_blueprint.route('/patch_note/<uuid:id>', methods=['PATCH'])
+@cross_origin()
+@jwt_required()
+def patch_note(id):
+    user_id = get_jwt_identity()
+    data = request.json
+    if 'version' not in data or not isinstance(data.get('ops'), list):
+        return jsonify({'error': 'version and ops are required'}), 400
+
+    note = db.from_('notes').select('note, version').eq('id', id).eq('user_id', user_id).execute()
+    if not note.data:
+        return jsonify({'error': 'Note not found or access denied'}), 404
+
+    current = note.data[0]
+    if current['version'] != data['version']:
+        return jsonify({
+            'error': 'Note has changed since it was loaded',
+            'version': current['version']
+        }), 409
+
+    try:
+        blocks = apply_block_ops(parse_blocks(current['note']), data['ops'])
+    except BlockPatchError as e:
+        return jsonify({'error': str(e)}), 400
+
+    updated_note = {
+        'note': json.dumps(blocks) if isinstance(current['note'], str) else blocks,
+        **text_columns(blocks),
+        'updated_at': datetime.now().isoformat()
+    }
+    if 'title' in data:
+        updated_note['title'] = data['title']
+
+    # The version filter makes this a compare-and-swap: a save from another tab
+    # that landed after our read leaves zero rows matched.
+    result = db.from_('notes').update(updated_note)\
+        .eq('id', id)\
+        .eq('version', current['version'])\
+        .execute()
+    if not result.data:
+        return jsonify({'error': 'Note has changed since it was loaded'}), 409
+    _invalidate_folders(user_id, tree_only=True)
+
+    return jsonify({
+        'version': result.data[0]['version'],
+        'updated_at': updated_note['updated_at']
+    })
+
 @notes_blueprint.route('/update_title/<uuid:id>', methods=['PUT'])
 @cross_origin()
 def update_title(id):
@@ -97,42 +234,40 @@ def update_title(id):
 @notes_blueprint.route('/upload_image/', methods=['POST'])
 @cross_origin()
 def upload_image():
-    if 'file' not in request.files:
+    try:
+        check_content_length(request.content_length)
+        # Parsed off the request body as it arrives; a note_id field must come before the file
+        file = MultipartUpload(request.stream, request.content_type)
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status_code
+
+    if file.filename is None:
         return jsonify({"error": "No file part"}), 400
 
-    file = request.files['file']
-    print(file)
-    file_blob = BytesIO(file.read())
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
 
-    if file and allowed_file(file.filename):
-        # Save the file to a temporary location
-        temp_dir = tempfile.gettempdir()
-        temp_path = os.path.join(temp_dir, secure_filename(file.filename))
-        file.save(temp_path)
-        file.save("./temp.png")
+    if allowed_file(file.filename):
         try:
-            # Upload the file to the storage bucket
-            response = db.storage.from_("cover_images").upload(
-                file=temp_path,
-                path=secure_filename(file.filename),
-                file_options={"cache-control": "3600", 
-                              "upsert": "false", 
-                              "content-type": file.content_type
-                              }
+            # Stream the upload straight to the storage bucket
+            path = secure_filename(file.filename)
+            response, size = stream_to_storage(
+                "cover_images",
+                path,
+                file,
+                file.content_type
             )
 
-            # Remove the temporary file
-            os.remove(temp_path)
-            print(response)
+            # Resized WebP variants are built in the background; when the
+            # upload belongs to a note, their URLs are recorded on it
+            verify_jwt_in_request(optional=True)
+            schedule_cover_variants(path, file.form.get('note_id'), get_jwt_identity())
 
             return jsonify(response.text), 200
-        except db.storage.utils.StorageException as e:
-            return jsonify({"error": "Error"}), 400
+        except UploadError as e:
+            return jsonify({"error": str(e)}), e.status_code
     else:
         return jsonify({"error": "Unsupported file type"}), 400
-@cross_origin()
 def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif','webp'}
     return '.' in filename and \
@@ -141,52 +276,57 @@ def allowed_file(filename):
 @notes_blueprint.route('/get_image/<string:filename>', methods=['GET'])
 @cross_origin()
 def get_image(filename):
-    response = db.storage.from_("cover_images").list(path=filename).execute()
-    return response.text, 200, {'Content-Type': response.headers['content-type']}
+    """
+    Redirect to a cover image; given the note it covers (?note_id=) and a width
+    (?w=), to the smallest variant covering that width
+    """
+    width = request.args.get('w', type=int)
+    path = secure_filename(filename)
+    note_id = request.args.get('note_id')
+    if width and note_id:
+        try:
+            note_id = str(uuid.UUID(note_id))
+        except ValueError:
+            return jsonify({'error': 'Invalid note_id'}), 400
+        note = db.from_('notes').select('cover_variants').eq('id', note_id).execute()
+        path = pick_variant(path, width, note.data[0]['cover_variants'] if note.data else None)
+    response = redirect(db.storage.from_("cover_images").get_public_url(path))
+    response.headers['Cache-Control'] = 'public, max-age=3600'
+    return response
 
 @notes_blueprint.route('/upload_file/', methods=['POST'])
 @cross_origin()
 @jwt_required()
 def upload_file():
-    if 'file' not in request.files:
+    try:
+        check_content_length(request.content_length)
+        file = MultipartUpload(request.stream, request.content_type)
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status_code
+
+    if file.filename is None:
         return jsonify({"error": "No file part"}), 400
     
     user_id = get_jwt_identity()
-    file = request.files['file']
-    print(file)
-    print(user_id)
     if file.filename == '':
         return jsonify({"error": "No selected file"}), 400
 
     if file:
         # Create a secure filename
         secure_name = secure_filename(file.filename)
-        temp_path = os.path.join(tempfile.gettempdir(), secure_name)
-        print(temp_path)
-        print(secure_name)
         try:
-            # Save to temp directory first
-            file.save(temp_path)
-            
             # Create a unique path that includes the user_id for proper access control
             storage_path = f"{user_id}/{secure_name}"
             
-            # Upload the file to the storage bucket
-            response = db.storage.from_("attachments").upload(
-                file=temp_path,
-                path=storage_path,
-                file_options={
-                    "cache-control": "3600", 
-                    "upsert": "true", 
-                    "content-type": file.content_type,
-
-                }
-                
+            # Stream the file to the storage bucket
+            stream_to_storage(
+                "attachments",
+                storage_path,
+                file,
+                file.content_type,
+                upsert=True
             )
 
-            # Remove the temporary file
-            os.remove(temp_path)
-
             # Get the public URL for the file
             file_url = db.storage.from_('attachments').get_public_url(storage_path)
             
@@ -199,7 +339,63 @@ def upload_file():
             
         except Exception as e:
             print(f"Error uploading file: {str(e)}")
-            return jsonify({"error": str(e)}), 400
+            return jsonify({"error": str(e)}), getattr(e, 'status_code', 400)
+
+@notes_blueprint.route('/uploads/', methods=['POST'])
+@cross_origin()
+@jwt_required()
+def create_upload():
+    """Start a resumable upload; the client then sends the file with PATCH in chunks"""
+    user_id = get_jwt_identity()
+    data = request.json
+    if not data.get('filename') or not isinstance(data.get('size'), int):
+        return jsonify({'error': 'filename and size are required'}), 400
+
+    storage_path = f"{user_id}/{secure_filename(data['filename'])}"
+    try:
+        upload_id = create_resumable(
+            "attachments",
+            storage_path,
+            data['size'],
+            data.get('content_type'),
+            upsert=True
+        )
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status_code
+
+    return jsonify({
+        'upload_id': upload_id,
+        'path': storage_path,
+        'chunk_size': RESUMABLE_CHUNK_BYTES
+    }), 201
+
+@notes_blueprint.route('/uploads/<string:upload_id>', methods=['GET'])
+@cross_origin()
+@jwt_required()
+def get_upload(upload_id):
+    """Current offset of a resumable upload, used to resume after a dropped connection"""
+    try:
+        check_upload_owner(upload_id, get_jwt_identity())
+        offset, length = resumable_offset(upload_id)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    return jsonify({'offset': offset, 'size': length, 'complete': offset == length})
+
+@notes_blueprint.route('/uploads/<string:upload_id>', methods=['PATCH'])
+@cross_origin()
+@jwt_required()
+def append_upload(upload_id):
+    """Append one raw chunk; Upload-Offset must match the bytes already received"""
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'Upload-Offset header is required'}), 400
+    try:
+        check_upload_owner(upload_id, get_jwt_identity())
+        check_content_length(request.content_length, RESUMABLE_CHUNK_BYTES)
+        new_offset = append_resumable(upload_id, offset, request.stream)
+    except UploadError as e:
+        return jsonify({'error': str(e)}), e.status_code
+    return jsonify({'offset': new_offset})
 
 @notes_blueprint.route('/<int:note_id>/attachments', methods=['GET'])
 @cross_origin()
@@ -213,7 +409,12 @@ def get_attachments(note_id):
 
 @notes_blueprint.route('/<int:note_id>/attachments', methods=['POST'])
 @cross_origin()
-async def add_attachment(note_id):
+def add_attachment(note_id):
+    try:
+        check_content_length(request.content_length)
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status_code
+
     if 'file' not in request.files:
         return jsonify({"error": "No file part"}), 400
 
@@ -222,48 +423,72 @@ async def add_attachment(note_id):
         return jsonify({"error": "No selected file"}), 400
 
     try:
-        # Read file content and get size
-        file_content = file.read()
-        file_size = len(file_content)
-        # Generate path
         filename = secure_filename(file.filename)
-        unique_filename = f"{uuid.uuid4()}-{filename}"
-        file_path = f"{note_id}/{unique_filename}"
-
-        # Upload directly to Supabase using bytes
-        storage_response =  db.storage.from_("attachments").upload(
-            file=file_content,
-            path=file_path,
-            file_options={
-                "cache-control": "3600",
-                "upsert": "false",
-                "content-type": file.content_type
-            }
-        )
+        content_hash, file_size = hash_stream(file.stream)
+        file_path = blob_path(content_hash)
+
+        # Identical content is stored once and shared by every attachment row
+        existing = db.from_('attachment_objects').select('hash').eq('hash', content_hash).execute()
+        if not existing.data:
+            stream_to_storage(
+                "attachments",
+                file_path,
+                file.stream,
+                file.content_type,
+                cache_control=IMMUTABLE_CACHE_CONTROL,
+                upsert=True
+            )
+
+        ref_count = db.rpc('acquire_attachment_object', {
+            'p_hash': content_hash,
+            'p_file_path': file_path,
+            'p_size': file_size,
+            'p_content_type': file.content_type
+        }).execute().data
+        if existing.data and ref_count == 1:
+            # The last reference was released between our check and the
+            # acquire, so the object may be gone; upload it again
+            file.stream.seek(0)
+            stream_to_storage(
+                "attachments",
+                file_path,
+                file.stream,
+                file.content_type,
+                cache_control=IMMUTABLE_CACHE_CONTROL,
+                upsert=True
+            )
 
         # Get public URL
         file_url = db.storage.from_('attachments').get_public_url(file_path)
-        print(file_url)
         # Create attachment record
         attachment = {
             'note_id': note_id,
             'filename': filename,
             'file_path': file_path,
+            'content_hash': content_hash,
             'url': file_url,
             'size': file_size,
             'content_type': file.content_type,
             'created_at': datetime.now().isoformat()
         }
-        print(attachment)
         
         # Insert into database
-        result = db.from_('notes_attachments').insert(attachment).execute()  
-        print(result)
+        try:
+            db.from_('notes_attachments').insert(attachment).execute()
+        except Exception:
+            # Give back the reference taken above so the object can still be freed
+            remaining = db.rpc('release_attachment_object', {'p_hash': content_hash}).execute().data
+            if not remaining:
+                db.storage.from_("attachments").remove([file_path])
+            raise
         return jsonify({
             'message': 'File uploaded successfully',
-            'attachment': attachment
+            'attachment': attachment,
+            'deduplicated': bool(existing.data)
         })
 
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status_code
     except Exception as e:
         print(f"Error uploading attachment: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -278,11 +503,17 @@ def delete_attachment(note_id, attachment_id):
         if not attachment.data:
             return jsonify({'error': 'Attachment not found'}), 404
 
-        # Delete from storage
-        db.storage.from_("attachments").remove(attachment.data['file_path'])
-        
         # Delete from database
-        db.from_('note_attachments').delete().eq('id', str(attachment_id)).execute()
+        db.from_('notes_attachments').delete().eq('id', str(attachment_id)).execute()
+
+        # Shared objects are only removed from storage with their last reference
+        remaining = 0
+        if attachment.data.get('content_hash'):
+            remaining = db.rpc('release_attachment_object', {
+                'p_hash': attachment.data['content_hash']
+            }).execute().data
+        if not remaining:
+            db.storage.from_("attachments").remove([attachment.data['file_path']])
         
         return jsonify({'message': 'Attachment deleted successfully'})
 
@@ -290,14 +521,7 @@ def delete_attachment(note_id, attachment_id):
         print(f"Error deleting attachment: {str(e)}")
         return jsonify({'error': 'Failed to delete attachment'}), 500
 
-@notes_blueprint.route('/format_with_ai/', methods=['POST'])
-@cross_origin()
-def format_with_ai():
-    data = request.json
-    blocks = data.get('blocks', [])
-    
-    def generate():
-        prompt = """
+FORMAT_SYSTEM_INSTRUCTION = """
         You are a helpful assistant which formats and styles the text content of a note editor. The editor content is provided as an array of block objects. You will format and style the text content of each block while keeping all other properties unchanged.
 
         **Schema:**
@@ -411,67 +635,210 @@ def format_with_ai():
         Can be formatted to:
         {"id":"3d6e6637-cb29-4a18-af81-4b93b6aa2366","type":"heading","props":{"textColor":"default","backgroundColor":"default","textAlignment":"left","level":2},"content":[{"type":"text","text":"Don't get lost in the Tasks and Duties","styles":{}}],"children":[]},{"id":"936d64c8-d5b6-407e-bccd-0fcfb5ff77bd","type":"bulletListItem","props":{"textColor":"default","backgroundColor":"default","textAlignment":"left"},"content":[{"type":"text","text":"Whatever the specifics of a man's purpose, he must always ","styles":{}},{"type":"text","text":"refresh the transcendental element","styles":{"textColor":"orange"}},{"type":"text","text":" of his life through regular meditation and retreat","styles":{}}],"children":[]},{"id":"e4979aec-6597-4222-80ce-9e9180dd7aae","type":"bulletListItem","props":{"textColor":"default","backgroundColor":"default","textAlignment":"left"},"content":[{"type":"text","text":"Tasks are important, but no amount of duties adds up to ","styles":{}},{"type":"text","text":"love, freedom, or full consciousness","styles":{"textColor":"orange"}},{"type":"text","text":". ","styles":{}},{"type":"text","text":"You cannot do enough, nor can you do the right things","styles":{"textColor":"blue"}},{"type":"text","text":", so that you will finally feel complete","styles":{}}],"children":[]},{"id":"b5de8706-307c-4313-afcb-40351ff22de5","type":"paragraph","props":{"textColor":"default","backgroundColor":"default","textAlignment":"left"},"content":[],"children":[]}
 
-        Blocks to format and enhance:
-        
-        """ + str(blocks)
-        
-        response = genAIModel.generate_content(prompt, stream=True)
-        accumulated_text = ""
-        
-        for chunk in response:
-            accumulated_text += chunk.text
-            print(accumulated_text)
+        Every request contains only some of the note's blocks. Format each of them independently.
+        """
+
+formatModel = instructed_model(FORMAT_SYSTEM_INSTRUCTION)
+
+def _usage_dict(usage):
+    return {
+        'prompt_tokens': getattr(usage, 'prompt_token_count', 0) or 0,
+        'output_tokens': getattr(usage, 'candidates_token_count', 0) or 0,
+        'total_tokens': getattr(usage, 'total_token_count', 0) or 0
+    }
+
+class _ChunkFormatter:
+    """Turns one chunk's streamed model output into blocks whose ids match the input"""
+
+    def __init__(self, chunk):
+        self.parser = BlockStreamParser()
+        self.chunk_ids = [block.get('id') for block in chunk]
+        self.used_ids = set()
+        self.blocks = []
+        self.usage = None
+
+    def feed(self, piece):
+        self.usage = getattr(piece, 'usage_metadata', None) or self.usage
+        for block in self.parser.feed(piece.text):
+            # Block ids must survive formatting so the editor can match results
+            # to its own blocks. An unknown or repeated id takes the input id at
+            # the same position, or else the first one no block has claimed yet.
+            if block['id'] not in self.chunk_ids or block['id'] in self.used_ids:
+                block['id'] = self._unused_id(len(self.blocks))
+            self.used_ids.add(block['id'])
+            self.blocks.append(block)
+            yield block
+
+    def _unused_id(self, position):
+        if position < len(self.chunk_ids) and self.chunk_ids[position] not in self.used_ids:
+            return self.chunk_ids[position]
+        return next((block_id for block_id in self.chunk_ids if block_id not in self.used_ids), str(uuid.uuid4()))
+
+    def error(self):
+        """Why the output can't stand in for the chunk, or None when it can"""
+        # A cut-off stream, a block that failed to parse or a missing block would drop
+        # blocks from the note
+        if not self.parser.finished or self.parser.skipped or len(self.blocks) != len(self.chunk_ids):
+            return 'Could not process AI response'
+        return None
+
+def _format_chunk(index, chunk, key, stream, events):
+    """Format one chunk of blocks, reporting each block on the events queue as it parses"""
+    try:
+        formatter = _ChunkFormatter(chunk)
+        for piece in stream:
+            for block in formatter.feed(piece):
+                events.put(('block', index, block))
+        error = formatter.error()
+        if error:
+            events.put(('error', index, error))
+            return
+        ai_cache.set(key, formatter.blocks)
+        events.put(('done', index, _usage_dict(formatter.usage)))
+    except Exception as e:
+        print(f"Error formatting chunk {index}: {str(e)}")
+        events.put(('error', index, str(e)))
+
+def _format_chunk_prompt(chunk):
+    return "Blocks to format and enhance:\n" + json.dumps(chunk)
+
+class _FormatProgress:
+    """
+    Server-sent events for one format_with_ai request.
+
+    Chunk events arrive in any order from however many model calls are
+    running; this turns them into the SSE frames the editor expects and
+    assembles the final document.
+    """
+
+    def __init__(self, chunks, cached, pending):
+        self.chunks = chunks
+        self.pending = pending
+        self.results = {index: list(blocks) for index, blocks in cached.items() if blocks is not None}
+        self.remaining = len(pending)
+        self.usage = Counter()
+        self.errors = []
+        self.sent = 0
+
+    @staticmethod
+    def _frame(payload):
+        return f"data: {json.dumps(payload)}\n\n"
+
+    def _block(self, index, block):
+        frame = self._frame({'block': block, 'chunk': index, 'index': self.sent})
+        self.sent += 1
+        return frame
+
+    def replay_cached(self):
+        # Cached chunks are replayed through the same framing as live ones
+        return [self._block(index, block) for index in sorted(self.results) for block in self.results[index]]
+
+    def handle(self, kind, index, payload):
+        if kind == 'block':
+            self.results.setdefault(index, []).append(payload)
+            return self._block(index, payload)
+        self.remaining -= 1
+        if kind == 'done':
+            self.usage.update(payload)
+            return None
+        # Unformatted originals keep the note intact when a chunk fails
+        self.results[index] = self.chunks[index]
+        self.errors.append({'chunk': index, 'error': payload})
+        return self._frame({'error': payload, 'chunk': index})
+
+    def finish(self):
+        if len(self.errors) == len(self.chunks):
+            return self._frame({'error': 'Could not process AI response'})
+        formatted_blocks = [block for index in range(len(self.chunks)) for block in self.results[index]]
+        return self._frame({
+            'formatted_blocks': formatted_blocks,
+            'usage': dict(self.usage),
+            'chunks': len(self.chunks),
+            'cached_chunks': len(self.chunks) - len(self.pending)
+        })
+
+def _plan_format(blocks):
+    """Chunks, their cache keys, cached results and the chunk indexes still to run"""
+    chunks = chunk_blocks(blocks, FORMAT_CHUNK_CHARS)
+    keys = [ai_cache.make_key('format_with_ai', MODEL_NAME, FORMAT_PROMPT_VERSION, chunk) for chunk in chunks]
+    cached = {index: ai_cache.get(key) for index, key in enumerate(keys)}
+    pending = [index for index in range(len(chunks)) if cached[index] is None]
+    return chunks, keys, cached, pending
+
+@notes_blueprint.route('/format_with_ai/', methods=['POST'])
+@cross_origin()
+@jwt_required()
+def format_with_ai():
+    data = request.json
+    blocks = data.get('blocks', [])
+    if not blocks:
+        return jsonify({'error': 'No blocks provided'}), 400
+
+    caller = get_jwt_identity()
+    chunks, keys, cached, pending = _plan_format(blocks)
+
+    # The request counts once against the caller's AI limit however many chunks it
+    # runs; the first model call is admitted before the stream starts so a
+    # saturated gateway can still answer with a plain 429/503
+    first_stream = None
+    if pending:
+        try:
+            ai_gateway.reserve(caller)
+        except GatewayRejected as e:
+            return jsonify({'error': str(e)}), e.status_code
+        try:
+            first_stream = ai_gateway.stream(caller, _format_chunk_prompt(chunks[pending[0]]), model=formatModel,
+                                             reserved=True)
+        except GatewayRejected as e:
+            ai_gateway.unreserve(caller)
+            return jsonify({'error': str(e)}), e.status_code
+
+    def generate():
+        events = queue.Queue()
+        progress = _FormatProgress(chunks, cached, pending)
+        yield from progress.replay_cached()
+
+        def run(index, stream=None):
             try:
-                # Clean up the response text - remove markdown formatting
-                cleaned_text = (accumulated_text
-                    .replace('```json', '')
-                    .replace('```', '')
-                    .strip())
-                
-                if cleaned_text.startswith('[') and cleaned_text.endswith(']'):
-                    try:
-                        formatted_blocks = json.loads(cleaned_text)
-                        
-                        # Validate block structure
-                        if (isinstance(formatted_blocks, list) and 
-                            all(isinstance(block, dict) and 
-                                all(key in block for key in ['id', 'type', 'props', 'content'])
-                                for block in formatted_blocks)):
-                            
-                            # Update block IDs
-                            for block in formatted_blocks:
-                                block_content = ''.join(
-                                    item['text'] for item in block.get('content', [])
-                                    if isinstance(item, dict) and 'text' in item
-                                )
-                                block['id'] = str(uuid.uuid4())
-                            
-                            print("Valid formatted blocks found")
-                            yield f"data: {json.dumps({'formatted_blocks': formatted_blocks})}\n\n"
-                            return
-                            
-                    except json.JSONDecodeError as e:
-                        print(f"JSON parsing error: {e}")
-                        continue
-                        
-            except Exception as e:
-                print(f"Processing error: {str(e)}")
-                continue
-
-        # If we get here, send error
-        error_msg = {
-            'error':  'Could not process AI response',
-            'debug': accumulated_text[:200]  # First 200 chars for debugging
-        }
-        yield f"data: {json.dumps(error_msg)}\n\n"
+                if stream is None:
+                    stream = ai_gateway.stream(caller, _format_chunk_prompt(chunks[index]), model=formatModel,
+                                               reserved=True)
+            except GatewayRejected as e:
+                events.put(('error', index, str(e)))
+                return
+            _format_chunk(index, chunks[index], keys[index], stream, events)
+
+        if pending:
+            executor = ThreadPoolExecutor(max_workers=min(len(pending), FORMAT_PARALLELISM))
+            executor.submit(run, pending[0], first_stream)
+            for index in pending[1:]:
+                executor.submit(run, index)
+            executor.shutdown(wait=False)
+
+        # Blocks stream out as each chunk produces them; chunks finish in any order
+        while progress.remaining:
+            frame = progress.handle(*events.get())
+            if frame:
+                yield frame
+        yield progress.finish()
 
     response = Response(
         stream_with_context(generate()),
         mimetype='text/event-stream'
     )
-
+    if pending:
+        # Runs however the response ends, even if the client disconnects before the first frame
+        response.call_on_close(lambda: ai_gateway.unreserve(caller))
     return response
 
+@notes_blueprint.route('/ai_stats/', methods=['GET'])
+@cross_origin()
+def ai_stats():
+    return jsonify({
+        'cache': ai_cache.snapshot(),
+        'gateway': ai_gateway.snapshot()
+    })
+
 @notes_blueprint.route('/format_latex/', methods=['POST'])
 @cross_origin()
 def format_latex():
@@ -499,13 +866,23 @@ def format_latex():
 
 @notes_blueprint.route('/format_latex_with_ai/', methods=['POST'])
 @cross_origin()
+@jwt_required()
 def format_latex_with_ai():
     data = request.json
     latex_content = data.get('equation', '')
     
     if not latex_content:
         return jsonify({'error': 'No LaTeX content provided'}), 400
-        
+
+    cache_key = ai_cache.make_key('format_latex_with_ai', genAIModel.model_name,
+                                  LATEX_PROMPT_VERSION, ' '.join(latex_content.split()))
+    cached = ai_cache.get(cache_key)
+    if cached is not None:
+        return jsonify({
+            'formatted': cached,
+            'message': 'LaTeX formatted successfully with AI'
+        })
+
     try:
         prompt = f"""
         You are LaTeX formatting expert. Format and improve this LaTeX equation:
@@ -553,7 +930,7 @@ def format_latex_with_ai():
         Format the given LaTeX equation to be perfectly formatted:
         """
         
-        response = genAIModel.generate_content(prompt)
+        response = ai_gateway.generate(get_jwt_identity(), prompt)
         formatted_latex = response.text.strip()
         print(formatted_latex)
         formatted_latex = (formatted_latex
@@ -565,12 +942,15 @@ def format_latex_with_ai():
         
         # # Final cleanup pass
         # formatted_latex = cleanup_latex(formatted_latex)
-        
+        ai_cache.set(cache_key, formatted_latex)
+
         return jsonify({
             'formatted': formatted_latex,
             'message': 'LaTeX formatted successfully with AI'
         })
-        
+
+    except GatewayRejected as e:
+        return jsonify({'error': str(e)}), e.status_code
     except Exception as e:
         print(f"Error formatting LaTeX with AI: {str(e)}")
         return jsonify({
@@ -578,6 +958,115 @@ def format_latex_with_ai():
             'details': str(e)
         }), 500
 
+LATEX_BATCH_SYSTEM_INSTRUCTION = """
+You are a LaTeX formatting expert. You receive a JSON object mapping ids to
+LaTeX equations that failed to parse. Fix and format every equation.
+
+Requirements:
+1. Reply with ONLY a JSON object mapping every input id to its fixed LaTeX
+2. Keep the ids exactly as given
+3. Wrap each equation in $$...$$, or an align* environment for multi-line equations
+4. Balance all braces, brackets and \\left/\\right pairs
+5. Use \\frac, \\sum, \\int and \\lim with braced limits, e.g. \\sum_{i=1}^{n}
+6. Replace text-based symbols with LaTeX commands (inf -> \\infty, -> -> \\rightarrow)
+7. Keep the meaning of each equation unchanged
+
+Example:
+Input: {"a1": "frac{a+b}{2", "b2": "sum_(i=1^n x_i"}
+Output: {"a1": "$$\\frac{a+b}{2}$$", "b2": "$$\\sum_{i=1}^{n} x_{i}$$"}
+"""
+
+latexBatchModel = instructed_model(LATEX_BATCH_SYSTEM_INSTRUCTION)
+
+def _latex_batch_key(equation):
+    return ai_cache.make_key('format_latex_batch', MODEL_NAME, LATEX_BATCH_PROMPT_VERSION,
+                             ' '.join(equation.split()))
+
+def _strip_code_fence(text):
+    text = text.strip()
+    if text.startswith('```'):
+        text = text.split('\n', 1)[1] if '\n' in text else ''
+        text = text.rsplit('```', 1)[0]
+    return text.strip()
+
+@notes_blueprint.route('/format_latex_batch/', methods=['POST'])
+@cross_origin()
+@jwt_required()
+def format_latex_batch():
+    """
+    Format every equation block of a note in one request.
+
+    Each equation is first formatted and validated locally; only those that
+    still fail validation (and are not cached) go to the model, all together
+    in a single prompt. Results are keyed by block id, each with the source
+    that produced it: 'local', 'cache' or 'ai'.
+    """
+    data = request.json or {}
+    blocks = data.get('blocks')
+    if not isinstance(blocks, list) or not blocks:
+        return jsonify({'error': 'No equation blocks provided'}), 400
+    if len(blocks) > LATEX_BATCH_MAX:
+        return jsonify({'error': f'At most {LATEX_BATCH_MAX} equations per request'}), 400
+
+    results = {}
+    pending = {}
+    for block in blocks:
+        if not isinstance(block, dict) or not block.get('id'):
+            return jsonify({'error': 'Every block needs an id'}), 400
+        # Accept plain {id, equation} items as well as BlockNote latex blocks
+        props = block.get('props')
+        equation = block.get('equation', props.get('equation', '') if isinstance(props, dict) else '')
+        block_id = str(block['id'])
+        if equation is not None and not isinstance(equation, str):
+            # Reported for this block only; the rest of the batch still runs
+            results[block_id] = {'source': 'local', 'error': 'Invalid equation'}
+            continue
+
+        formatted = format_latex_content(equation or '')
+        problem = find_latex_error(formatted)
+        if problem is None:
+            results[block_id] = {'formatted': formatted, 'source': 'local'}
+            continue
+        cached = ai_cache.get(_latex_batch_key(equation))
+        if cached is not None:
+            results[block_id] = {'formatted': cached, 'source': 'cache'}
+            continue
+        # Until the model answers, the best local attempt is the result
+        results[block_id] = {'formatted': formatted, 'source': 'local', 'error': problem}
+        pending[block_id] = equation
+
+    model_calls = 0
+    if pending:
+        try:
+            response = ai_gateway.generate(
+                get_jwt_identity(),
+                json.dumps(pending),
+                model=latexBatchModel,
+                generation_config={'response_mime_type': 'application/json'}
+            )
+            model_calls = 1
+            fixed = json.loads(_strip_code_fence(response.text))
+            if not isinstance(fixed, dict):
+                raise ValueError('AI response is not a JSON object')
+            for block_id, equation in pending.items():
+                formatted = fixed.get(block_id)
+                if not isinstance(formatted, str) or not formatted.strip():
+                    continue
+                formatted = _strip_code_fence(formatted)
+                ai_cache.set(_latex_batch_key(equation), formatted)
+                results[block_id] = {'formatted': formatted, 'source': 'ai'}
+        except GatewayRejected as e:
+            for block_id in pending:
+                results[block_id]['error'] = str(e)
+        except Exception as e:
+            print(f"Error formatting LaTeX batch with AI: {str(e)}")
+
+    return jsonify({
+        'results': results,
+        'model_calls': model_calls,
+        'message': 'LaTeX formatted successfully'
+    })
+
 def cleanup_latex(latex: str) -> str:
     """Additional cleanup for LaTeX code after AI formatting"""
     
@@ -618,130 +1107,53 @@ def cleanup_latex(latex: str) -> str:
     
     return latex
 
-def format_latex_content(content: str) -> str:
-    """
-    Format LaTeX content for proper rendering.
-    
-    Rules:
-    1. Ensure proper equation environment
-    2. Fix common syntax issues
-    3. Add proper spacing
-    4. Handle multi-line equations
-    """
-    # Remove extra whitespace and normalize line endings
-    content = content.strip()
-    
-    # Handle common LaTeX formatting issues
-    replacements = {
-        # Fix spacing around operators
-        '+': ' + ',
-        '-': ' - ',
-        '=': ' = ',
-        
-        # Fix fraction formatting
-        'frac': '\\frac',
-        
-        # Fix sum/integral formatting
-        'sum': '\\sum',
-        'int': '\\int',
-        
-        # Fix subscript/superscript spacing
-        '_': '_{',
-        '^': '^{',
-        
-        # Fix common function names
-        'sin': '\\sin',
-        'cos': '\\cos',
-        'tan': '\\tan',
-        'log': '\\log',
-        'ln': '\\ln',
-        'lim': '\\lim',
-        
-        # Fix matrix environments
-        'matrix': '\\matrix',
-        'pmatrix': '\\pmatrix',
-        'bmatrix': '\\bmatrix',
-        
-        # Fix Greek letters
-        'alpha': '\\alpha',
-        'beta': '\\beta',
-        'gamma': '\\gamma',
-        'delta': '\\delta',
-        'theta': '\\theta',
-        'pi': '\\pi',
-        'sigma': '\\sigma',
-        'omega': '\\omega',
-        
-        # Fix arrows and symbols
-        '->': '\\rightarrow',
-        '<-': '\\leftarrow',
-        '<=': '\\leq',
-        '>=': '\\geq',
-        '!=': '\\neq',
-        'inf': '\\infty',
-    }
-    
-    # Apply replacements while preserving existing correct formatting
-    formatted = content
-    for old, new in replacements.items():
-        if old not in ['_', '^']:  # Skip subscript/superscript for now
-            # Only replace if not already in LaTeX format
-            if not formatted.find(new) >= 0:
-                formatted = formatted.replace(old, new)
-    
-    # Handle equation environments
-    if not formatted.startswith('\\begin{equation}') and not formatted.startswith('$$'):
-        # Check if it's a single-line equation
-        if '\n' not in formatted:
-            formatted = f'$${formatted}$$'
-        else:
-            # Multi-line equation
-            formatted = '\\begin{align*}\n' + formatted + '\n\\end{align*}'
-    
-    # Handle subscripts and superscripts
-    lines = formatted.split('\n')
-    for i, line in enumerate(lines):
-        # Find subscripts/superscripts without braces and add them
-        for char in ['_', '^']:
-            parts = line.split(char)
-            for j in range(1, len(parts)):
-                if parts[j] and parts[j][0] != '{':
-                    # Add braces around single character or number
-                    first_char = parts[j][0]
-                    parts[j] = '{' + first_char + '}' + parts[j][1:]
-            lines[i] = char.join(parts)
-    
-    formatted = '\n'.join(lines)
-    
-    # Ensure proper spacing around delimiters
-    delimiters = ['\\left', '\\right', '\\big', '\\Big']
-    for delimiter in delimiters:
-        formatted = formatted.replace(delimiter, f' {delimiter} ')
-    
-    # Clean up multiple spaces
-    formatted = ' '.join(formatted.split())
-    
-    # Handle special cases for matrices
-    if '\\begin{matrix}' in formatted:
-        formatted = formatted.replace('&', ' & ')
-        formatted = formatted.replace('\\\\', '\\\\\n')
-    
-    # Restore proper line breaks for multi-line equations
-    formatted = formatted.replace('\\\\', '\\\\\n')
-    
-    # Fix common mistakes with parentheses
-    formatted = formatted.replace('( ', '(').replace(' )', ')')
-    
-    return formatted
-
 # Folder related endpoints
 @notes_blueprint.route('/folders/', methods=['GET'])
 @cross_origin()
 @jwt_required()
 def get_folders():
     user_id = get_jwt_identity()
-    folders = db.from_('note_folders').select('*').eq('user_id', user_id).execute()
-    return jsonify(folders.data)
+    folders = read_cache.get(user_id, 'folders',
+                             lambda: db.from_('note_folders').select('*').eq('user_id', user_id).execute().data)
+    return jsonify(folders)
+
+def _invalidate_folders(user_id, tree_only=False):
+    """Drop the cached folder list and tree; note mutations only change the tree's counts"""
+    if tree_only:
+        read_cache.invalidate(user_id, 'folder_tree')
+    else:
+        read_cache.invalidate(user_id, 'folders', 'folder_tree')
+
+@notes_blueprint.route('/folders/tree/', methods=['GET'])
+@cross_origin()
+@jwt_required()
+def get_folder_tree():
+    """
+    Folders with their note counts and latest note update, for the sidebar.
+
+    Counts come from one grouped query (the folder_tree function) instead of
+    downloading every note, and the result is cached per user until a note
+    or folder mutation invalidates it.
+    """
+    user_id = get_jwt_identity()
+    try:
+        return jsonify(read_cache.get(user_id, 'folder_tree', lambda: _load_folder_tree(user_id)))
+    except Exception as e:
+        print(f"Error building folder tree: {str(e)}")
+        return jsonify({'error': 'Failed to load folders'}), 500
+
+def _load_folder_tree(user_id):
+    rows = db.rpc('folder_tree', {'p_user_id': user_id}).execute().data or []
+    folders = [row for row in rows if row['id'] is not None]
+    unfiled = next((row for row in rows if row['id'] is None), None)
+    return {
+        'folders': folders,
+        'unfiled': {
+            'note_count': unfiled['note_count'] if unfiled else 0,
+            'last_note_at': unfiled['last_note_at'] if unfiled else None
+        },
+        'total_notes': sum(row['note_count'] for row in rows)
+    }
 
 @notes_blueprint.route('/folders/', methods=['POST'])
 @cross_origin()
@@ -760,15 +1172,10 @@ def create_folder():
     if 'color' in data:
         new_folder['color'] = data['color']
         
-    result = db.from_('note_folders').insert(new_folder).execute()
-    
-    # Get the created folder with ID
-    if result.data:
-        folder_id = result.data[0]['id']
-        folder = db.from_('note_folders').select('*').eq('id', folder_id).single().execute()
-        return jsonify(folder.data)
-    
-    return jsonify(new_folder)
+    # The insert returns the stored row, id included
+    folder = insert_row('note_folders', new_folder)
+    _invalidate_folders(user_id)
+    return jsonify(folder or new_folder)
 
 @notes_blueprint.route('/folders/<uuid:folder_id>', methods=['PUT'])
 @cross_origin()
@@ -777,25 +1184,23 @@ def update_folder(folder_id):
     user_id = get_jwt_identity()
     data = request.json
     
-    # First check if the folder belongs to the user
-    folder = db.from_('note_folders').select('*').eq('id', folder_id).eq('user_id', user_id).single().execute()
-    
-    if not folder.data:
-        return jsonify({'error': 'Folder not found or access denied'}), 404
-    
     updates = {}
     if 'name' in data:
         updates['name'] = data['name']
     if 'color' in data:
         updates['color'] = data['color']
-        
-    if updates:
-        updates['updated_at'] = datetime.now().isoformat()
-        db.from_('note_folders').update(updates).eq('id', folder_id).execute()
-        
-    # Get updated folder
-    updated_folder = db.from_('note_folders').select('*').eq('id', folder_id).single().execute()
-    return jsonify(updated_folder.data)
+
+    if not updates:
+        folder = fetch_row('note_folders', not_found='Folder not found or access denied',
+                           id=folder_id, user_id=user_id)
+        return jsonify(folder)
+
+    # The ownership check is part of the update's filter
+    updates['updated_at'] = datetime.now().isoformat()
+    folder = update_row('note_folders', updates, not_found='Folder not found or access denied',
+                        id=folder_id, user_id=user_id)
+    _invalidate_folders(user_id)
+    return jsonify(folder)
 
 @notes_blueprint.route('/folders/<uuid:folder_id>', methods=['DELETE'])
 @cross_origin()
@@ -803,18 +1208,10 @@ def update_folder(folder_id):
 def delete_folder(folder_id):
     user_id = get_jwt_identity()
     
-    # First check if the folder belongs to the user
-    folder = db.from_('note_folders').select('*').eq('id', folder_id).eq('user_id', user_id).single().execute()
-    
-    if not folder.data:
-        return jsonify({'error': 'Folder not found or access denied'}), 404
-    
-    # Delete the folder
-    db.from_('note_folders').delete().eq('id', folder_id).execute()
-    
-    # Update notes that were in this folder (set folder_id to null)
-    db.from_('notes').update({'folder_id': None}).eq('folder_id', folder_id).execute()
-    
+    # notes.folder_id is ON DELETE SET NULL, so the folder's notes are unfiled by the delete itself
+    delete_row('note_folders', not_found='Folder not found or access denied', id=folder_id, user_id=user_id)
+    _invalidate_folders(user_id)
+
     return jsonify({'message': 'Folder deleted successfully'})
 
 @notes_blueprint.route('/notes/<uuid:note_id>/move', methods=['PUT'])
@@ -825,30 +1222,96 @@ def move_note(note_id):
     data = request.json
     folder_id = data.get('folder_id')
     
-    # First check if the note belongs to the user
-    note = db.from_('notes').select('*').eq('id', note_id).eq('user_id', user_id).single().execute()
-    
-    if not note.data:
-        return jsonify({'error': 'Note not found or access denied'}), 404
-    
     # If folder_id is provided, check if it exists
     if folder_id:
-        folder = db.from_('note_folders').select('*').eq('id', folder_id).eq('user_id', user_id).single().execute()
-        
-        if not folder.data:
-            return jsonify({'error': 'Folder not found or access denied'}), 404
-    
-    # Update the note's folder
+        fetch_row('note_folders', 'id', not_found='Folder not found or access denied',
+                  id=folder_id, user_id=user_id)
+
+    # Update the note's folder; the ownership check is part of the filter
     update_data = {
         'folder_id': folder_id,
         'updated_at': datetime.now().isoformat()
     }
-    
-    db.from_('notes').update(update_data).eq('id', note_id).execute()
-    
-    # Get updated note
-    updated_note = db.from_('notes').select('*').eq('id', note_id).single().execute()
-    return jsonify(updated_note.data)
+    note = update_row('notes', update_data, not_found='Note not found or access denied',
+                      id=note_id, user_id=user_id)
+    _invalidate_folders(user_id, tree_only=True)
+    return jsonify(note)
+
+def _bulk_note_ids(data):
+    """Split the request's note_ids into valid UUID strings and a report for the invalid ones"""
+    note_ids = data.get('note_ids') if data else None
+    if not isinstance(note_ids, list) or not note_ids:
+        return None, None, (jsonify({'error': 'note_ids must be a non-empty list'}), 400)
+    if len(note_ids) > BULK_MAX_NOTES:
+        return None, None, (jsonify({'error': f'At most {BULK_MAX_NOTES} notes per request'}), 400)
+
+    valid, report = [], {}
+    for note_id in note_ids:
+        try:
+            valid.append(str(uuid.UUID(str(note_id))))
+        except ValueError:
+            report[str(note_id)] = 'invalid_id'
+    return list(dict.fromkeys(valid)), report, None
+
+@notes_blueprint.route('/notes/bulk/move', methods=['POST'])
+@cross_origin()
+@jwt_required()
+def bulk_move_notes():
+    """
+    Move many notes into a folder (or out of any folder with folder_id null).
+
+    Ownership is part of the update's filter, so the whole batch is one
+    statement; ids that are not the user's simply match no row and are
+    reported as not_found.
+    """
+    user_id = get_jwt_identity()
+    data = request.json
+    note_ids, results, error = _bulk_note_ids(data)
+    if error:
+        return error
+    folder_id = data.get('folder_id')
+
+    if folder_id:
+        folder = db.from_('note_folders').select('id').eq('id', folder_id).eq('user_id', user_id).execute()
+        if not folder.data:
+            return jsonify({'error': 'Folder not found or access denied'}), 404
+
+    moved = []
+    if note_ids:
+        query = db.from_('notes').update({
+            'folder_id': folder_id,
+            'updated_at': datetime.now().isoformat()
+        }).in_('id', note_ids).eq('user_id', user_id)
+        moved = returning(query, BULK_RESULT_COLUMNS).execute().data or []
+        _invalidate_folders(user_id, tree_only=True)
+
+    moved_ids = {note['id'] for note in moved}
+    for note_id in note_ids:
+        results[note_id] = 'moved' if note_id in moved_ids else 'not_found'
+
+    return jsonify({'notes': moved, 'results': results, 'moved': len(moved)})
+
+@notes_blueprint.route('/notes/bulk/delete', methods=['POST'])
+@cross_origin()
+@jwt_required()
+def bulk_delete_notes():
+    """Delete many notes in one statement, reporting which ids were deleted"""
+    user_id = get_jwt_identity()
+    note_ids, results, error = _bulk_note_ids(request.json)
+    if error:
+        return error
+
+    deleted = []
+    if note_ids:
+        query = db.from_('notes').delete().in_('id', note_ids).eq('user_id', user_id)
+        deleted = returning(query, BULK_RESULT_COLUMNS).execute().data or []
+        _invalidate_folders(user_id, tree_only=True)
+
+    deleted_ids = {note['id'] for note in deleted}
+    for note_id in note_ids:
+        results[note_id] = 'deleted' if note_id in deleted_ids else 'not_found'
+
+    return jsonify({'notes': deleted, 'results': results, 'deleted': len(deleted)})
 
 @notes_blueprint.route('/delete_note/<uuid:note_id>', methods=['DELETE'])
 @cross_origin()
@@ -856,13 +1319,7 @@ def move_note(note_id):
 def delete_note(note_id):
     user_id = get_jwt_identity()
     
-    # First check if the note belongs to the user
-    note = db.from_('notes').select('*').eq('id', note_id).eq('user_id', user_id).single().execute()
-    
-    if not note.data:
-        return jsonify({'error': 'Note not found or access denied'}), 404
-    
-    # Delete the note
-    db.from_('notes').delete().eq('id', note_id).execute()
-    
+    delete_row('notes', not_found='Note not found or access denied', id=note_id, user_id=user_id)
+    _invalidate_folders(user_id, tree_only=True)
+
     return jsonify({'message': 'Note deleted successfully'})
\ No newline at end of file
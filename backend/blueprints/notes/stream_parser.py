@@ -0,0 +1,80 @@
+import json
+from typing import Dict, List
+
+
+class BlockStreamParser:
+    """
+    Incrementally parse a streamed JSON array of blocks.
+
+    Model output arrives in arbitrary text chunks, possibly wrapped in a
+    ```json fence. Each character is scanned exactly once; only the text of
+    the block currently being read is buffered, and every top-level object
+    is decoded as soon as its closing brace arrives.
+    """
+
+    def __init__(self):
+        self.started = False
+        self.finished = False
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+        self.current: List[str] = []
+        self.skipped = 0
+
+    def feed(self, text: str) -> List[Dict]:
+        """Consume a chunk and return the blocks it completed"""
+        blocks = []
+        start = None
+        for i, char in enumerate(text):
+            if self.finished:
+                break
+            if not self.started:
+                # Anything before the array (fences, prose) is ignored
+                if char == '[':
+                    self.started = True
+                continue
+
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif char == '\\':
+                    self.escaped = True
+                elif char == '"':
+                    self.in_string = False
+                continue
+
+            if char == '"':
+                self.in_string = True
+            elif char in '{[':
+                if self.depth == 0:
+                    start = i
+                self.depth += 1
+            elif char in '}]':
+                if self.depth == 0:
+                    # Closing bracket of the top-level array
+                    self.finished = True
+                    continue
+                self.depth -= 1
+                if self.depth == 0:
+                    self.current.append(text[start if start is not None else 0:i + 1])
+                    start = None
+                    block = self._decode(''.join(self.current))
+                    self.current = []
+                    if block is not None:
+                        blocks.append(block)
+
+        # Carry the unfinished block over to the next chunk
+        if self.depth > 0:
+            self.current.append(text[start if start is not None else 0:])
+        return blocks
+
+    def _decode(self, raw: str):
+        try:
+            block = json.loads(raw)
+        except json.JSONDecodeError:
+            self.skipped += 1
+            return None
+        if isinstance(block, dict) and all(key in block for key in ['id', 'type', 'props', 'content']):
+            return block
+        self.skipped += 1
+        return None
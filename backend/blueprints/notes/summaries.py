@@ -0,0 +1,77 @@
+import base64
+import uuid
+from datetime import datetime
+
+SUMMARY_COLUMNS = 'id, title, cover_image, cover_variants, folder_id, created_at, updated_at, excerpt'
+SUMMARY_PAGE_SIZE = 20
+SUMMARY_MAX_PAGE_SIZE = 100
+
+
+def encode_cursor(note):
+    raw = f"{note['updated_at']}|{note['id']}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """
+    (updated_at, note_id) from a cursor; raises ValueError unless they are an
+    ISO timestamp and a UUID, since both are spliced into the PostgREST filter
+    """
+    updated_at, note_id = base64.urlsafe_b64decode(cursor.encode()).decode().split('|', 1)
+    datetime.fromisoformat(updated_at)
+    return updated_at, str(uuid.UUID(note_id))
+
+
+def summary_query(client, user_id, args):
+    """
+    Keyset-paginated listing query, newest first, plus the page size.
+
+    `client` may be the sync or the async Supabase client; the caller runs
+    the query. Raises ValueError with a client-facing message on bad args.
+    """
+    try:
+        limit = min(int(args.get('limit', SUMMARY_PAGE_SIZE)), SUMMARY_MAX_PAGE_SIZE)
+    except ValueError:
+        raise ValueError('Invalid limit')
+    if limit < 1:
+        raise ValueError('Invalid limit')
+
+    query = client.from_('notes').select(SUMMARY_COLUMNS).eq('user_id', user_id)
+    if args.get('folder_id'):
+        query = query.eq('folder_id', args['folder_id'])
+
+    cursor = args.get('cursor')
+    if cursor:
+        try:
+            updated_at, note_id = decode_cursor(cursor)
+        except ValueError:
+            raise ValueError('Invalid cursor')
+        query = query.or_(
+            f'updated_at.lt."{updated_at}",'
+            f'and(updated_at.eq."{updated_at}",id.lt.{note_id})'
+        )
+
+    # Fetch one extra row to know whether another page exists
+    query = query.order('updated_at', desc=True)\
+        .order('id', desc=True)\
+        .limit(limit + 1)
+    return query, limit
+
+
+def summary_page(rows, limit):
+    """The page of notes and the cursor for the next one"""
+    notes = rows[:limit]
+    next_cursor = encode_cursor(notes[-1]) if len(rows) > limit else None
+    return notes, next_cursor
+
+
+def missing_excerpt_query(client, notes):
+    """
+    Bodies of the page's notes that have no stored excerpt yet, or None when
+    every note has one. Only those bodies are read, and only to compute the
+    excerpt for the response.
+    """
+    ids = [note['id'] for note in notes if note.get('excerpt') is None]
+    if not ids:
+        return None
+    return client.from_('notes').select('id, note').in_('id', ids)
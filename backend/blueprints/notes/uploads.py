@@ -0,0 +1,298 @@
+import base64
+import hashlib
+import os
+import httpx
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import MultipartDecoder, NeedData, Field, File, Data, Epilogue
+from db import url, key, RetryTransport, AsyncRetryTransport, HTTP2, LIMITS
+
+# Hard cap for a single-request upload; larger files go through the resumable path
+MAX_UPLOAD_BYTES = int(os.environ.get('MAX_UPLOAD_BYTES', 50 * 1024 * 1024))
+MAX_RESUMABLE_BYTES = int(os.environ.get('MAX_RESUMABLE_BYTES', 1024 * 1024 * 1024))
+READ_CHUNK_BYTES = 256 * 1024
+# Content-addressed objects never change, so clients may cache them forever
+IMMUTABLE_CACHE_CONTROL = '31536000, immutable'
+# Supabase's resumable (TUS) endpoint requires 6MB chunks except for the last one
+RESUMABLE_CHUNK_BYTES = 6 * 1024 * 1024
+# Form fields sent alongside a file are small; they are the only part held in memory
+MAX_FORM_FIELD_BYTES = 64 * 1024
+
+STORAGE_URL = f"{url}/storage/v1"
+STORAGE_HEADERS = {'apikey': key, 'Authorization': f'Bearer {key}'}
+
+STORAGE_TIMEOUT = httpx.Timeout(60.0, connect=10.0)
+
+# Storage has its own pool without the Supabase call deadline, which would cut
+# these timeouts to 30s; an upload takes as long as its body takes to stream
+storage_http = httpx.Client(headers=STORAGE_HEADERS, timeout=STORAGE_TIMEOUT,
+                            transport=RetryTransport(http2=HTTP2, limits=LIMITS, deadline=None))
+
+
+class UploadError(Exception):
+    """Raised when an upload is rejected or storage refuses it; carries the HTTP status"""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+def _check_storage(response):
+    """A storage error is an upstream failure (502); 400 stays for bad request bodies"""
+    if response.status_code >= 400:
+        raise UploadError(502, response.text)
+
+
+def check_content_length(content_length, limit=MAX_UPLOAD_BYTES):
+    """Reject a request from its headers before any of the body is read"""
+    if content_length is not None and content_length > limit:
+        raise UploadError(413, f'File exceeds the {limit // (1024 * 1024)}MB upload limit')
+
+
+class _CountingReader:
+    """Yields a file stream in fixed-size chunks, enforcing the size cap as it goes"""
+
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.limit = limit
+        self.size = 0
+
+    def __iter__(self):
+        while True:
+            chunk = self.stream.read(READ_CHUNK_BYTES)
+            if not chunk:
+                return
+            self.size += len(chunk)
+            if self.size > self.limit:
+                raise UploadError(413, f'File exceeds the {self.limit // (1024 * 1024)}MB upload limit')
+            yield chunk
+
+
+class MultipartUpload:
+    """
+    The file part of a multipart/form-data request body, read straight off
+    the request stream.
+
+    Werkzeug's request.files parses the whole body into a SpooledTemporaryFile
+    (on disk past 500KB) before the view runs. This decodes the body as it is
+    read instead, so the file can go on to storage while it is still arriving.
+    Only the form fields sent ahead of the file are available, in `form`.
+    read() hands out the file's bytes as they arrive, then b'' once it ends.
+    """
+
+    def __init__(self, stream, content_type, field='file'):
+        mimetype, options = parse_options_header(content_type)
+        if mimetype != 'multipart/form-data' or not options.get('boundary'):
+            raise UploadError(400, 'Expected a multipart/form-data body')
+        self.stream = stream
+        self.decoder = MultipartDecoder(options['boundary'].encode(),
+                                        max_form_memory_size=MAX_FORM_FIELD_BYTES + READ_CHUNK_BYTES)
+        self.events = self._events()
+        self.form = {}
+        self.filename = None
+        self.content_type = None
+        self.finished = False
+        self._find_file(field)
+
+    def _events(self):
+        while True:
+            try:
+                event = self.decoder.next_event()
+            except ValueError:
+                raise UploadError(400, 'Malformed multipart body')
+            if isinstance(event, NeedData):
+                self.decoder.receive_data(self.stream.read(READ_CHUNK_BYTES) or None)
+                continue
+            yield event
+            if isinstance(event, Epilogue):
+                return
+
+    def _find_file(self, field):
+        part = None
+        value = []
+        for event in self.events:
+            if isinstance(event, File) and event.name == field:
+                self.filename = event.filename
+                self.content_type = event.headers.get('content-type')
+                return
+            if isinstance(event, (Field, File)):
+                part = event
+                value = []
+            elif isinstance(event, Data) and isinstance(part, Field):
+                # Other files are skipped; fields are kept
+                value.append(event.data)
+                if sum(map(len, value)) > MAX_FORM_FIELD_BYTES:
+                    raise UploadError(413, 'Form field too large')
+                if not event.more_data:
+                    self.form[part.name] = b''.join(value).decode('utf-8', 'replace')
+        self.finished = True
+
+    def read(self, size=-1):
+        while not self.finished:
+            event = next(self.events)
+            if not isinstance(event, Data):
+                continue
+            self.finished = not event.more_data
+            if event.data:
+                return event.data
+        return b''
+
+
+def stream_to_storage(bucket, path, stream, content_type, cache_control='3600', upsert=False,
+                      limit=MAX_UPLOAD_BYTES):
+    """
+    Upload a file stream to a storage bucket without buffering it whole.
+
+    The body is sent with chunked transfer encoding straight from the stream,
+    so memory use is one READ_CHUNK_BYTES buffer regardless of file size.
+    Given a MultipartUpload, nothing touches the disk either.
+    Returns (storage response, bytes uploaded).
+    """
+    reader = _CountingReader(stream, limit)
+    response = storage_http.post(
+        f"{STORAGE_URL}/object/{bucket}/{path}",
+        content=iter(reader),
+        headers={
+            'content-type': content_type or 'application/octet-stream',
+            'cache-control': f'max-age={cache_control}',
+            'x-upsert': 'true' if upsert else 'false'
+        }
+    )
+    _check_storage(response)
+    return response, reader.size
+
+
+def public_url(bucket, path):
+    return f"{STORAGE_URL}/object/public/{bucket}/{path}"
+
+
+def _tus_metadata(**fields):
+    return ','.join(f"{name} {base64.b64encode(str(value).encode()).decode()}" for name, value in fields.items())
+
+
+def create_resumable(bucket, path, length, content_type, cache_control='3600', upsert=False):
+    """Open a resumable upload session and return its id"""
+    check_content_length(length, MAX_RESUMABLE_BYTES)
+    response = storage_http.post(
+        f"{STORAGE_URL}/upload/resumable",
+        headers={
+            'Tus-Resumable': '1.0.0',
+            'Upload-Length': str(length),
+            'Upload-Metadata': _tus_metadata(
+                bucketName=bucket,
+                objectName=path,
+                contentType=content_type or 'application/octet-stream',
+                cacheControl=cache_control
+            ),
+            'x-upsert': 'true' if upsert else 'false'
+        }
+    )
+    _check_storage(response)
+    return response.headers['location'].rstrip('/').rsplit('/', 1)[-1]
+
+
+def check_upload_owner(upload_id, user_id, bucket='attachments'):
+    """
+    Refuse a resumable upload id unless it points into the user's folder.
+
+    Storage ids are the base64url of "<bucket>/<object path>/<version>", and
+    create_resumable puts every object under "<user_id>/". Anything else is
+    reported as missing rather than forbidden.
+    """
+    try:
+        decoded = base64.urlsafe_b64decode(upload_id + '=' * (-len(upload_id) % 4)).decode()
+    except ValueError:
+        raise UploadError(404, 'Upload session not found')
+    upload_bucket, _, rest = decoded.partition('/')
+    object_path = rest.rpartition('/')[0]
+    if upload_bucket != bucket or not object_path.startswith(f"{user_id}/") or '..' in object_path.split('/'):
+        raise UploadError(404, 'Upload session not found')
+
+
+def resumable_offset(upload_id):
+    """Bytes the storage server has received so far for a session"""
+    response = storage_http.head(
+        f"{STORAGE_URL}/upload/resumable/{upload_id}",
+        headers={'Tus-Resumable': '1.0.0'}
+    )
+    if response.status_code >= 400:
+        raise UploadError(404, 'Upload session not found')
+    return int(response.headers['upload-offset']), int(response.headers.get('upload-length', 0))
+
+
+def append_resumable(upload_id, offset, stream):
+    """Forward one client chunk to the session, streaming it through unbuffered"""
+    response = storage_http.patch(
+        f"{STORAGE_URL}/upload/resumable/{upload_id}",
+        content=iter(_CountingReader(stream, RESUMABLE_CHUNK_BYTES)),
+        headers={
+            'Tus-Resumable': '1.0.0',
+            'Upload-Offset': str(offset),
+            'Content-Type': 'application/offset+octet-stream'
+        }
+    )
+    if response.status_code == 409:
+        raise UploadError(409, 'Upload offset does not match the server')
+    _check_storage(response)
+    return int(response.headers['upload-offset'])
+
+
+_async_storage_http = None
+
+
+def async_storage_http():
+    """Storage client for the ASGI entry point, on its own async connection pool"""
+    global _async_storage_http
+    if _async_storage_http is None:
+        _async_storage_http = httpx.AsyncClient(
+            headers=STORAGE_HEADERS,
+            timeout=STORAGE_TIMEOUT,
+            transport=AsyncRetryTransport(http2=HTTP2, limits=LIMITS, deadline=None)
+        )
+    return _async_storage_http
+
+
+async def _count_chunks(chunks, limit):
+    size = 0
+    async for chunk in chunks:
+        size += len(chunk)
+        if size > limit:
+            raise UploadError(413, f'File exceeds the {limit // (1024 * 1024)}MB upload limit')
+        yield chunk
+
+
+async def append_resumable_async(upload_id, offset, chunks):
+    """append_resumable for an async byte stream, e.g. an ASGI request body"""
+    response = await async_storage_http().patch(
+        f"{STORAGE_URL}/upload/resumable/{upload_id}",
+        content=_count_chunks(chunks, RESUMABLE_CHUNK_BYTES),
+        headers={
+            'Tus-Resumable': '1.0.0',
+            'Upload-Offset': str(offset),
+            'Content-Type': 'application/offset+octet-stream'
+        }
+    )
+    if response.status_code == 409:
+        raise UploadError(409, 'Upload offset does not match the server')
+    _check_storage(response)
+    return int(response.headers['upload-offset'])
+
+
+def hash_stream(stream):
+    """
+    sha256 and size of a seekable upload stream, read in chunks.
+
+    Deduplication needs the hash before deciding whether to upload, so unlike
+    MultipartUpload this reads a file Werkzeug has already spooled (in memory
+    up to 500KB, in a temporary file beyond). This pass costs no network
+    traffic and lets the upload be skipped when the content is already stored.
+    """
+    digest = hashlib.sha256()
+    reader = _CountingReader(stream, MAX_UPLOAD_BYTES)
+    for chunk in reader:
+        digest.update(chunk)
+    stream.seek(0)
+    return digest.hexdigest(), reader.size
+
+
+def blob_path(content_hash):
+    return f"blobs/{content_hash[:2]}/{content_hash}"
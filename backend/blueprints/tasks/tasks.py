@@ -1,5 +1,8 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, g
 from db import db
+from mutations import returning
+from read_cache import read_cache
+from conditional import conditional
 import datetime
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
@@ -12,10 +15,11 @@ def tasks_test():
 
 
 @tasks_blueprint.route('/get_tasks/<user_id>', methods=['GET'])
+@conditional('tasks')
 def get_tasks(user_id):
-    tasks = db.from_('tasks').select().eq('user_id', user_id).execute()    
-    print(tasks.data)
-    return jsonify(tasks.data)
+    tasks = read_cache.get(user_id, 'tasks', lambda: db.from_('tasks').select().eq('user_id', user_id).execute().data,
+                           g.get('resource_versions'))
+    return jsonify(tasks)
 
 
 @tasks_blueprint.route('/update_task/', methods=['POST'])
@@ -24,9 +28,12 @@ def update_task():
     updated_task = {
         'task': data['task'],
         'completed': data['completed'],
-        'updated_at': datetime.now().isoformat()
+        'updated_at': datetime.datetime.now().isoformat()
     }
-    db.from_('tasks').update(updated_task).eq('id', data['id']).execute()
+    # The owner comes back with the update so their cached list can be dropped
+    result = returning(db.from_('tasks').update(updated_task).eq('id', data['id']), 'user_id').execute()
+    for row in result.data:
+        read_cache.invalidate(row['user_id'], 'tasks')
     return jsonify(updated_task)
 
 @tasks_blueprint.route('/create_task', methods=['POST'])
@@ -46,4 +53,5 @@ def add_task():
         'updatedat': datetime.datetime.now().isoformat()
     }
     db.from_('tasks').insert(new_task).execute()
+    read_cache.invalidate(user_id, 'tasks')
     return jsonify(new_task)
\ No newline at end of file
@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
 from db import db
+from read_cache import read_cache
 import flask_bcrypt
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
 from datetime import timedelta
@@ -136,13 +137,14 @@ def get_user():
         # Get user identity from JWT
         id = get_jwt_identity()
         
-        # Query user details from database
-        user_result = db.table('users').select('*').eq('id', id).execute()
+        # Query user details from database; profiles only change at registration, so the TTL bounds staleness
+        user_rows = read_cache.get(id, 'user',
+                                   lambda: db.table('users').select('id, email, name').eq('id', id).execute().data)
         
-        if not user_result.data:
+        if not user_rows:
             return jsonify({'error': 'User not found'}), 404
 
-        user = user_result.data[0]
+        user = user_rows[0]
         
         return jsonify({
             'user': {
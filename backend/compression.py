@@ -0,0 +1,113 @@
+import os
+import zlib
+from flask import request
+from response_stats import response_stats
+
+try:
+    import brotli
+except ImportError:
+    # Optional; without it clients are offered gzip only
+    brotli = None
+
+# Bodies smaller than this cost more to compress than they save on the wire
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', 1024))
+GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', 6))
+# Dynamic responses: quality 4 compresses about as fast as gzip -6 and smaller
+BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+COMPRESSIBLE_TYPES = {'application/json', 'text/event-stream', 'text/plain', 'text/html', 'text/css',
+                      'application/javascript'}
+
+
+def negotiate(accept_encodings):
+    """Pick br or gzip from a parsed Accept-Encoding header, or None to send the body as is"""
+    br = accept_encodings['br'] if brotli is not None else 0
+    gzip = accept_encodings['gzip']
+    if br and br >= gzip:
+        return 'br'
+    if gzip:
+        return 'gzip'
+    return None
+
+
+class StreamCompressor:
+    """Incremental gzip/brotli encoder; chunk() flushes so each piece reaches the client right away"""
+
+    def __init__(self, encoding):
+        self.encoding = encoding
+        if encoding == 'br':
+            self.compressor = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self.compressor = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)
+
+    def chunk(self, data):
+        if self.encoding == 'br':
+            return self.compressor.process(data) + self.compressor.flush()
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def last(self, data=b''):
+        if self.encoding == 'br':
+            return self.compressor.process(data) + self.compressor.finish()
+        return self.compressor.compress(data) + self.compressor.flush()
+
+
+def weaken_etag(headers):
+    # A compressed body is a different representation; If-None-Match compares weakly, so 304s still work
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        headers['ETag'] = 'W/' + etag
+
+
+def _compressed_stream(chunks, encoding, endpoint):
+    compressor = StreamCompressor(encoding)
+    raw = sent = 0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            if not chunk:
+                continue
+            raw += len(chunk)
+            data = compressor.chunk(chunk)
+            sent += len(data)
+            yield data
+        data = compressor.last()
+        sent += len(data)
+        yield data
+        response_stats.record_body(endpoint, raw, sent, encoding)
+    finally:
+        # Closing the wrapper must still stop the view's generator (e.g. a client leaving an SSE stream)
+        close = getattr(chunks, 'close', None)
+        if close is not None:
+            close()
+
+
+def compress_response(response):
+    if response.mimetype not in COMPRESSIBLE_TYPES or response.direct_passthrough:
+        return response
+    response.vary.add('Accept-Encoding')
+    if response.status_code < 200 or response.status_code in (204, 304) or 'Content-Encoding' in response.headers:
+        return response
+
+    encoding = negotiate(request.accept_encodings)
+    if response.is_streamed:
+        if encoding is not None:
+            response.response = _compressed_stream(response.response, encoding, request.endpoint)
+            response.headers['Content-Encoding'] = encoding
+            response.headers.pop('Content-Length', None)
+            weaken_etag(response.headers)
+        return response
+
+    data = response.get_data()
+    if encoding is None or len(data) < COMPRESS_MIN_BYTES:
+        response_stats.record_body(request.endpoint, len(data), len(data))
+        return response
+    body = StreamCompressor(encoding).last(data)
+    response.set_data(body)
+    response.headers['Content-Encoding'] = encoding
+    weaken_etag(response.headers)
+    response_stats.record_body(request.endpoint, len(data), len(body), encoding)
+    return response
+
+
+def init_compression(app):
+    app.after_request(compress_response)
@@ -1,6 +1,290 @@
+import asyncio
 import os
-from supabase import create_client, Client
+import random
+import threading
+import time
+import httpx
+from postgrest import AsyncPostgrestClient, SyncPostgrestClient
+from postgrest.utils import SyncClient
+from supabase import AsyncClient, AsyncClientOptions, Client, ClientOptions
 
 url: str = os.environ.get("SUPABASE_URL")
 key: str = os.environ.get("SUPABASE_KEY")
-db: Client = create_client(url, key)
+
+# Connect and pool waits are short so a Supabase outage fails fast instead of
+# parking worker threads; reads get longer for slow queries.
+CONNECT_TIMEOUT = float(os.environ.get('SUPABASE_CONNECT_TIMEOUT', 5))
+READ_TIMEOUT = float(os.environ.get('SUPABASE_READ_TIMEOUT', 15))
+POOL_TIMEOUT = float(os.environ.get('SUPABASE_POOL_TIMEOUT', 5))
+# Total time one call may take, retries and backoff included
+CALL_DEADLINE = float(os.environ.get('SUPABASE_CALL_DEADLINE', 30))
+MAX_RETRIES = int(os.environ.get('SUPABASE_MAX_RETRIES', 2))
+RETRY_BACKOFF = float(os.environ.get('SUPABASE_RETRY_BACKOFF', 0.2))
+MAX_CONNECTIONS = int(os.environ.get('SUPABASE_MAX_CONNECTIONS', 20))
+# httpcore closes idle connections above the keep-alive limit before serving
+# queued requests, so a lower limit reconnects on every burst
+MAX_KEEPALIVE = int(os.environ.get('SUPABASE_MAX_KEEPALIVE', MAX_CONNECTIONS))
+HTTP2 = os.environ.get('SUPABASE_HTTP2', 'true').lower() == 'true'
+
+# Only requests that can be repeated without side effects are retried
+IDEMPOTENT_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+RETRY_STATUSES = {429, 502, 503, 504}
+RETRY_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.ReadTimeout, httpx.PoolTimeout,
+                httpx.RemoteProtocolError)
+
+
+class _RetryPolicy:
+    """Retry decisions and counters shared by the sync and async transports"""
+
+    def _setup_retries(self, max_retries, backoff, deadline):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.deadline = deadline
+        self.lock = threading.Lock()
+        self.stats = {'requests': 0, 'retries': 0, 'errors': 0, 'in_flight': 0}
+
+    def _count(self, name, delta=1):
+        with self.lock:
+            self.stats[name] += delta
+
+    def _backoff(self, attempt, started, timeouts):
+        delay = random.uniform(0, self.backoff * (2 ** attempt))
+        # An attempt that the deadline would cut short isn't worth starting
+        attempt_time = max((value for value in timeouts.values() if value is not None), default=0)
+        if self.deadline is not None and time.monotonic() - started + delay + attempt_time > self.deadline:
+            return None
+        return delay
+
+    def _retry_delay(self, request, attempt, started, timeouts, response=None):
+        """Seconds to wait before retrying, or None to give up"""
+        if request.method not in IDEMPOTENT_METHODS or attempt >= self.max_retries:
+            return None
+        if response is not None and response.status_code not in RETRY_STATUSES:
+            return None
+        return self._backoff(attempt, started, timeouts)
+
+    def _limit_attempt(self, request, timeouts, started):
+        """Give this attempt the configured timeouts, cut down to what is left of the deadline"""
+        if self.deadline is None:
+            return
+        remaining = max(self.deadline - (time.monotonic() - started), 0)
+        request.extensions['timeout'] = {
+            phase: remaining if value is None else min(value, remaining) for phase, value in timeouts.items()
+        }
+
+    def snapshot(self):
+        connections = list(self._pool.connections)
+        with self.lock:
+            return {
+                **self.stats,
+                'connections': len(connections),
+                'idle_connections': sum(1 for connection in connections if connection.is_idle()),
+                'max_connections': MAX_CONNECTIONS,
+                'http2': HTTP2
+            }
+
+
+class RetryTransport(_RetryPolicy, httpx.HTTPTransport):
+    """
+    Connection-pooled transport shared by every Supabase client in the process.
+
+    httpx transports are thread-safe, so all Flask worker threads draw from
+    one bounded pool of keep-alive (or HTTP/2) connections. Idempotent reads
+    that fail on the network or with a retryable status are retried with
+    full-jitter exponential backoff, within CALL_DEADLINE: each attempt's
+    timeouts are cut to the time left, and a retry is only made when a whole
+    attempt still fits. A deadline of None leaves the request's own timeouts
+    alone.
+    """
+
+    def __init__(self, max_retries=MAX_RETRIES, backoff=RETRY_BACKOFF, deadline=CALL_DEADLINE, **kwargs):
+        super().__init__(**kwargs)
+        self._setup_retries(max_retries, backoff, deadline)
+
+    def handle_request(self, request):
+        started = time.monotonic()
+        attempt = 0
+        timeouts = dict(request.extensions.get('timeout') or {})
+        self._count('in_flight')
+        try:
+            while True:
+                self._count('requests')
+                self._limit_attempt(request, timeouts, started)
+                try:
+                    response = super().handle_request(request)
+                except RETRY_ERRORS:
+                    delay = self._retry_delay(request, attempt, started, timeouts)
+                    if delay is None:
+                        self._count('errors')
+                        raise
+                else:
+                    delay = self._retry_delay(request, attempt, started, timeouts, response)
+                    if delay is None:
+                        return response
+                    response.close()
+                self._count('retries')
+                attempt += 1
+                time.sleep(delay)
+        finally:
+            self._count('in_flight', -1)
+
+    def close(self):
+        # Shared by many clients, some of which supabase-py discards and may
+        # close; the pool lives for the whole process.
+        pass
+
+    def shutdown(self):
+        super().close()
+
+
+class AsyncRetryTransport(_RetryPolicy, httpx.AsyncHTTPTransport):
+    """
+    The asyncio counterpart of RetryTransport, used by the ASGI entry point.
+
+    Over HTTP/1.1 callers wait for a free connection on a semaphore rather
+    than in httpcore's pool queue, which rescans every waiting request on
+    each event and turns a burst of coroutines into quadratic work.
+    """
+
+    def __init__(self, max_retries=MAX_RETRIES, backoff=RETRY_BACKOFF, deadline=CALL_DEADLINE, **kwargs):
+        super().__init__(**kwargs)
+        self._setup_retries(max_retries, backoff, deadline)
+        limits = kwargs.get('limits')
+        self.slots = asyncio.Semaphore(limits.max_connections) if limits and not kwargs.get('http2') else None
+
+    async def _send(self, request):
+        if self.slots is None:
+            return await super().handle_async_request(request)
+        async with self.slots:
+            return await super().handle_async_request(request)
+
+    async def handle_async_request(self, request):
+        started = time.monotonic()
+        attempt = 0
+        timeouts = dict(request.extensions.get('timeout') or {})
+        self._count('in_flight')
+        try:
+            while True:
+                self._count('requests')
+                self._limit_attempt(request, timeouts, started)
+                try:
+                    response = await self._send(request)
+                except RETRY_ERRORS:
+                    delay = self._retry_delay(request, attempt, started, timeouts)
+                    if delay is None:
+                        self._count('errors')
+                        raise
+                else:
+                    delay = self._retry_delay(request, attempt, started, timeouts, response)
+                    if delay is None:
+                        return response
+                    await response.aclose()
+                self._count('retries')
+                attempt += 1
+                await asyncio.sleep(delay)
+        finally:
+            self._count('in_flight', -1)
+
+    async def aclose(self):
+        pass
+
+    async def shutdown(self):
+        await super().aclose()
+
+
+TIMEOUT = httpx.Timeout(READ_TIMEOUT, connect=CONNECT_TIMEOUT, pool=POOL_TIMEOUT)
+
+LIMITS = httpx.Limits(
+    max_connections=MAX_CONNECTIONS,
+    max_keepalive_connections=MAX_KEEPALIVE,
+    keepalive_expiry=60
+)
+
+transport = RetryTransport(http2=HTTP2, limits=LIMITS)
+
+
+class PooledPostgrestClient(SyncPostgrestClient):
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+        return SyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            follow_redirects=True,
+            transport=transport
+        )
+
+
+class PooledClient(Client):
+    """
+    Supabase client whose PostgREST sessions all use the shared transport.
+
+    supabase-py rebuilds its PostgREST client after auth events, so the
+    transport is injected where that client is created rather than patched
+    onto one instance.
+    """
+
+    @staticmethod
+    def _init_postgrest_client(rest_url, headers, schema, timeout=TIMEOUT, verify=True, proxy=None):
+        return PooledPostgrestClient(rest_url, headers=headers, schema=schema, timeout=timeout)
+
+
+class PooledAsyncPostgrestClient(AsyncPostgrestClient):
+    def create_session(self, base_url, headers, timeout, verify=True, proxy=None):
+        return httpx.AsyncClient(
+            base_url=base_url,
+            headers=headers,
+            timeout=timeout,
+            follow_redirects=True,
+            transport=get_async_transport()
+        )
+
+
+class PooledAsyncClient(AsyncClient):
+    @staticmethod
+    def _init_postgrest_client(rest_url, headers, schema, timeout=TIMEOUT, verify=True, proxy=None):
+        return PooledAsyncPostgrestClient(rest_url, headers=headers, schema=schema, timeout=timeout)
+
+
+_async_transport = None
+_async_db = None
+
+
+def get_async_transport():
+    """Async connection pool; created on first use so it binds to the serving event loop"""
+    global _async_transport
+    if _async_transport is None:
+        _async_transport = AsyncRetryTransport(http2=HTTP2, limits=LIMITS)
+    return _async_transport
+
+
+def get_async_db() -> AsyncClient:
+    """Supabase client for the ASGI entry point; same tables and options as db"""
+    global _async_db
+    if _async_db is None:
+        _async_db = PooledAsyncClient(url, key, AsyncClientOptions(postgrest_client_timeout=TIMEOUT))
+    return _async_db
+
+
+def warm_up(connections=1):
+    """Open connections to Supabase ahead of the first request"""
+    def ping():
+        try:
+            db.postgrest.session.head('/')
+        except Exception as e:
+            print(f"Supabase warm-up failed: {str(e)}")
+
+    # Over HTTP/2 one connection carries every request; HTTP/1.1 needs one per concurrent call
+    threads = [threading.Thread(target=ping, daemon=True) for _ in range(1 if HTTP2 else connections)]
+    for thread in threads:
+        thread.start()
+    return threads
+
+
+def pool_stats():
+    stats = {'sync': transport.snapshot()}
+    if _async_transport is not None:
+        stats['async'] = _async_transport.snapshot()
+    return stats
+
+
+db: Client = PooledClient(url, key, ClientOptions(postgrest_client_timeout=TIMEOUT))
@@ -0,0 +1,70 @@
+import json
+import time
+from datetime import date
+from decimal import Decimal
+import orjson
+from flask import request, has_request_context
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+from response_stats import response_stats
+
+# Sorted keys and passed-through dates keep the output identical to Flask's default provider
+ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+def _default(o):
+    if isinstance(o, date):
+        return http_date(o)
+    if isinstance(o, Decimal):
+        return str(o)
+    if hasattr(o, '__html__'):
+        return str(o.__html__())
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+def dumps_bytes(obj):
+    """Compact UTF-8 JSON for a response body"""
+    try:
+        return orjson.dumps(obj, default=_default, option=ORJSON_OPTIONS)
+    except orjson.JSONEncodeError:
+        # orjson rejects a few things the stdlib accepts, such as integers wider than 64 bits
+        return json.dumps(obj, default=_default, sort_keys=True, ensure_ascii=False,
+                          separators=(',', ':')).encode('utf-8')
+
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Flask's stdlib provider, with each response's serialization time recorded per endpoint"""
+
+    def _encode(self, obj):
+        return self.dumps(obj).encode('utf-8')
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        started = time.perf_counter()
+        body = self._encode(obj)
+        if has_request_context():
+            response_stats.record_serialization(request.endpoint, time.perf_counter() - started)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+class OrjsonProvider(TimedJSONProvider):
+    """orjson for jsonify, request.json and app.json; several times faster on nested note bodies"""
+
+    def _encode(self, obj):
+        return dumps_bytes(obj)
+
+    def dumps(self, obj, **kwargs):
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        return dumps_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+
+JSON_PROVIDERS = {
+    'orjson': OrjsonProvider,
+    'stdlib': TimedJSONProvider
+}
@@ -1,4 +1,9 @@
 from flask import Flask, request, jsonify
+from json_provider import JSON_PROVIDERS
+from compression import init_compression
+import os
 
 app = Flask(__name__)
-
+# JSON_PROVIDER=stdlib switches back to Flask's encoder, e.g. to compare the two
+app.json = JSON_PROVIDERS[os.environ.get('JSON_PROVIDER', 'orjson')](app)
+init_compression(app)
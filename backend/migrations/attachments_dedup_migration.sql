@@ -0,0 +1,46 @@
+-- Content-addressed storage objects shared by attachment rows
+CREATE TABLE IF NOT EXISTS attachment_objects (
+    hash TEXT PRIMARY KEY,
+    file_path TEXT NOT NULL,
+    size BIGINT,
+    content_type VARCHAR(255),
+    ref_count INTEGER NOT NULL DEFAULT 0,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
+);
+
+ALTER TABLE notes_attachments ADD COLUMN IF NOT EXISTS content_hash TEXT REFERENCES attachment_objects(hash) ON DELETE SET NULL;
+CREATE INDEX IF NOT EXISTS idx_notes_attachments_content_hash ON notes_attachments(content_hash);
+
+-- Take a reference on an object, creating its row on first use.
+-- Returns the reference count after the increment.
+CREATE OR REPLACE FUNCTION acquire_attachment_object(p_hash TEXT, p_file_path TEXT, p_size BIGINT, p_content_type TEXT)
+RETURNS INTEGER
+LANGUAGE SQL
+AS $$
+    INSERT INTO attachment_objects (hash, file_path, size, content_type, ref_count)
+    VALUES (p_hash, p_file_path, p_size, p_content_type, 1)
+    ON CONFLICT (hash) DO UPDATE SET ref_count = attachment_objects.ref_count + 1
+    RETURNING ref_count;
+$$;
+
+-- Drop a reference; the row goes away with the last one so the caller can
+-- remove the storage object. Returns the references left.
+CREATE OR REPLACE FUNCTION release_attachment_object(p_hash TEXT)
+RETURNS INTEGER
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    remaining INTEGER;
+BEGIN
+    UPDATE attachment_objects
+    SET ref_count = ref_count - 1
+    WHERE hash = p_hash
+    RETURNING ref_count INTO remaining;
+
+    IF remaining IS NOT NULL AND remaining <= 0 THEN
+        DELETE FROM attachment_objects WHERE hash = p_hash;
+    END IF;
+
+    RETURN COALESCE(remaining, 0);
+END;
+$$;
@@ -0,0 +1,34 @@
+-- Covers the per-user GROUP BY folder_id in folder_tree
+CREATE INDEX IF NOT EXISTS idx_notes_user_folder ON notes(user_id, folder_id);
+
+-- A user's folders with note counts and latest note update, in one grouped
+-- query. Notes without a folder come back as a single row with a NULL id.
+CREATE OR REPLACE FUNCTION folder_tree(p_user_id UUID)
+RETURNS TABLE(
+    id UUID,
+    name TEXT,
+    color TEXT,
+    created_at TIMESTAMP WITH TIME ZONE,
+    updated_at TIMESTAMP WITH TIME ZONE,
+    note_count BIGINT,
+    last_note_at TIMESTAMP WITH TIME ZONE
+)
+LANGUAGE SQL
+STABLE
+AS $$
+    WITH counts AS (
+        SELECT n.folder_id, count(*) AS note_count, max(n.updated_at) AS last_note_at
+        FROM notes n
+        WHERE n.user_id = p_user_id
+        GROUP BY n.folder_id
+    )
+    SELECT f.id, f.name::TEXT, f.color::TEXT, f.created_at, f.updated_at,
+           coalesce(c.note_count, 0), c.last_note_at
+    FROM note_folders f
+    LEFT JOIN counts c ON c.folder_id = f.id
+    WHERE f.user_id = p_user_id
+    UNION ALL
+    SELECT NULL, NULL, NULL, NULL, NULL, c.note_count, c.last_note_at
+    FROM counts c
+    WHERE c.folder_id IS NULL;
+$$;
@@ -0,0 +1,227 @@
+-- Streaks computed next to the data: habit_completions writes refresh habit_streaks
+-- through a statement-level trigger, so no completion history leaves the database.
+-- Same rules as benchmarks/streak_reference.py (see recompute there).
+
+-- Whether a habit is due on p_day, as blueprints/habits/schedule.py reads the
+-- frequency. Weekdays are numbered from Sunday = 0, like EXTRACT(DOW).
+CREATE OR REPLACE FUNCTION habit_day_scheduled(p_frequency JSONB, p_day DATE)
+RETURNS BOOLEAN
+LANGUAGE SQL
+IMMUTABLE
+AS $$
+    SELECT CASE
+        WHEN coalesce(p_frequency->>'type', 'daily') IN ('daily', 'weekly') THEN
+            jsonb_typeof(p_frequency->'days') IS DISTINCT FROM 'array'
+            OR EXISTS (
+                SELECT 1 FROM jsonb_array_elements_text(p_frequency->'days') AS d(day)
+                WHERE (d.day::INT % 7 + 7) % 7 = EXTRACT(DOW FROM p_day)
+            )
+        WHEN p_frequency->>'type' = 'custom' THEN
+            -- A weekly target can be met on any day
+            coalesce(nullif(p_frequency->>'timesPerWeek', '')::INT, 0) <> 0
+            OR (p_day - coalesce(nullif(p_frequency->>'startDate', ''), '2023-01-01')::DATE)
+               % greatest(coalesce(nullif(p_frequency->>'interval', '')::INT, 1), 1) = 0
+        ELSE TRUE
+    END;
+$$;
+
+-- Recompute one habit's streak with a gaps-and-islands pass and store it.
+-- Runs are consecutive scheduled days that were all completed: numbering the
+-- scheduled days and the completed ones separately, a run is where the
+-- difference stays constant. The current streak is the part of the run that
+-- reaches the last scheduled day up to today. Habits with a timesPerWeek
+-- target count consecutive Monday-to-Sunday weeks that met it instead, and
+-- the week in progress extends the streak once it is met.
+CREATE OR REPLACE FUNCTION refresh_habit_streak(p_habit_id UUID)
+RETURNS habit_streaks
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    freq JSONB;
+    target INT;
+    v_current INT := 0;
+    v_longest INT := 0;
+    v_last_run INT := 0;
+    v_last_completed DATE;
+    result habit_streaks;
+BEGIN
+    SELECT h.frequency INTO freq FROM habits h WHERE h.id = p_habit_id;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+    freq := coalesce(freq, '{}'::JSONB);
+    target := nullif(coalesce(nullif(freq->>'timesPerWeek', '')::INT, 0), 0);
+    target := CASE WHEN freq->>'type' = 'custom' AND target IS NOT NULL THEN least(greatest(target, 1), 7) END;
+
+    IF target IS NOT NULL THEN
+        WITH met AS (
+            SELECT date_trunc('week', c.completed_at)::DATE AS week
+            FROM habit_completions c
+            WHERE c.habit_id = p_habit_id
+            GROUP BY 1
+            HAVING count(*) >= target
+        ),
+        islands AS (
+            SELECT week, (week - DATE '2001-01-01') / 7 - row_number() OVER (ORDER BY week) AS island
+            FROM met
+        ),
+        runs AS (
+            SELECT island, max(week) AS last_week, count(*)::INT AS length
+            FROM islands
+            GROUP BY island
+        ),
+        this_week AS (
+            SELECT date_trunc('week', CURRENT_DATE)::DATE AS week
+        )
+        SELECT
+            coalesce((SELECT max(length) FROM runs), 0),
+            coalesce((SELECT length FROM runs ORDER BY last_week DESC LIMIT 1), 0),
+            coalesce((
+                SELECT count(*)::INT
+                FROM islands i
+                JOIN islands a ON a.island = i.island
+                WHERE a.week = (
+                    SELECT max(m.week) FROM met m, this_week t
+                    WHERE m.week IN (t.week, t.week - 7)
+                ) AND i.week <= a.week
+            ), 0)
+        INTO v_longest, v_last_run, v_current;
+
+        SELECT max(c.completed_at) INTO v_last_completed
+        FROM habit_completions c
+        WHERE c.habit_id = p_habit_id;
+    ELSE
+        WITH done AS (
+            SELECT c.completed_at AS day
+            FROM habit_completions c
+            WHERE c.habit_id = p_habit_id AND habit_day_scheduled(freq, c.completed_at)
+        ),
+        scheduled AS (
+            SELECT s.day::DATE AS day, row_number() OVER (ORDER BY s.day) AS rank
+            FROM (SELECT min(day) AS first_day, greatest(max(day), CURRENT_DATE) AS last_day FROM done) b,
+                 generate_series(b.first_day, b.last_day, INTERVAL '1 day') AS s(day)
+            WHERE habit_day_scheduled(freq, s.day::DATE)
+        ),
+        islands AS (
+            SELECT s.day, s.rank - row_number() OVER (ORDER BY s.day) AS island
+            FROM scheduled s
+            JOIN done d ON d.day = s.day
+        ),
+        runs AS (
+            SELECT island, max(day) AS last_day, count(*)::INT AS length
+            FROM islands
+            GROUP BY island
+        )
+        SELECT
+            coalesce((SELECT max(length) FROM runs), 0),
+            coalesce((SELECT length FROM runs ORDER BY last_day DESC LIMIT 1), 0),
+            (SELECT max(last_day) FROM runs),
+            coalesce((
+                SELECT count(*)::INT
+                FROM islands i
+                JOIN islands a ON a.island = i.island
+                WHERE a.day = (SELECT max(s.day) FROM scheduled s WHERE s.day <= CURRENT_DATE)
+                  AND i.day <= a.day
+            ), 0)
+        INTO v_longest, v_last_run, v_last_completed, v_current;
+    END IF;
+
+    INSERT INTO habit_streaks (habit_id, current_streak, longest_streak, last_completed_at, last_run_length, updated_at)
+    VALUES (p_habit_id, v_current, v_longest, v_last_completed, v_last_run, now())
+    ON CONFLICT (habit_id) DO UPDATE SET
+        current_streak = EXCLUDED.current_streak,
+        longest_streak = EXCLUDED.longest_streak,
+        last_completed_at = EXCLUDED.last_completed_at,
+        last_run_length = EXCLUDED.last_run_length,
+        updated_at = EXCLUDED.updated_at
+    RETURNING * INTO result;
+    RETURN result;
+END;
+$$;
+
+-- One refresh per habit a statement touched, however many rows it wrote
+CREATE OR REPLACE FUNCTION refresh_changed_habit_streaks()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    PERFORM refresh_habit_streak(c.habit_id)
+    FROM (SELECT DISTINCT habit_id FROM changed_rows) c;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS habit_completions_streak_insert ON habit_completions;
+CREATE TRIGGER habit_completions_streak_insert
+AFTER INSERT ON habit_completions
+REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_changed_habit_streaks();
+
+DROP TRIGGER IF EXISTS habit_completions_streak_update ON habit_completions;
+CREATE TRIGGER habit_completions_streak_update
+AFTER UPDATE ON habit_completions
+REFERENCING NEW TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_changed_habit_streaks();
+
+DROP TRIGGER IF EXISTS habit_completions_streak_delete ON habit_completions;
+CREATE TRIGGER habit_completions_streak_delete
+AFTER DELETE ON habit_completions
+REFERENCING OLD TABLE AS changed_rows
+FOR EACH STATEMENT EXECUTE FUNCTION refresh_changed_habit_streaks();
+
+-- A new frequency reschedules the whole history
+CREATE OR REPLACE FUNCTION refresh_rescheduled_habit_streak()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+BEGIN
+    PERFORM refresh_habit_streak(NEW.id);
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS habits_streak_frequency ON habits;
+CREATE TRIGGER habits_streak_frequency
+AFTER UPDATE OF frequency ON habits
+FOR EACH ROW
+WHEN (OLD.frequency IS DISTINCT FROM NEW.frequency)
+EXECUTE FUNCTION refresh_rescheduled_habit_streak();
+
+-- Toggle one day and return the habit's new streak in a single round trip.
+-- No row when the habit doesn't exist or p_user_id is given and doesn't own it.
+CREATE OR REPLACE FUNCTION toggle_habit_completion(p_habit_id UUID, p_day DATE, p_user_id UUID DEFAULT NULL)
+RETURNS TABLE(user_id UUID, completed BOOLEAN, current_streak INT, longest_streak INT)
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    v_owner UUID;
+    is_completed BOOLEAN;
+BEGIN
+    SELECT h.user_id INTO v_owner
+    FROM habits h
+    WHERE h.id = p_habit_id AND (p_user_id IS NULL OR h.user_id = p_user_id);
+    IF NOT FOUND THEN
+        RETURN;
+    END IF;
+
+    DELETE FROM habit_completions c WHERE c.habit_id = p_habit_id AND c.completed_at = p_day;
+    is_completed := NOT FOUND;
+    IF is_completed THEN
+        INSERT INTO habit_completions (habit_id, completed_at)
+        VALUES (p_habit_id, p_day)
+        ON CONFLICT (habit_id, completed_at) DO NOTHING;
+    END IF;
+
+    -- The statement triggers above have already refreshed the streak
+    RETURN QUERY
+    SELECT v_owner, is_completed, s.current_streak, s.longest_streak
+    FROM habit_streaks s
+    WHERE s.habit_id = p_habit_id;
+END;
+$$;
+
+-- Bring every stored streak in line with the function once
+SELECT refresh_habit_streak(id) FROM habits;
@@ -0,0 +1,5 @@
+-- Length of the completion run ending at last_completed_at, so a toggle at the end of
+-- that run updates the streak without reading completion history.
+-- last_completed_at now holds the latest completed scheduled day. Rows with a NULL
+-- last_run_length are recomputed in full on their next toggle, which fills it in.
+ALTER TABLE habit_streaks ADD COLUMN IF NOT EXISTS last_run_length INT;
@@ -0,0 +1,2 @@
+-- Resized WebP copies of the cover image: {"card": {"url": ..., "width": ...}, ...}
+ALTER TABLE notes ADD COLUMN IF NOT EXISTS cover_variants JSONB;
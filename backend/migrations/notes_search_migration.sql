@@ -0,0 +1,44 @@
+-- Plaintext of the BlockNote body, extracted by the app on every save
+ALTER TABLE notes ADD COLUMN IF NOT EXISTS search_text TEXT;
+
+-- Weighted search document: title matches rank above body matches
+ALTER TABLE notes ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(search_text, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_notes_search_vector ON notes USING GIN (search_vector);
+
+-- Ranked search over a user's notes. Headlines are only built for the
+-- rows that survive the LIMIT, since ts_headline re-parses the document.
+CREATE OR REPLACE FUNCTION search_notes(p_user_id UUID, p_query TEXT, p_limit INTEGER DEFAULT 20)
+RETURNS TABLE(
+    id UUID,
+    title TEXT,
+    rank REAL,
+    snippet TEXT,
+    updated_at TIMESTAMP WITH TIME ZONE
+)
+LANGUAGE SQL
+STABLE
+AS $$
+    WITH query AS (
+        SELECT websearch_to_tsquery('english', p_query) AS q
+    ),
+    matches AS (
+        SELECT n.id, n.title, n.search_text, n.updated_at,
+               ts_rank_cd(n.search_vector, query.q) AS rank
+        FROM notes n, query
+        WHERE n.user_id = p_user_id
+        AND n.search_vector @@ query.q
+        ORDER BY rank DESC, n.updated_at DESC
+        LIMIT p_limit
+    )
+    SELECT m.id, m.title::TEXT, m.rank,
+           ts_headline('english', coalesce(m.search_text, ''), query.q,
+                       'StartSel=<mark>, StopSel=</mark>, MaxFragments=2, MaxWords=20, MinWords=5'),
+           m.updated_at
+    FROM matches m, query
+    ORDER BY m.rank DESC, m.updated_at DESC;
+$$;
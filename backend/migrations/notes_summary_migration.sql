@@ -0,0 +1,5 @@
+-- Plaintext preview stored alongside the note body so list views can skip it
+ALTER TABLE notes ADD COLUMN IF NOT EXISTS excerpt TEXT;
+
+-- Keyset pagination index for the summary listing (newest first)
+CREATE INDEX IF NOT EXISTS idx_notes_user_updated_at ON notes(user_id, updated_at DESC, id DESC);
@@ -0,0 +1,20 @@
+-- Version counter for optimistic concurrency on note saves
+ALTER TABLE notes ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 0;
+
+-- Bump the version whenever the note body or title changes, so full saves
+-- (update_note) and block patches (patch_note) invalidate each other
+CREATE OR REPLACE FUNCTION bump_note_version()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.note IS DISTINCT FROM OLD.note OR NEW.title IS DISTINCT FROM OLD.title THEN
+        NEW.version = OLD.version + 1;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS bump_note_version_trigger ON notes;
+CREATE TRIGGER bump_note_version_trigger
+BEFORE UPDATE ON notes
+FOR EACH ROW
+EXECUTE FUNCTION bump_note_version();
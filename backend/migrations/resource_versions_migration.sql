@@ -0,0 +1,73 @@
+-- Per-user change counters for the list endpoints' ETags. Every write to a
+-- table bumps its owner's counter, so a conditional GET only has to read
+-- one row per resource instead of re-running the list query.
+CREATE TABLE IF NOT EXISTS resource_versions (
+    user_id UUID NOT NULL,
+    resource TEXT NOT NULL,
+    version BIGINT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, resource)
+);
+
+-- TG_ARGV[0] is the resource to bump; TG_ARGV[1] = 'via_habit' finds the
+-- owner through habit_id for tables that have no user_id of their own
+CREATE OR REPLACE FUNCTION bump_resource_version()
+RETURNS TRIGGER
+LANGUAGE plpgsql
+SECURITY DEFINER
+AS $$
+DECLARE
+    changed RECORD;
+    owner UUID;
+BEGIN
+    IF TG_OP = 'DELETE' THEN
+        changed := OLD;
+    ELSE
+        changed := NEW;
+    END IF;
+
+    IF TG_NARGS > 1 AND TG_ARGV[1] = 'via_habit' THEN
+        -- NULL when the habit itself is being deleted; its own trigger covers that
+        SELECT h.user_id INTO owner FROM habits h WHERE h.id = changed.habit_id;
+    ELSE
+        owner := changed.user_id;
+    END IF;
+
+    IF owner IS NOT NULL THEN
+        INSERT INTO resource_versions (user_id, resource, version)
+        VALUES (owner, TG_ARGV[0], 1)
+        ON CONFLICT (user_id, resource) DO UPDATE SET version = resource_versions.version + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS notes_resource_version ON notes;
+CREATE TRIGGER notes_resource_version
+AFTER INSERT OR UPDATE OR DELETE ON notes
+FOR EACH ROW EXECUTE FUNCTION bump_resource_version('notes');
+
+DROP TRIGGER IF EXISTS habits_resource_version ON habits;
+CREATE TRIGGER habits_resource_version
+AFTER INSERT OR UPDATE OR DELETE ON habits
+FOR EACH ROW EXECUTE FUNCTION bump_resource_version('habits');
+
+-- get_habits returns each habit's streak, so streak writes change the habit list
+DROP TRIGGER IF EXISTS habit_streaks_resource_version ON habit_streaks;
+CREATE TRIGGER habit_streaks_resource_version
+AFTER INSERT OR UPDATE OR DELETE ON habit_streaks
+FOR EACH ROW EXECUTE FUNCTION bump_resource_version('habits', 'via_habit');
+
+DROP TRIGGER IF EXISTS habit_completions_resource_version ON habit_completions;
+CREATE TRIGGER habit_completions_resource_version
+AFTER INSERT OR UPDATE OR DELETE ON habit_completions
+FOR EACH ROW EXECUTE FUNCTION bump_resource_version('completions', 'via_habit');
+
+DROP TRIGGER IF EXISTS tasks_resource_version ON tasks;
+CREATE TRIGGER tasks_resource_version
+AFTER INSERT OR UPDATE OR DELETE ON tasks
+FOR EACH ROW EXECUTE FUNCTION bump_resource_version('tasks');
+
+DROP TRIGGER IF EXISTS transactions_resource_version ON transactions;
+CREATE TRIGGER transactions_resource_version
+AFTER INSERT OR UPDATE OR DELETE ON transactions
+FOR EACH ROW EXECUTE FUNCTION bump_resource_version('transactions');
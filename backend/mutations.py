@@ -0,0 +1,57 @@
+from db import db
+
+
+class RowNotFound(Exception):
+    """
+    An owned mutation matched no row: the row does not exist or belongs to
+    someone else. The app answers it with a 404.
+    """
+
+
+def returning(query, columns):
+    """Limit the rows an insert/update/delete sends back to `columns` instead of every column"""
+    query.params = query.params.set('select', ''.join(columns.split()))
+    return query
+
+
+def _filtered(query, filters):
+    for column, value in filters.items():
+        query = query.eq(column, value)
+    return query
+
+
+def insert_row(table, row, columns='*'):
+    """Insert a row and return it as stored, ids and defaults included, in one call"""
+    result = returning(db.from_(table).insert(row), columns).execute()
+    return result.data[0] if result.data else None
+
+
+def update_row(table, updates, columns='*', not_found='Not found or access denied', **filters):
+    """
+    Update the row matching `filters` and return it as written.
+
+    Ownership belongs in the filters (e.g. user_id=...), so checking it and
+    writing is a single statement; zero matched rows raises RowNotFound.
+    """
+    query = _filtered(db.from_(table).update(updates), filters)
+    result = returning(query, columns).execute()
+    if not result.data:
+        raise RowNotFound(not_found)
+    return result.data[0]
+
+
+def delete_row(table, columns='id', not_found='Not found or access denied', **filters):
+    """Delete the row matching `filters` and return it; zero matched rows raises RowNotFound"""
+    query = _filtered(db.from_(table).delete(), filters)
+    result = returning(query, columns).execute()
+    if not result.data:
+        raise RowNotFound(not_found)
+    return result.data[0]
+
+
+def fetch_row(table, columns='*', not_found='Not found or access denied', **filters):
+    """Read the one row matching `filters`; zero matched rows raises RowNotFound"""
+    result = _filtered(db.from_(table).select(columns), filters).limit(1).execute()
+    if not result.data:
+        raise RowNotFound(not_found)
+    return result.data[0]
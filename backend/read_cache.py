@@ -0,0 +1,163 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from cachetools import LRUCache, TTLCache
+
+STAT_NAMES = ('hits', 'shared_hits', 'misses', 'evictions', 'invalidations')
+
+
+class _Buckets(LRUCache):
+    """LRU of (user, resource) buckets that reports each eviction"""
+
+    def __init__(self, maxsize, on_evict):
+        super().__init__(maxsize)
+        self.on_evict = on_evict
+
+    def popitem(self):
+        key, bucket = super().popitem()
+        self.on_evict(key[1])
+        return key, bucket
+
+
+class ReadThroughCache:
+    """
+    Per-user cache for read endpoints, keyed by (user, resource, params).
+
+    Mutating endpoints call invalidate() for the resources they change; the
+    TTL is only a backstop for rows written outside the app. Entries live in
+    an in-process LRU and, when a path is given, in a SQLite file shared by
+    every worker process on the host. Invalidations go through that file
+    too, so one worker's write is seen by the others' memory tiers. Values
+    are JSON strings so every hit hands the caller a fresh copy.
+    """
+
+    def __init__(self, maxsize=2048, ttl=300, path=None):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.memory = _Buckets(maxsize, self._evicted)
+        # Recent local invalidations, so a load that raced a write is not stored
+        self.invalidated = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.stats = {}
+        self.shared = None
+        if path:
+            self.shared = sqlite3.connect(path, check_same_thread=False, timeout=5)
+            self.shared.execute('PRAGMA journal_mode=WAL')
+            self.shared.execute(
+                'CREATE TABLE IF NOT EXISTS read_cache (user_id TEXT NOT NULL, resource TEXT NOT NULL, '
+                'params TEXT NOT NULL, value TEXT NOT NULL, loaded_at REAL NOT NULL, expires_at REAL NOT NULL, '
+                'PRIMARY KEY (user_id, resource, params))'
+            )
+            self.shared.execute(
+                'CREATE TABLE IF NOT EXISTS read_cache_invalidations (user_id TEXT NOT NULL, '
+                'resource TEXT NOT NULL, invalidated_at REAL NOT NULL, PRIMARY KEY (user_id, resource))'
+            )
+            self.shared.commit()
+
+    def _count(self, resource, name):
+        if resource not in self.stats:
+            self.stats[resource] = dict.fromkeys(STAT_NAMES, 0)
+        self.stats[resource][name] += 1
+
+    def _evicted(self, resource):
+        self._count(resource, 'evictions')
+
+    def _invalidated_at(self, user_id, resource):
+        if self.shared is None:
+            return self.invalidated.get((user_id, resource), 0)
+        row = self.shared.execute(
+            'SELECT invalidated_at FROM read_cache_invalidations WHERE user_id = ? AND resource = ?',
+            (user_id, resource)
+        ).fetchone()
+        return row[0] if row else 0
+
+    def _remember(self, user_id, resource, params, encoded, loaded_at, expires_at):
+        bucket = self.memory.get((user_id, resource))
+        if bucket is None:
+            bucket = self.memory[(user_id, resource)] = {}
+        bucket[params] = (encoded, loaded_at, expires_at)
+
+    def get(self, user_id, resource, loader, params=None):
+        """The cached value for this user, resource and params, or loader()'s result, which is then cached"""
+        user_id = str(user_id)
+        params = json.dumps(params, sort_keys=True, separators=(',', ':'))
+        started = time.time()
+        with self.lock:
+            invalidated_at = self._invalidated_at(user_id, resource)
+            entry = self.memory.get((user_id, resource), {}).get(params)
+            if entry and entry[1] > invalidated_at and entry[2] > started:
+                self._count(resource, 'hits')
+                return json.loads(entry[0])
+            if self.shared is not None:
+                row = self.shared.execute(
+                    'SELECT value, loaded_at, expires_at FROM read_cache '
+                    'WHERE user_id = ? AND resource = ? AND params = ? AND expires_at > ? AND loaded_at > ?',
+                    (user_id, resource, params, started, invalidated_at)
+                ).fetchone()
+                if row:
+                    self._count(resource, 'shared_hits')
+                    self._remember(user_id, resource, params, *row)
+                    return json.loads(row[0])
+            self._count(resource, 'misses')
+
+        value = loader()
+        encoded = json.dumps(value)
+        expires_at = started + self.ttl
+        with self.lock:
+            # A write that landed while loading may not be in `value`; serve it but don't keep it
+            if self._invalidated_at(user_id, resource) >= started:
+                return value
+            self._remember(user_id, resource, params, encoded, started, expires_at)
+            if self.shared is not None:
+                self.shared.execute(
+                    'INSERT OR REPLACE INTO read_cache (user_id, resource, params, value, loaded_at, expires_at) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    (user_id, resource, params, encoded, started, expires_at)
+                )
+                self.shared.commit()
+        return value
+
+    def invalidate(self, user_id, *resources):
+        """Drop every cached entry of `resources` for this user, in all worker processes"""
+        user_id = str(user_id)
+        now = time.time()
+        with self.lock:
+            for resource in resources:
+                self.memory.pop((user_id, resource), None)
+                self.invalidated[(user_id, resource)] = now
+                self._count(resource, 'invalidations')
+                if self.shared is not None:
+                    self.shared.execute(
+                        'INSERT OR REPLACE INTO read_cache_invalidations (user_id, resource, invalidated_at) '
+                        'VALUES (?, ?, ?)',
+                        (user_id, resource, now)
+                    )
+                    self.shared.execute('DELETE FROM read_cache WHERE user_id = ? AND resource = ?',
+                                        (user_id, resource))
+            if self.shared is not None:
+                # Older invalidations can only hide entries that have expired anyway
+                self.shared.execute('DELETE FROM read_cache WHERE expires_at <= ?', (now,))
+                self.shared.execute('DELETE FROM read_cache_invalidations WHERE invalidated_at <= ?',
+                                    (now - self.ttl,))
+                self.shared.commit()
+
+    def snapshot(self):
+        with self.lock:
+            resources = {}
+            for resource, stats in self.stats.items():
+                lookups = stats['hits'] + stats['shared_hits'] + stats['misses']
+                hits = stats['hits'] + stats['shared_hits']
+                resources[resource] = {**stats, 'hit_ratio': hits / lookups if lookups else 0.0}
+            return {
+                'buckets': len(self.memory),
+                'shared': self.shared is not None,
+                'resources': resources
+            }
+
+
+read_cache = ReadThroughCache(
+    maxsize=int(os.environ.get('READ_CACHE_SIZE', 2048)),
+    ttl=int(os.environ.get('READ_CACHE_TTL', 300)),
+    path=os.environ.get('READ_CACHE_PATH')
+)
@@ -0,0 +1,47 @@
+import threading
+
+
+class ResponseStats:
+    """Per-endpoint JSON serialization time and body sizes before and after compression"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.endpoints = {}
+
+    def _entry(self, endpoint):
+        endpoint = endpoint or 'unmatched'
+        if endpoint not in self.endpoints:
+            self.endpoints[endpoint] = {
+                'serialized': 0, 'serialize_ms': 0.0,
+                'responses': 0, 'compressed': 0, 'raw_bytes': 0, 'sent_bytes': 0
+            }
+        return self.endpoints[endpoint]
+
+    def record_serialization(self, endpoint, seconds):
+        with self.lock:
+            entry = self._entry(endpoint)
+            entry['serialized'] += 1
+            entry['serialize_ms'] += seconds * 1000
+
+    def record_body(self, endpoint, raw_bytes, sent_bytes, encoding=None):
+        with self.lock:
+            entry = self._entry(endpoint)
+            entry['responses'] += 1
+            entry['raw_bytes'] += raw_bytes
+            entry['sent_bytes'] += sent_bytes
+            if encoding:
+                entry['compressed'] += 1
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                endpoint: {
+                    **entry,
+                    'avg_serialize_ms': entry['serialize_ms'] / entry['serialized'] if entry['serialized'] else 0.0,
+                    'compression_ratio': entry['sent_bytes'] / entry['raw_bytes'] if entry['raw_bytes'] else 1.0
+                }
+                for endpoint, entry in self.endpoints.items()
+            }
+
+
+response_stats = ResponseStats()
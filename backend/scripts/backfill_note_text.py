@@ -0,0 +1,49 @@
+"""
+One-off backfill of the derived text columns for notes saved before they
+existed.
+
+Fills `search_text` and `excerpt` for every note whose `search_text` is
+still NULL, using the same text_columns() the save path runs, so those
+notes become searchable. The listing endpoint only computes a missing
+excerpt for its response and never writes it back; this is what stores it.
+Notes are read in pages keyed on id and written back one row at a time;
+it is safe to stop and re-run.
+
+Usage (from backend/, with the usual SUPABASE_* environment):
+    python -m scripts.backfill_note_text [--batch N] [--dry-run]
+"""
+import argparse
+from db import db
+from blueprints.notes.blocks import text_columns
+
+
+def pending_notes(batch):
+    """Pages of (id, note) for notes without search_text, in id order"""
+    last_id = None
+    while True:
+        query = db.from_('notes').select('id, note').is_('search_text', 'null')
+        if last_id:
+            query = query.gt('id', last_id)
+        rows = query.order('id').limit(batch).execute().data
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1]['id']
+
+
+def main(args):
+    filled = 0
+    for rows in pending_notes(args.batch):
+        for row in rows:
+            if not args.dry_run:
+                db.from_('notes').update(text_columns(row['note'])).eq('id', row['id']).execute()
+            filled += 1
+        print(f'{filled} notes {"to fill" if args.dry_run else "filled"}')
+    print(f'Done: {filled} notes {"need" if args.dry_run else "got"} search_text')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch', type=int, default=200)
+    parser.add_argument('--dry-run', action='store_true')
+    main(parser.parse_args())
@@ -0,0 +1,33 @@
+from blueprints.notes.latex import format_latex_content, find_latex_error
+
+
+def test_signed_script_is_braced_whole():
+    assert format_latex_content('x^-1') == '$$x^{-1}$$'
+    assert format_latex_content('e^-x') == '$$e^{-x}$$'
+    assert format_latex_content('x_+2') == '$$x_{+2}$$'
+    assert format_latex_content('e^-alpha t') == '$$e^{-\\alpha} t$$'
+
+
+def test_signed_script_is_idempotent():
+    once = format_latex_content('x^-1 + e^-x')
+    assert format_latex_content(once) == once
+    assert find_latex_error(once) is None
+
+
+def test_dangling_script_is_left_alone():
+    assert format_latex_content('x^') == '$$x^$$'
+    assert format_latex_content('$$x^$$') == '$$x^$$'
+
+
+def test_matrix_environment_is_wrapped():
+    assert format_latex_content('\\begin{pmatrix}a&b\\end{pmatrix}') == '$$\\begin{pmatrix}a & b\\end{pmatrix}$$'
+
+
+def test_display_environment_is_not_wrapped():
+    assert format_latex_content('\\begin{equation}x=1\\end{equation}') == '\\begin{equation}x = 1\\end{equation}'
+
+
+def test_starred_environment_name():
+    formatted = format_latex_content('a=1\\\\b=2')
+    assert formatted.startswith('\\begin{align*}')
+    assert find_latex_error(formatted) is None
@@ -58,6 +58,7 @@ export function FormatWithAIButton() {
           method: "POST",
           headers: {
             "Content-Type": "application/json",
+            Authorization: `Bearer ${localStorage.getItem("access_token")}`,
           },
           body: JSON.stringify({
             blocks: selection.blocks,
@@ -91,6 +92,11 @@ export function FormatWithAIButton() {
                 continue;
               }
 
+              if (data.block) {
+                setProgressText(`Formatted ${data.index + 1} blocks...`);
+                continue;
+              }
+
               if (
                 data.formatted_blocks &&
                 Array.isArray(data.formatted_blocks)
@@ -69,6 +69,7 @@ export const LatexBlock = createReactBlockSpec(
               method: "POST",
               headers: {
                 "Content-Type": "application/json",
+                Authorization: `Bearer ${localStorage.getItem("access_token")}`,
               },
               body: JSON.stringify({ equation: block.props.equation }),
             }
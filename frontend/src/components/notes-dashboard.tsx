@@ -18,6 +18,7 @@ import {
   List,
 } from "lucide-react";
 import { Input } from "./ui/input";
+import { coverUrl, type CoverVariants } from "@/lib/utils";
 
 import {
   Dialog,
@@ -47,11 +48,15 @@ import {
   AlertDialogTitle,
 } from "@/components/ui/alert-dialog";
 
+// Largest page /notes/get_notes/?view=summary serves
+const NOTES_PAGE_SIZE = 100;
+
 type Note = {
   title: string;
-  content: string;
+  excerpt?: string | null;
   id: string;
   cover_image: string;
+  cover_variants?: CoverVariants | null;
   updated_at: Date;
   folder_id?: string | null;
 };
@@ -60,12 +65,21 @@ type Folder = {
   id: string;
   name: string;
   color?: string;
+  note_count?: number;
+};
+
+type FolderTree = {
+  folders: Folder[];
+  unfiled: { note_count: number; last_note_at: string | null };
+  total_notes: number;
 };
 
 export default function NotesDashboard() {
   const [notes, setNotes] = useState<Note[]>([]);
   const [recentNote, setRecentNote] = useState<Note[]>([]);
   const [folders, setFolders] = useState<Folder[]>([]);
+  const [unfiledCount, setUnfiledCount] = useState(0);
+  const [totalNotes, setTotalNotes] = useState(0);
   const [selectedFolder, setSelectedFolder] = useState<string | null>(null);
   const [searchQuery, setSearchQuery] = useState("");
   const [newFolderName, setNewFolderName] = useState("");
@@ -89,21 +103,39 @@ export default function NotesDashboard() {
   const fetchData = () => {
     setIsLoading(true);
 
-    // Fetch notes
-    fetch(`${import.meta.env.VITE_BACKEND_URL}/notes/get_notes/`, {
-      method: "GET",
-      headers: {
-        Authorization: `Bearer ${localStorage.getItem("access_token")}`,
-      },
-    })
-      .then((response) => response.json())
-      .then((data) => {
-        console.log(data);
-        data = data.sort((a: Note, b: Note) => {
-          const dateA = new Date(a.updated_at);
-          const dateB = new Date(b.updated_at);
-          return dateB.getTime() - dateA.getTime();
+    // Fetch note summaries (no bodies), following the cursor page by page
+    const fetchNotes = async () => {
+      const all: Note[] = [];
+      let cursor: string | null = null;
+      do {
+        const params = new URLSearchParams({
+          view: "summary",
+          limit: String(NOTES_PAGE_SIZE),
         });
+        if (cursor) params.set("cursor", cursor);
+        const response = await fetch(
+          `${import.meta.env.VITE_BACKEND_URL}/notes/get_notes/?${params}`,
+          {
+            method: "GET",
+            headers: {
+              Authorization: `Bearer ${localStorage.getItem("access_token")}`,
+            },
+          }
+        );
+        if (!response.ok) {
+          throw new Error("Failed to fetch notes");
+        }
+        const page: { notes: Note[]; next_cursor: string | null } =
+          await response.json();
+        all.push(...page.notes);
+        cursor = page.next_cursor;
+      } while (cursor);
+      return all;
+    };
+
+    fetchNotes()
+      .then((data) => {
+        // Summaries already come back newest first
         setNotes(data.slice(1));
         setRecentNote(data.slice(0, 1));
         setIsLoading(false);
@@ -113,17 +145,18 @@ export default function NotesDashboard() {
         setIsLoading(false);
       });
 
-    // Fetch folders
-    fetch(`${import.meta.env.VITE_BACKEND_URL}/notes/folders/`, {
+    // Fetch folders with their note counts
+    fetch(`${import.meta.env.VITE_BACKEND_URL}/notes/folders/tree/`, {
       method: "GET",
       headers: {
         Authorization: `Bearer ${localStorage.getItem("access_token")}`,
       },
     })
       .then((response) => response.json())
-      .then((data) => {
-        console.log("Folders:", data);
-        setFolders(data || []);
+      .then((data: FolderTree) => {
+        setFolders(data.folders || []);
+        setUnfiledCount(data.unfiled?.note_count ?? 0);
+        setTotalNotes(data.total_notes ?? 0);
       })
       .catch((err) => {
         console.error("Error fetching folders:", err);
@@ -186,7 +219,7 @@ export default function NotesDashboard() {
     })
       .then((response) => response.json())
       .then((data) => {
-        setFolders([...folders, data]);
+        setFolders([...folders, { ...data, note_count: 0 }]);
         setNewFolderName("");
         setNewFolderDialogOpen(false);
         toast.success("Folder created");
@@ -226,7 +259,9 @@ export default function NotesDashboard() {
         // Update folders list
         setFolders(
           folders.map((folder) =>
-            folder.id === selectedFolderForAction.id ? updatedFolder : folder
+            folder.id === selectedFolderForAction.id
+              ? { ...folder, ...updatedFolder }
+              : folder
           )
         );
         toast.success("Folder renamed successfully");
@@ -575,7 +610,7 @@ export default function NotesDashboard() {
                     </span>
                   </div>
                   <span className='text-xs bg-primary/20 dark:bg-primary/30 px-2 py-0.5 rounded-full text-primary-foreground dark:text-primary-foreground font-medium'>
-                    {notes.length}
+                    {totalNotes}
                   </span>
                 </button>
 
@@ -592,7 +627,7 @@ export default function NotesDashboard() {
                     <span>Uncategorized</span>
                   </div>
                   <span className='text-xs bg-muted/50 dark:bg-muted/30 px-2 py-0.5 rounded-full text-foreground dark:text-foreground/90'>
-                    {notes.filter((note) => !note.folder_id).length}
+                    {unfiledCount}
                   </span>
                 </button>
 
@@ -617,10 +652,7 @@ export default function NotesDashboard() {
                     </div>
                     <div className='flex items-center gap-1'>
                       <span className='text-xs bg-muted/50 dark:bg-muted/30 px-2 py-0.5 rounded-full text-muted-foreground dark:text-muted-foreground/70'>
-                        {
-                          notes.filter((note) => note.folder_id === folder.id)
-                            .length
-                        }
+                        {folder.note_count ?? 0}
                       </span>
                       <FolderActions folder={folder} />
                     </div>
@@ -657,7 +689,7 @@ export default function NotesDashboard() {
                       <AudioPlayer
                         title={recentNote[0].title}
                         author={getFolderName(recentNote[0].folder_id)}
-                        coverUrl={recentNote[0].cover_image}
+                        coverUrl={coverUrl(recentNote[0], 1200) ?? ""}
                         id={recentNote[0].id}
                       />
                     </div>
@@ -722,6 +754,7 @@ export default function NotesDashboard() {
                         <div className='rounded-lg overflow-hidden shadow-sm dark:shadow-md/10 hover:shadow-md dark:hover:shadow-lg/20 transition-shadow'>
                           <BookCard
                             {...note}
+                            cover_image={coverUrl(note, 400)}
                             folder={getFolderName(note.folder_id)}
                           />
                         </div>
@@ -749,7 +782,7 @@ export default function NotesDashboard() {
                           <div className='h-12 w-12 rounded-md overflow-hidden mr-4 shadow-sm'>
                             {note.cover_image ? (
                               <img
-                                src={note.cover_image}
+                                src={coverUrl(note, 400)}
                                 alt={note.title}
                                 className='h-full w-full object-cover'
                               />
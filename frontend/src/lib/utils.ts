@@ -5,6 +5,22 @@ export function cn(...inputs: ClassValue[]) {
   return twMerge(clsx(inputs));
 }
 
+export type CoverVariants = Record<string, { url: string; width: number }>;
+
+// Smallest recorded cover variant at least `width` pixels wide (else the
+// widest), or the original cover while no variants have been generated
+export function coverUrl(
+  note: { cover_image?: string | null; cover_variants?: CoverVariants | null },
+  width: number
+) {
+  const variants = Object.values(note.cover_variants ?? {}).sort(
+    (a, b) => a.width - b.width
+  );
+  if (variants.length === 0) return note.cover_image ?? undefined;
+  const fit = variants.find((variant) => variant.width >= width);
+  return (fit ?? variants[variants.length - 1]).url;
+}
+
 // Add this utility function for handling clicks
 export function ensureClick<T extends HTMLElement = HTMLElement>(
   callback: (event: React.MouseEvent<T>) => void
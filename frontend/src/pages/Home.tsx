@@ -3,13 +3,15 @@ import { MotivationalQuote } from "@/components/motivational-quotes";
 import { NotesCard } from "@/components/NotesCard"; // Assuming NotesCard can be used or adapt as needed
 import { Button } from "@/components/ui/button";
 import { Link } from "react-router-dom"; // Assuming react-router-dom is used
+import { coverUrl, type CoverVariants } from "@/lib/utils";
 
 // Define basic types (adjust based on actual data structure)
 type Note = {
   id: string;
   title: string;
-  note: string; // Assuming 'note' contains preview content or needs parsing
+  excerpt: string | null;
   cover_image: string;
+  cover_variants?: CoverVariants | null;
   updated_at: string;
 };
 
@@ -40,7 +42,7 @@ function Home() {
       setIsLoadingNotes(true);
       try {
         const response = await fetch(
-          `${import.meta.env.VITE_BACKEND_URL}/notes/get_notes/`,
+          `${import.meta.env.VITE_BACKEND_URL}/notes/get_notes/?view=summary&limit=5`,
           {
             headers: {
               Authorization: `Bearer ${localStorage.getItem("access_token")}`,
@@ -50,13 +52,9 @@ function Home() {
         if (!response.ok) {
           throw new Error("Failed to fetch notes");
         }
-        let notesData: Note[] = await response.json();
-        // Sort by updated_at descending and take top 5
-        notesData.sort(
-          (a, b) =>
-            new Date(b.updated_at).getTime() - new Date(a.updated_at).getTime()
-        );
-        setRecentNotes(notesData.slice(0, 5));
+        // Summaries come back newest first without note bodies
+        const { notes }: { notes: Note[] } = await response.json();
+        setRecentNotes(notes);
       } catch (error) {
         console.error("Error fetching recent notes:", error);
         // Handle error (e.g., show toast)
@@ -94,29 +92,6 @@ function Home() {
     fetchTasks(); // Call placeholder fetch
   }, []);
 
-  // Function to generate a simple preview from note content (if needed)
-  const getNotePreview = (noteContent: string): string => {
-    try {
-      const parsedContent = JSON.parse(noteContent);
-      // Find the first paragraph block with text content
-      const firstText = parsedContent.find(
-        (block: any) =>
-          block.type === "paragraph" &&
-          block.content &&
-          block.content.length > 0 &&
-          block.content[0].text
-      );
-      return firstText
-        ? firstText.content[0].text.substring(0, 100) + "..."
-        : "No preview available";
-    } catch (e) {
-      // If content is not JSON or parsing fails, return raw start
-      return typeof noteContent === "string"
-        ? noteContent.substring(0, 100) + "..."
-        : "Invalid content";
-    }
-  };
-
   return (
     <div className='p-4 md:p-6 space-y-8 max-w-7xl mx-auto'>
       <MotivationalQuote />
@@ -138,8 +113,8 @@ function Home() {
                 key={note.id}
                 id={note.id}
                 title={note.title}
-                description={getNotePreview(note.note)} // Use preview function
-                imageLink={note.cover_image || "/placeholder-image.png"} // Provide a fallback image
+                description={note.excerpt || "No preview available"}
+                imageLink={coverUrl(note, 400) || "/placeholder-image.png"} // Provide a fallback image
               />
             ))}
           </div>
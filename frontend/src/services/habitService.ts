@@ -28,6 +28,12 @@ export interface HabitCompletion {
   created_at?: string;
 }
 
+export interface CompletionOperation {
+  habit_id: string;
+  date: string;
+  completed: boolean;
+}
+
 export const habitService = {
   // Get all habits for a user
   async getHabits(userId: string) {
@@ -97,6 +103,19 @@ export const habitService = {
     }
   },
 
+  // Sets many completions in one request, e.g. backfilling a week from the grid
+  async bulkToggleCompletions(operations: CompletionOperation[]) {
+    try {
+      const response = await apiClient.post("/habits/bulk_toggle", {
+        operations,
+      });
+      return response.data;
+    } catch (error) {
+      console.error("Error updating habit completions:", error);
+      throw error;
+    }
+  },
+
   // Archive a habit
   async archiveHabit(habitId: string, archive = true) {
     try {